@@ -1,22 +1,17 @@
+import asyncio
+import hashlib
+import html
+import json
+import re
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
 from app.core.config import settings
-from app.ai.models.llm_factory import get_llm_with_fallback
+from app.workflows.campaign_providers import get_providers
 
-async def generate_personalized_content(candidate: dict, prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team") -> str:
-    """
-    Generates a unique message for a specific candidate based on the user's prompt.
-    ASYNC version to support proper event loop usage in FastAPI.
-    """
-    # Lazy Init with Fallback
-    llm = get_llm_with_fallback(temperature=0.9)
-    print(f"DEBUG: Generating content for {candidate.get('name')} via {channel}")
-    
-    # safe defaults
-    name = candidate.get("name", "Student")
-    city = candidate.get("city", "your city")
-    course = candidate.get("course", "our programs")
-    
-    
-    # Construct a specific prompt for the LLM
+def _build_instruction(channel: str, name: str, city: str, course: str, prompt: str, verified_link: str = None, sender_name: str = "Admit AI Team") -> str:
+    """Channel-specific copywriting prompt for one recipient profile."""
     if channel == "email":
         system_instruction = f"""
         You are a world-class Marketing Copywriter and Admissions Expert.
@@ -107,27 +102,277 @@ async def generate_personalized_content(candidate: dict, prompt: str, channel: s
         - No placeholders. 
         - Sign off as {sender_name}.
         """
+    return system_instruction
+
+
+def _clean_output(content: str, channel: str) -> str:
+    # Robust cleanup for JSON
+    if channel == "email":
+        # Remove potential markdown wrappers
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.startswith("```"):
+            content = content[3:]
+        if content.endswith("```"):
+            content = content[:-3]
+        content = content.strip()
+    return content
+
+
+async def generate_personalized_content(candidate: dict, prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team") -> str:
+    """
+    Generates a unique message for a specific candidate based on the user's prompt.
+    ASYNC version to support proper event loop usage in FastAPI.
+    """
+    # Lazy Init with Fallback
+    llm = get_providers().get_llm(temperature=0.9)
+    print(f"DEBUG: Generating content for {candidate.get('name')} via {channel}")
+    
+    # safe defaults
+    name = candidate.get("name", "Student")
+    city = candidate.get("city", "your city")
+    course = candidate.get("course", "our programs")
+    
+    
+    system_instruction = _build_instruction(channel, name, city, course, prompt, verified_link, sender_name)
     
     try:
         response = await llm.ainvoke(system_instruction)
         content = response.content.strip()
         print(f"DEBUG: LLM Response ({len(content)} chars): {content[:50]}...")
-        
-        # Robust cleanup for JSON
-        if channel == "email":
-            # Remove potential markdown wrappers
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-        return content
+        return _clean_output(content, channel)
     except Exception as e:
         print(f"LLM Generation Error for {name}: {e}")
         # Fallback if LLM fails
         if channel == "email":
             return '{"subject": "Update regarding your application", "body": "Hi ' + name + ', please contact us regarding your interest in ' + course + '."}'
         return f"Hi {name}, regarding your interest in {course}. Please contact us."
+
+
+# --- Cohort mode: one LLM call per (city, course, channel) cohort ---
+
+NAME_SLOT = "{{name}}"
+VARIANT_SEPARATOR = "===VARIANT==="
+COHORT_TEMPLATE_TTL = 24 * 3600
+_NAME_SLOT_RE = re.compile(r"\{\{\s*(first_)?name\s*\}\}", re.IGNORECASE)
+
+
+def cohort_key(candidate: dict, channel: str, verified_link: str = None) -> tuple:
+    """Recipients sharing this key get the same template (only the name differs)."""
+    city = (candidate.get("city") or "").strip().lower()
+    course = (candidate.get("course") or "").strip().lower()
+    return (city, course, channel, verified_link or "")
+
+
+def render_template(template: str, candidate: dict, channel: str) -> str:
+    """Fills the name slot locally; email bodies are HTML, so the name is escaped there."""
+    name = candidate.get("name") or "Student"
+    first_name = name.split()[0] if name.split() else name
+
+    def fill(text: str, escape: bool) -> str:
+        full, first = (html.escape(name), html.escape(first_name)) if escape else (name, first_name)
+        return _NAME_SLOT_RE.sub(lambda m: first if m.group(1) else full, text)
+
+    if channel == "email" and "BODY:" in template:
+        subject, body = template.split("BODY:", 1)
+        return fill(subject, False) + "BODY:" + fill(body, True)
+    return fill(template, channel == "email")
+
+
+async def generate_cohort_templates(candidate: dict, prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team", variants: int = 1) -> List[str]:
+    """
+    One LLM call producing `variants` message templates for the candidate's cohort,
+    with {{name}} where the recipient's name goes. Raises on LLM failure so a
+    failed cohort is not cached.
+    """
+    llm = get_providers().get_llm(temperature=0.9)
+    city = candidate.get("city") or "your city"
+    course = candidate.get("course") or "our programs"
+    print(f"DEBUG: Generating {variants} cohort template(s) for {city}/{course} via {channel}")
+
+    system_instruction = _build_instruction(channel, NAME_SLOT, city, course, prompt, verified_link, sender_name)
+    system_instruction += f"""
+        Template Mode:
+        - This message goes to every student from {city} interested in {course}.
+        - Write the exact text {NAME_SLOT} wherever the student's name belongs; it is the ONLY placeholder allowed.
+        - Do not invent a name or mention other personal details.
+        """
+    if variants > 1:
+        system_instruction += f"""
+        - Write {variants} clearly different versions (different hook, structure and subject).
+        - Separate versions with a line containing only {VARIANT_SEPARATOR}
+        """
+
+    response = await llm.ainvoke(system_instruction)
+    content = response.content.strip()
+    templates = [_clean_output(part.strip(), channel) for part in content.split(VARIANT_SEPARATOR)]
+    templates = [t for t in templates if t][:max(1, variants)]
+    if not templates:
+        raise ValueError("LLM returned an empty cohort template")
+    return templates
+
+
+async def generate_cohort_content(candidate: dict, prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team", campaign_id: str = "", variants: int = 1) -> str:
+    """
+    Cohort-mode replacement for generate_personalized_content: the cohort's
+    templates are generated once (shared through the cache across concurrent
+    recipients, workers and resumed runs) and rendered per recipient locally.
+    A recipient always gets the same variant.
+    """
+    from app.core.cache import cache
+    throttle = get_providers().throttle
+
+    key_parts = "|".join(cohort_key(candidate, channel, verified_link)) + f"|{prompt}|{sender_name}|{variants}"
+    key = f"cohort_tpl:{campaign_id}:{hashlib.sha1(key_parts.encode('utf-8')).hexdigest()[:20]}"
+
+    async def load():
+        await throttle.acquire("channel:llm")
+        return await generate_cohort_templates(candidate, prompt, channel, verified_link, sender_name, variants)
+
+    templates = await cache.get_or_set(key, load, ttl=COHORT_TEMPLATE_TTL, tags=[f"campaign:{campaign_id}"] if campaign_id else None)
+    ident = str(candidate.get("id") or candidate.get("email") or candidate.get("phone") or "")
+    template = templates[int(hashlib.md5(ident.encode("utf-8")).hexdigest(), 16) % len(templates)]
+    return render_template(template, candidate, channel)
+
+
+# --- Batched mode: M unique messages per LLM request ---
+
+class BatchMessage(BaseModel):
+    id: str
+    subject: str = ""
+    body: str = Field(min_length=1)
+
+
+class BatchEnvelope(BaseModel):
+    # Items are validated one by one so a single bad item does not sink the batch
+    messages: List[Dict[str, Any]]
+
+
+def _format_message(message: BatchMessage, channel: str) -> str:
+    """Same shape generate_personalized_content returns for the channel."""
+    if channel == "email":
+        return f"SUBJECT: {message.subject.strip() or 'Information for You'}\nBODY:\n{message.body.strip()}"
+    return message.body.strip()
+
+
+async def generate_batch_content(candidates: List[dict], prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team") -> Dict[int, str]:
+    """
+    One LLM request writing a unique message for each candidate. The shared
+    instruction is sent once instead of once per recipient. Returns
+    {index: message} for the items that passed OutputGuard validation; missing
+    indexes are for the caller to regenerate individually.
+    """
+    from app.ai.guardrails.output import output_guard
+
+    llm = get_providers().get_llm(temperature=0.9)
+    print(f"DEBUG: Generating batch of {len(candidates)} via {channel}")
+
+    system_instruction = _build_instruction(
+        channel, "(per recipient, see list)", "(per recipient)", "(per recipient)", prompt, verified_link, sender_name
+    )
+    profiles = "\n".join(
+        f'- id "r{i}": Name: {c.get("name") or "Student"} | City: {c.get("city") or "your city"} | Interest: {c.get("course") or "our programs"}'
+        for i, c in enumerate(candidates)
+    )
+    system_instruction += f"""
+        Batch Mode (overrides the Format Requirements above):
+        - Write one separate, unique message for EACH recipient below, personalised to their profile.
+        - Recipients:
+{profiles}
+        - Return ONLY JSON: {{"messages": [{{"id": "r0", "subject": "...", "body": "..."}}, ...]}}
+        - One object per recipient id. "subject" is {'the email subject line' if channel == 'email' else 'an empty string'}.
+        - "body" holds the message content exactly as it would be sent.
+        """
+
+    response = await llm.ainvoke(system_instruction)
+    envelope = output_guard.validate_schema(response.content, BatchEnvelope)
+    if envelope is None:
+        return {}
+
+    results: Dict[int, str] = {}
+    for item in envelope.messages:
+        message = output_guard.validate_schema(json.dumps(item), BatchMessage)
+        if message is None or not message.id.startswith("r") or not message.id[1:].isdigit():
+            continue
+        index = int(message.id[1:])
+        if 0 <= index < len(candidates):
+            results[index] = _format_message(message, channel)
+    return results
+
+
+class BatchedGenerator:
+    """
+    Collects concurrent generate() calls that share (prompt, channel, link,
+    sender) and sends them as one batched request once `batch_size` are
+    waiting or `max_wait` seconds passed. Items missing or invalid in the
+    batch response fall back to a single generate_personalized_content call.
+    """
+
+    def __init__(self, batch_size: int = 8, max_wait: float = 0.25):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._pending: Dict[tuple, List[tuple]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.fallbacks = 0
+
+    async def generate(self, candidate: dict, prompt: str, channel: str, verified_link: str = None, sender_name: str = "Admit AI Team") -> str:
+        loop = asyncio.get_running_loop()
+        # Providers are part of the key so simulated and real recipients never share a batch
+        key = (prompt, channel, verified_link or "", sender_name, id(get_providers()))
+        future = loop.create_future()
+        bucket = self._pending.setdefault(key, [])
+        bucket.append((candidate, future))
+        if len(bucket) >= self.batch_size:
+            self._flush(key)
+        elif len(bucket) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(key, None)
+        if items:
+            task = asyncio.get_running_loop().create_task(self._run_batch(key, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key: tuple, items: List[tuple]):
+        throttle = get_providers().throttle
+        prompt, channel, verified_link, sender_name, _ = key
+        live = [(c, f) for c, f in items if not f.done()]
+        results: Dict[int, str] = {}
+        try:
+            await throttle.acquire("channel:llm")
+            results = await generate_batch_content([c for c, _ in live], prompt, channel, verified_link or None, sender_name)
+            self.batches += 1
+        except Exception as e:
+            print(f"Batch Generation Error ({len(live)} recipients): {e}")
+
+        async def single(candidate: dict, future: asyncio.Future):
+            self.fallbacks += 1
+            try:
+                await throttle.acquire("channel:llm")
+                text = await generate_personalized_content(candidate, prompt, channel, verified_link or None, sender_name=sender_name)
+                if not future.done():
+                    future.set_result(text)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+        retries = []
+        for index, (candidate, future) in enumerate(live):
+            if future.done():
+                continue
+            if index in results:
+                future.set_result(results[index])
+            else:
+                retries.append(single(candidate, future))
+        if retries:
+            await asyncio.gather(*retries)
+
+
+batched_generator = BatchedGenerator(batch_size=settings.LLM_BATCH_SIZE, max_wait=settings.LLM_BATCH_MAX_WAIT)
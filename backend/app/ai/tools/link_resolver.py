@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import logging
+import re
+from typing import AsyncIterator, Iterable
+
+from app.core.cache import cache
+
+logger = logging.getLogger("ai.link_resolver")
+
+LINK_KEY_PREFIX = "verified_link"
+# Official sites rarely move; misses (no result / search error) retry sooner
+LINK_TTL = 7 * 24 * 3600
+LINK_MISS_TTL = 600
+PREFETCH_CONCURRENCY = 8
+PREFETCH_WINDOW = 200
+
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s:/.-]")
+
+
+def normalize_query(query: str) -> str:
+    """Case/whitespace/punctuation-insensitive form so equivalent queries share one entry."""
+    return _WS.sub(" ", _PUNCT.sub(" ", (query or "").lower())).strip()
+
+
+def build_link_query(ai_prompt: str, recipient: dict) -> str:
+    # Use Campaign Goal + Recipient Context for Link Search.
+    # Asking for an "Official website" steers Tavily to the institution's own site.
+    search_query = f"{ai_prompt} {recipient.get('college', '') or ''}".strip()
+    return f"Official website {search_query}"
+
+
+class LinkResolver:
+    """
+    Resolves campaign link-search queries to verified URLs.
+
+    - Queries are normalized and cached through CacheService (L1 + Redis),
+      so repeats within a campaign, across campaigns and across workers cost
+      no search; concurrent misses for one query share a single request.
+    - `prefetch_stream` resolves the distinct queries of upcoming recipients
+      concurrently before they are dispatched, so sends find them cached.
+    """
+
+    def __init__(self, ttl: int = LINK_TTL, miss_ttl: int = LINK_MISS_TTL, concurrency: int = PREFETCH_CONCURRENCY):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.concurrency = concurrency
+
+    @staticmethod
+    def cache_key(query: str) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()[:20]
+        return f"{LINK_KEY_PREFIX}:{digest}"
+
+    async def resolve(self, query: str) -> str:
+        """Verified link for the query; falls back to a search URL when nothing was found."""
+        from app.ai.tools import tools
+        try:
+            link = await cache.get_or_set(
+                self.cache_key(query),
+                lambda: tools.search_official_link_async(query),
+                ttl=self.ttl,
+                negative_ttl=self.miss_ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Link resolution failed for '{query}': {e}")
+            link = None
+        return link or tools._search_fallback_link(query)
+
+    async def prefetch(self, queries: Iterable[str]) -> int:
+        """Resolves the distinct queries concurrently. Returns how many were requested."""
+        distinct = {}
+        for query in queries:
+            distinct.setdefault(normalize_query(query), query)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(query: str):
+            async with semaphore:
+                await self.resolve(query)
+
+        await asyncio.gather(*(one(q) for q in distinct.values()), return_exceptions=True)
+        return len(distinct)
+
+    async def prefetch_stream(self, stream: AsyncIterator[dict], ai_prompt: str, window: int = PREFETCH_WINDOW) -> AsyncIterator[dict]:
+        """
+        Passes recipients through in order, resolving each window's link queries
+        before its recipients are yielded (the first window before any send).
+        """
+        if not ai_prompt:
+            async for recipient in stream:
+                yield recipient
+            return
+        batch = []
+        async for recipient in stream:
+            batch.append(recipient)
+            if len(batch) >= window:
+                await self.prefetch(build_link_query(ai_prompt, r) for r in batch)
+                for r in batch:
+                    yield r
+                batch = []
+        if batch:
+            await self.prefetch(build_link_query(ai_prompt, r) for r in batch)
+            for r in batch:
+                yield r
+
+
+link_resolver = LinkResolver()
@@ -1,12 +1,26 @@
 import os
+import asyncio
 import smtplib
+from typing import List, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from twilio.rest import Client
 import requests
 from app.core.config import settings
+from app.core.throttle import throttle
+from app.core.http_client import http_pool
+from app.core.token_cache import OAuthTokenManager
 
 # --- Search & Verification ---
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+
+def _search_fallback_link(query: str) -> str:
+    import urllib.parse
+    encoded_query = urllib.parse.quote(query.replace("Official website", "").strip())
+    return f"https://www.google.com/search?q={encoded_query}"
+
+
 def get_verified_link(query: str) -> str:
     """
     Uses Tavily to find an official verified link for the query.
@@ -15,13 +29,11 @@ def get_verified_link(query: str) -> str:
         # User requested a functional link fallback immediately.
         # Since we don't have the API key, we redirect to a Google Search for the Official Site.
         print("[WARN] No settings.TAVILY_API_KEY found. Using Google Search fallback.")
-        import urllib.parse
-        encoded_query = urllib.parse.quote(query.replace("Official website", "").strip())
-        return f"https://www.google.com/search?q={encoded_query}"
+        return _search_fallback_link(query)
         
     try:
         response = requests.post(
-            "https://api.tavily.com/search",
+            TAVILY_SEARCH_URL,
             json={"query": query, "search_depth": "basic", "max_results": 1},
             headers={"api_key": settings.TAVILY_API_KEY}
         )
@@ -32,11 +44,53 @@ def get_verified_link(query: str) -> str:
         print(f"Tavily Search Error: {e}")
     
     # Fallback if Tavily fails
-    import urllib.parse
-    encoded_query = urllib.parse.quote(query.replace("Official website", "").strip())
-    return f"https://www.google.com/search?q={encoded_query}"
+    return _search_fallback_link(query)
+
+
+async def search_official_link_async(query: str) -> Optional[str]:
+    """Tavily top result URL for the query, or None (no key, no result, or error)."""
+    if not settings.TAVILY_API_KEY:
+        return None
+    try:
+        await throttle.acquire("provider:tavily")
+        response = await http_pool.get().post(
+            TAVILY_SEARCH_URL,
+            json={"query": query, "search_depth": "basic", "max_results": 1},
+            headers={"api_key": settings.TAVILY_API_KEY}
+        )
+        data = response.json()
+        if data.get("results"):
+            return data["results"][0]["url"]
+    except Exception as e:
+        print(f"Tavily Search Error: {e}")
+    return None
+
+
+async def get_verified_link_async(query: str) -> str:
+    """Async get_verified_link on the shared HTTP pool."""
+    return await search_official_link_async(query) or _search_fallback_link(query)
 
 # --- WhatsApp (Twilio Fallback) ---
+def _twilio_auth():
+    """(username, password) for Twilio: API Key (Preferred) > Auth Token. None if unconfigured."""
+    sid = settings.TWILIO_ACCOUNT_SID
+    api_key = settings.TWILIO_API_KEY_SID
+    api_secret = settings.TWILIO_API_KEY_SECRET
+    if api_key and api_secret and sid:
+        return api_key, api_secret
+    if sid and settings.TWILIO_AUTH_TOKEN:
+        return sid, settings.TWILIO_AUTH_TOKEN
+    return None
+
+
+def _twilio_numbers(to_number: str):
+    from_ph = settings.TWILIO_PHONE_NUMBER
+    # Twilio requires "whatsapp:" prefix
+    from_wa = f"whatsapp:{from_ph}" if "whatsapp:" not in from_ph else from_ph
+    to_wa = f"whatsapp:{to_number}" if "whatsapp:" not in to_number else to_number
+    return from_wa, to_wa
+
+
 def send_whatsapp_twilio(to_number: str, message: str) -> str:
     """
     Sends message via Twilio WhatsApp API.
@@ -53,9 +107,7 @@ def send_whatsapp_twilio(to_number: str, message: str) -> str:
         return "failed_twilio_no_phone"
         
     try:
-        # Twilio requires "whatsapp:" prefix
-        from_wa = f"whatsapp:{from_ph}" if "whatsapp:" not in from_ph else from_ph
-        to_wa = f"whatsapp:{to_number}" if "whatsapp:" not in to_number else to_number
+        from_wa, to_wa = _twilio_numbers(to_number)
         
         # Auth Strategy: API Key (Preferred) > Auth Token
         if api_key and api_secret and sid:
@@ -69,6 +121,7 @@ def send_whatsapp_twilio(to_number: str, message: str) -> str:
              return "failed_twilio_no_creds"
 
         print(f"[Twilio] Sending from {from_wa} to {to_wa}...")
+        throttle.acquire_sync("provider:twilio")
         
         msg = client.messages.create(
             from_=from_wa,
@@ -81,7 +134,65 @@ def send_whatsapp_twilio(to_number: str, message: str) -> str:
         print(f"[Twilio] Error: {e}")
         return f"failed_twilio_{str(e)}"
 
+
+async def send_whatsapp_twilio_async(to_number: str, message: str) -> str:
+    """Async Twilio fallback via the Messages REST endpoint (the SDK client is blocking)."""
+    if not settings.TWILIO_PHONE_NUMBER:
+        print("[Twilio] Missing Phone Number.")
+        return "failed_twilio_no_phone"
+    auth = _twilio_auth()
+    if auth is None:
+        print("[Twilio] Missing Credentials (SID+Token or SID+API Key/Secret).")
+        return "failed_twilio_no_creds"
+    try:
+        from_wa, to_wa = _twilio_numbers(to_number)
+        url = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
+        await throttle.acquire("provider:twilio")
+        response = await http_pool.get().post(url, data={"From": from_wa, "To": to_wa, "Body": message}, auth=auth)
+        if response.status_code in [200, 201]:
+            msg_sid = response.json().get("sid")
+            print(f"[Twilio] Success! SID: {msg_sid}")
+            return f"sent_twilio_{msg_sid}"
+        print(f"[Twilio] Error: {response.status_code} {response.text}")
+        return f"failed_twilio_{response.status_code}"
+    except Exception as e:
+        print(f"[Twilio] Error: {e}")
+        return f"failed_twilio_{str(e)}"
+
 # --- WhatsApp (Strict Cloud API) ---
+def _clean_whatsapp_number(to_number: str) -> str:
+    clean_number = to_number.replace("whatsapp:", "").replace("+", "").strip()
+    # Auto-add default country code (91 for India) if missing
+    if len(clean_number) == 10 and clean_number.isdigit():
+        clean_number = "91" + clean_number
+    return clean_number
+
+
+def _whatsapp_cloud_request(clean_number: str, message: str):
+    """(url, headers, payload) for the Meta Cloud API text message call."""
+    url = f"https://graph.facebook.com/v19.0/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
+    headers = {
+        "Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": clean_number,
+        "text": {"body": message}
+    }
+    return url, headers, payload
+
+
+def _whatsapp_manual_fallback(clean_number: str, message: str):
+    # --- SECRET FALLBACK: Generate Manual Link ---
+    import urllib.parse
+    encoded_message = urllib.parse.quote(message)
+    deep_link = f"https://wa.me/{clean_number}?text={encoded_message}"
+    
+    print(f"\n[SECRET FALLBACK] Meta rejected the call. Use this link to send manually:")
+    print(f" {deep_link} \n")
+
+
 def send_whatsapp_message(to_number: str, message: str, user_id: str = "default_user") -> str:
     """
     Sends message via Official WhatsApp Cloud API.
@@ -94,11 +205,7 @@ def send_whatsapp_message(to_number: str, message: str, user_id: str = "default_
              return "failed_limit_reached_upgrade_plan"
              
         # 1. Cleaner Phone Number
-        clean_number = to_number.replace("whatsapp:", "").replace("+", "").strip()
-        
-        # Auto-add default country code (91 for India) if missing
-        if len(clean_number) == 10 and clean_number.isdigit():
-            clean_number = "91" + clean_number
+        clean_number = _clean_whatsapp_number(to_number)
 
         # 2. Check Credentials
         if not settings.WHATSAPP_ACCESS_TOKEN or not settings.WHATSAPP_PHONE_NUMBER_ID:
@@ -106,19 +213,10 @@ def send_whatsapp_message(to_number: str, message: str, user_id: str = "default_
             return "failed_missing_credentials"
 
         # 3. Call Cloud API
-        url = f"https://graph.facebook.com/v19.0/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
-        headers = {
-            "Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": clean_number,
-            "text": {"body": message}
-        }
+        url, headers, payload = _whatsapp_cloud_request(clean_number, message)
         
         print(f"[WhatsApp] Sending to {clean_number}...")
+        throttle.acquire_sync("provider:meta")
         response = requests.post(url, headers=headers, json=payload)
         
         if response.status_code in [200, 201]:
@@ -136,16 +234,9 @@ def send_whatsapp_message(to_number: str, message: str, user_id: str = "default_
                 subscription_service.log_usage(user_id, "whatsapp_msgs", 1)
                 return twilio_status # Return Twilio success
             
-            error_msg = response.text
             # If both fail, fallback to Manual Link
             error_msg = response.text
-            # --- SECRET FALLBACK: Generate Manual Link ---
-            import urllib.parse
-            encoded_message = urllib.parse.quote(message)
-            deep_link = f"https://wa.me/{clean_number}?text={encoded_message}"
-            
-            print(f"\n[SECRET FALLBACK] Meta rejected the call. Use this link to send manually:")
-            print(f" {deep_link} \n")
+            _whatsapp_manual_fallback(clean_number, message)
             
             return f"failed_api_{response.status_code}_{error_msg}"
 
@@ -153,7 +244,233 @@ def send_whatsapp_message(to_number: str, message: str, user_id: str = "default_
         print(f"[WhatsApp] EXCEPTION: {e}")
         return f"error_exception_{str(e)}"
 
+
+async def _metered_send(user_id: str, feature: str, quota, send) -> str:
+    """
+    Runs `send()` under the user's plan quota: a campaign QuotaReservation
+    when given (no DB calls), otherwise check_usage before and log_usage
+    after a delivered message.
+    """
+    from app.services.subscription_service import subscription_service
+    if quota is not None:
+        if not await quota.acquire():
+            return "failed_limit_reached_upgrade_plan"
+        status = "failed"
+        try:
+            status = await send()
+        finally:
+            quota.release(status.startswith("sent"))
+        return status
+
+    if not await asyncio.to_thread(subscription_service.check_usage, user_id, feature):
+         return "failed_limit_reached_upgrade_plan"
+    status = await send()
+    if status.startswith("sent"):
+        await asyncio.to_thread(subscription_service.log_usage, user_id, feature, 1)
+    return status
+
+
+async def send_whatsapp_message_async(to_number: str, message: str, user_id: str = "default_user", quota=None) -> str:
+    """
+    Async send_whatsapp_message: the Cloud API call (and Twilio fallback) go
+    through the shared keep-alive HTTP pool instead of a worker thread.
+    `quota` is the campaign's QuotaReservation for "whatsapp_msgs", if any.
+    """
+    return await _metered_send(user_id, "whatsapp_msgs", quota, lambda: _deliver_whatsapp_async(to_number, message))
+
+
+async def _deliver_whatsapp_async(to_number: str, message: str) -> str:
+    try:
+        clean_number = _clean_whatsapp_number(to_number)
+        if not settings.WHATSAPP_ACCESS_TOKEN or not settings.WHATSAPP_PHONE_NUMBER_ID:
+            print(f"[WhatsApp] FAILURE: Missing Credentials for {clean_number}")
+            return "failed_missing_credentials"
+
+        url, headers, payload = _whatsapp_cloud_request(clean_number, message)
+        await throttle.acquire("provider:meta")
+        response = await http_pool.get().post(url, headers=headers, json=payload)
+
+        if response.status_code in [200, 201]:
+            print(f"[WhatsApp] SUCCESS: Message sent to {clean_number}")
+            return "sent_cloud_api"
+
+        print(f"[WhatsApp] API ERROR {response.status_code}: {response.text}")
+        print(f"[WhatsApp] Meta API Failed. Attempting Twilio Fallback...")
+        twilio_status = await send_whatsapp_twilio_async(clean_number, message)
+        if "sent" in twilio_status:
+            return twilio_status
+
+        _whatsapp_manual_fallback(clean_number, message)
+        return f"failed_api_{response.status_code}_{response.text}"
+
+    except Exception as e:
+        print(f"[WhatsApp] EXCEPTION: {e}")
+        return f"error_exception_{str(e)}"
+
 # --- Email Multi-Provider Router ---
+GMAIL_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GMAIL_SEND_URL = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
+
+
+def _gmail_credentials():
+    # SMTP / Gmail Config
+    gmail_user = os.getenv("GMAIL_USER", "").strip() or (getattr(settings, "GMAIL_USER", "") or "").strip()
+    gmail_password = os.getenv("GMAIL_APP_PASSWORD", "").strip() or (getattr(settings, "GMAIL_APP_PASSWORD", "") or "").strip()
+    return gmail_user, gmail_password
+
+
+def _gmail_token_payload() -> Optional[dict]:
+    """OAuth2 refresh payload for the Gmail REST API, or None if not configured."""
+    client_id = getattr(settings, "GMAIL_CLIENT_ID", None)
+    client_secret = getattr(settings, "GMAIL_CLIENT_SECRET", None)
+    refresh_token = getattr(settings, "GMAIL_REFRESH_TOKEN", None)
+    if not (client_id and client_secret and refresh_token):
+        return None
+    return {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token"
+    }
+
+
+# Access tokens are cached (and refreshed ahead of expiry) instead of refreshed per email
+gmail_tokens = OAuthTokenManager("gmail", GMAIL_TOKEN_URL, _gmail_token_payload)
+
+
+def _gmail_raw_message(to_email: str, subject: str, final_content: str, is_html: bool, gmail_user: str) -> dict:
+    import base64
+    msg = MIMEMultipart()
+    msg['To'] = to_email
+    from_addr = f'"admitconnectAI" <{gmail_user}>' if gmail_user else f'"admitconnectAI" <{settings.FROM_EMAIL}>'
+    msg['From'] = from_addr
+    msg['Subject'] = subject
+    
+    if is_html:
+        msg.attach(MIMEText(final_content, 'html'))
+    else:
+        msg.attach(MIMEText(final_content, 'plain'))
+        
+    raw_msg = base64.urlsafe_b64encode(msg.as_bytes()).decode('utf-8')
+    return {"raw": raw_msg}
+
+
+def _email_api_requests(to_email: str, subject: str, final_content: str, is_html: bool) -> List[dict]:
+    """
+    Single-call HTTP email providers in failover order (Apps Script, Resend,
+    Brevo, SendGrid), each as a request spec shared by the sync and async senders.
+    """
+    requests_specs = []
+
+    # OPTION B: Google Apps Script Web App Relay (100% Free, Bypasses firewall, Real Gmail Sender, No SMTP block)
+    gas_url = getattr(settings, "GOOGLE_APPS_SCRIPT_URL", None)
+    if gas_url:
+        import json
+        requests_specs.append({
+            "name": "Google Apps Script Relay", "bucket": "provider:apps_script", "status": "sent_apps_script",
+            "url": gas_url, "timeout": 15, "ok": [200, 201],
+            "kwargs": {
+                "content": json.dumps({"to": to_email, "subject": subject, "body": final_content, "isHtml": is_html}),
+                "headers": {"Content-Type": "application/json"},
+            },
+        })
+
+    # OPTION C: Resend API (HTTP 443)
+    resend_key = getattr(settings, "RESEND_API_KEY", None)
+    if resend_key:
+        from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "onboarding@resend.dev"
+        if "onboarding@resend.dev" in from_email or not settings.FROM_EMAIL:
+            from_email = "onboarding@resend.dev"
+        requests_specs.append({
+            "name": "Resend API", "bucket": "provider:resend", "status": "sent_resend",
+            "url": "https://api.resend.com/emails", "timeout": 10, "ok": [200, 201, 202],
+            "kwargs": {
+                "json": {
+                    "from": f'"admitconnectAI" <{from_email}>',
+                    "to": to_email,
+                    "subject": subject,
+                    "html": final_content if is_html else None,
+                    "text": final_content if not is_html else None
+                },
+                "headers": {"Authorization": f"Bearer {resend_key}", "Content-Type": "application/json"},
+            },
+        })
+
+    # OPTION D: Brevo API (HTTP 443)
+    brevo_key = getattr(settings, "BREVO_API_KEY", None)
+    if brevo_key:
+        from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "noreply@admitai.com"
+        requests_specs.append({
+            "name": "Brevo API", "bucket": "provider:brevo", "status": "sent_brevo",
+            "url": "https://api.brevo.com/v3/smtp/email", "timeout": 10, "ok": [200, 201, 202],
+            "kwargs": {
+                "json": {
+                    "sender": {"name": "admitconnectAI", "email": from_email},
+                    "to": [{"email": to_email}],
+                    "subject": subject,
+                    "htmlContent": final_content if is_html else None,
+                    "textContent": final_content if not is_html else None
+                },
+                "headers": {"accept": "application/json", "api-key": brevo_key, "content-type": "application/json"},
+            },
+        })
+
+    # OPTION E: SendGrid API (HTTP 443)
+    sg_key = getattr(settings, "SENDGRID_API_KEY", None)
+    if sg_key:
+        from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "noreply@admitai.com"
+        requests_specs.append({
+            "name": "SendGrid API", "bucket": "provider:sendgrid", "status": "sent_sendgrid",
+            "url": "https://api.sendgrid.com/v3/mail/send", "timeout": 10, "ok": [200, 201, 202],
+            "kwargs": {
+                "json": {
+                    "personalizations": [{"to": [{"email": to_email}]}],
+                    "from": {"email": from_email, "name": "admitconnectAI"},
+                    "subject": subject,
+                    "content": [{"type": "text/html" if is_html else "text/plain", "value": final_content}]
+                },
+                "headers": {"Authorization": f"Bearer {sg_key}", "Content-Type": "application/json"},
+            },
+        })
+
+    return requests_specs
+
+
+def _send_smtp(to_email: str, subject: str, final_content: str, is_html: bool, gmail_user: str, gmail_password: str) -> bool:
+    """FALLBACK: SMTP (Gmail SSL - Works locally, fails on Render Free tier due to port block)"""
+    try:
+        print(f"DEBUG: Attempting SMTP (Fallback) to {to_email} via {gmail_user} | Subject: {subject}")
+        throttle.acquire_sync("provider:smtp")
+        import email.utils
+        smtp_host = 'smtp.gmail.com'
+        smtp_port = 465
+        
+        msg = MIMEMultipart()
+        msg['From'] = f'"admitconnectAI" <{gmail_user}>'
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg['Date'] = email.utils.formatdate(localtime=True)
+        msg['Message-ID'] = email.utils.make_msgid()
+        msg['X-Mailer'] = "AdmitAI-Mailer/1.0"
+        msg['X-Priority'] = "3"
+        
+        if is_html:
+            msg.attach(MIMEText(final_content, 'html'))
+        else:
+            msg.attach(MIMEText(final_content, 'plain'))
+        
+        server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=5)
+        server.login(gmail_user, gmail_password)
+        text = msg.as_string()
+        server.sendmail(gmail_user, to_email, text)
+        server.quit()
+        print(f"DEBUG: SMTP Send Success to {to_email}")
+        return True
+    except Exception as e:
+        print(f"DEBUG: SMTP Failed: {e}")
+        return False
+
+
 def send_email(to_email: str, subject: str, body: str, html_content: str = None, user_id: str = "default_user") -> str:
     """
     Sends an email using the best available channel (HTTP APIs to bypass cloud firewall blocks, or SMTP).
@@ -166,212 +483,118 @@ def send_email(to_email: str, subject: str, body: str, html_content: str = None,
              
         final_content = html_content if html_content else body
         is_html = True if html_content or "<html>" in final_content or "<br>" in final_content else False
-        
-        # SMTP / Gmail Config
-        gmail_user = os.getenv("GMAIL_USER", "").strip() or getattr(settings, "GMAIL_USER", "").strip()
-        gmail_password = os.getenv("GMAIL_APP_PASSWORD", "").strip() or getattr(settings, "GMAIL_APP_PASSWORD", "").strip()
+        gmail_user, gmail_password = _gmail_credentials()
 
         # 1. OPTION A: Gmail REST API (100% Free, Bypasses firewall, Real Gmail Sender via OAuth2)
-        client_id = getattr(settings, "GMAIL_CLIENT_ID", None)
-        client_secret = getattr(settings, "GMAIL_CLIENT_SECRET", None)
-        refresh_token = getattr(settings, "GMAIL_REFRESH_TOKEN", None)
-        
-        if client_id and client_secret and refresh_token:
+        if _gmail_token_payload():
             try:
                 print(f"DEBUG: Attempting Gmail REST API to {to_email}...")
-                token_url = "https://oauth2.googleapis.com/token"
-                token_payload = {
-                    "client_id": client_id,
-                    "client_secret": client_secret,
-                    "refresh_token": refresh_token,
-                    "grant_type": "refresh_token"
-                }
-                token_res = requests.post(token_url, data=token_payload, timeout=10)
-                if token_res.status_code == 200:
-                    access_token = token_res.json().get("access_token")
-                    
-                    import base64
-                    send_url = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
+                throttle.acquire_sync("provider:gmail_api")
+                access_token = gmail_tokens.get_token_sync()
+                if access_token:
                     headers = {
                         "Authorization": f"Bearer {access_token}",
                         "Content-Type": "application/json"
                     }
-                    
-                    msg = MIMEMultipart()
-                    msg['To'] = to_email
-                    from_addr = f'"admitconnectAI" <{gmail_user}>' if gmail_user else f'"admitconnectAI" <{settings.FROM_EMAIL}>'
-                    msg['From'] = from_addr
-                    msg['Subject'] = subject
-                    
-                    if is_html:
-                        msg.attach(MIMEText(final_content, 'html'))
-                    else:
-                        msg.attach(MIMEText(final_content, 'plain'))
-                        
-                    raw_msg = base64.urlsafe_b64encode(msg.as_bytes()).decode('utf-8')
-                    send_payload = {"raw": raw_msg}
-                    
-                    send_res = requests.post(send_url, json=send_payload, headers=headers, timeout=10)
+                    send_payload = _gmail_raw_message(to_email, subject, final_content, is_html, gmail_user)
+                    send_res = requests.post(GMAIL_SEND_URL, json=send_payload, headers=headers, timeout=10)
                     if send_res.status_code == 200:
                         print(f"DEBUG: Gmail REST API Success to {to_email}")
                         subscription_service.log_usage(user_id, "email_sent", 1)
                         return "sent_gmail_api"
                     else:
+                        if send_res.status_code == 401:
+                            gmail_tokens.invalidate()
                         print(f"DEBUG: Gmail REST API Send Failed: {send_res.status_code} - {send_res.text}")
-                else:
-                    print(f"DEBUG: Gmail OAuth Refresh Failed: {token_res.status_code} - {token_res.text}")
             except Exception as e:
                 print(f"DEBUG: Gmail REST API Exception: {e}")
 
-        # 2. OPTION B: Google Apps Script Web App Relay (100% Free, Bypasses firewall, Real Gmail Sender, No SMTP block)
-        gas_url = getattr(settings, "GOOGLE_APPS_SCRIPT_URL", None)
-        if gas_url:
+        # 2-5. HTTP provider failover (Apps Script, Resend, Brevo, SendGrid)
+        for spec in _email_api_requests(to_email, subject, final_content, is_html):
             try:
-                print(f"DEBUG: Attempting Google Apps Script Relay to {to_email}...")
-                import json
-                payload = {
-                    "to": to_email,
-                    "subject": subject,
-                    "body": final_content,
-                    "isHtml": is_html
-                }
-                headers = {"Content-Type": "application/json"}
-                response = requests.post(gas_url, data=json.dumps(payload), headers=headers, timeout=15)
-                if response.status_code in [200, 201]:
-                    print(f"DEBUG: Google Apps Script Relay Success to {to_email}")
+                print(f"DEBUG: Attempting {spec['name']} to {to_email}...")
+                throttle.acquire_sync(spec["bucket"])
+                kwargs = dict(spec["kwargs"])
+                if "content" in kwargs:
+                    kwargs["data"] = kwargs.pop("content")
+                response = requests.post(spec["url"], timeout=spec["timeout"], **kwargs)
+                if response.status_code in spec["ok"]:
+                    print(f"DEBUG: {spec['name']} Success to {to_email}")
                     subscription_service.log_usage(user_id, "email_sent", 1)
-                    return "sent_apps_script"
+                    return spec["status"]
                 else:
-                    print(f"DEBUG: Google Apps Script Relay Failed: {response.status_code} - {response.text}")
+                    print(f"DEBUG: {spec['name']} Failed: {response.status_code} - {response.text}")
             except Exception as e:
-                print(f"DEBUG: Google Apps Script Relay Exception: {e}")
+                print(f"DEBUG: {spec['name']} Exception: {e}")
+
+        # 6. FALLBACK: SMTP
+        if gmail_user and gmail_password:
+            if _send_smtp(to_email, subject, final_content, is_html, gmail_user, gmail_password):
+                subscription_service.log_usage(user_id, "email_sent", 1)
+                return "sent_smtp"
+
+        # If we get here, all methods failed
+        print(f"❌ FAILED: All email methods failed for {to_email}")
+        return "failed_all_methods"
+            
+    except Exception as e:
+        print(f"Email Exception: {e}")
+        return f"error_{str(e)}"
 
-        # 3. OPTION C: Resend API (HTTP 443)
-        resend_key = getattr(settings, "RESEND_API_KEY", None)
-        if resend_key:
-            try:
-                print(f"DEBUG: Attempting Resend API to {to_email}...")
-                url = "https://api.resend.com/emails"
-                headers = {
-                    "Authorization": f"Bearer {resend_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "onboarding@resend.dev"
-                if "onboarding@resend.dev" in from_email or not settings.FROM_EMAIL:
-                    from_email = "onboarding@resend.dev"
-                    
-                payload = {
-                    "from": f'"admitconnectAI" <{from_email}>',
-                    "to": to_email,
-                    "subject": subject,
-                    "html": final_content if is_html else None,
-                    "text": final_content if not is_html else None
-                }
-                response = requests.post(url, json=payload, headers=headers, timeout=10)
-                if response.status_code in [200, 201, 202]:
-                    print(f"DEBUG: Resend API Success to {to_email}")
-                    subscription_service.log_usage(user_id, "email_sent", 1)
-                    return "sent_resend"
-                else:
-                    print(f"DEBUG: Resend API Failed: {response.status_code} - {response.text}")
-            except Exception as e:
-                print(f"DEBUG: Resend API Exception: {e}")
 
-        # 4. OPTION D: Brevo API (HTTP 443)
-        brevo_key = getattr(settings, "BREVO_API_KEY", None)
-        if brevo_key:
+async def send_email_async(to_email: str, subject: str, body: str, html_content: str = None, user_id: str = "default_user", quota=None) -> str:
+    """
+    Async send_email with the same provider failover order. HTTP providers go
+    through the shared keep-alive pool; only the last-resort SMTP fallback
+    (blocking smtplib) still runs in a thread.
+    `quota` is the campaign's QuotaReservation for "email_sent", if any.
+    """
+    return await _metered_send(user_id, "email_sent", quota, lambda: _deliver_email_async(to_email, subject, body, html_content))
+
+
+async def _deliver_email_async(to_email: str, subject: str, body: str, html_content: str = None) -> str:
+    try:
+        final_content = html_content if html_content else body
+        is_html = True if html_content or "<html>" in final_content or "<br>" in final_content else False
+        gmail_user, gmail_password = _gmail_credentials()
+        client = http_pool.get()
+
+        if _gmail_token_payload():
             try:
-                print(f"DEBUG: Attempting Brevo API to {to_email}...")
-                url = "https://api.brevo.com/v3/smtp/email"
-                headers = {
-                    "accept": "application/json",
-                    "api-key": brevo_key,
-                    "content-type": "application/json"
-                }
-                from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "noreply@admitai.com"
-                payload = {
-                    "sender": {"name": "admitconnectAI", "email": from_email},
-                    "to": [{"email": to_email}],
-                    "subject": subject,
-                    "htmlContent": final_content if is_html else None,
-                    "textContent": final_content if not is_html else None
-                }
-                response = requests.post(url, json=payload, headers=headers, timeout=10)
-                if response.status_code in [200, 201, 202]:
-                    print(f"DEBUG: Brevo API Success to {to_email}")
-                    subscription_service.log_usage(user_id, "email_sent", 1)
-                    return "sent_brevo"
-                else:
-                    print(f"DEBUG: Brevo API Failed: {response.status_code} - {response.text}")
+                await throttle.acquire("provider:gmail_api")
+                access_token = await gmail_tokens.get_token()
+                if access_token:
+                    headers = {
+                        "Authorization": f"Bearer {access_token}",
+                        "Content-Type": "application/json"
+                    }
+                    send_payload = _gmail_raw_message(to_email, subject, final_content, is_html, gmail_user)
+                    send_res = await client.post(GMAIL_SEND_URL, json=send_payload, headers=headers, timeout=10)
+                    if send_res.status_code == 200:
+                        return "sent_gmail_api"
+                    if send_res.status_code == 401:
+                        await gmail_tokens.invalidate_async()
+                    print(f"DEBUG: Gmail REST API Send Failed: {send_res.status_code} - {send_res.text}")
             except Exception as e:
-                print(f"DEBUG: Brevo API Exception: {e}")
+                print(f"DEBUG: Gmail REST API Exception: {e}")
 
-        # 5. OPTION E: SendGrid API (HTTP 443)
-        sg_key = getattr(settings, "SENDGRID_API_KEY", None)
-        if sg_key:
+        for spec in _email_api_requests(to_email, subject, final_content, is_html):
             try:
-                print(f"DEBUG: Attempting SendGrid API to {to_email}")
-                url = "https://api.sendgrid.com/v3/mail/send"
-                headers = {
-                    "Authorization": f"Bearer {sg_key}",
-                    "Content-Type": "application/json"
-                }
-                from_email = settings.FROM_EMAIL if settings.FROM_EMAIL else "noreply@admitai.com"
-                payload = {
-                    "personalizations": [{"to": [{"email": to_email}]}],
-                    "from": {"email": from_email, "name": "admitconnectAI"},
-                    "subject": subject,
-                    "content": [{"type": "text/html" if is_html else "text/plain", "value": final_content}]
-                }
-                response = requests.post(url, json=payload, headers=headers, timeout=10)
-                if response.status_code in [200, 201, 202]:
-                    print(f"DEBUG: SendGrid API Success to {to_email}")
-                    subscription_service.log_usage(user_id, "email_sent", 1)
-                    return "sent_sendgrid"
-                else:
-                    print(f"DEBUG: SendGrid API Failed: {response.status_code} - {response.text}")
+                await throttle.acquire(spec["bucket"])
+                response = await client.post(spec["url"], timeout=spec["timeout"], **spec["kwargs"])
+                if response.status_code in spec["ok"]:
+                    return spec["status"]
+                print(f"DEBUG: {spec['name']} Failed: {response.status_code} - {response.text}")
             except Exception as e:
-                print(f"DEBUG: SendGrid API Exception: {e}")
+                print(f"DEBUG: {spec['name']} Exception: {e}")
 
-        # 6. FALLBACK: SMTP (Gmail SSL - Works locally, fails on Render Free tier due to port block)
         if gmail_user and gmail_password:
-            try:
-                print(f"DEBUG: Attempting SMTP (Fallback) to {to_email} via {gmail_user} | Subject: {subject}")
-                import email.utils
-                smtp_host = 'smtp.gmail.com'
-                smtp_port = 465
-                
-                msg = MIMEMultipart()
-                msg['From'] = f'"admitconnectAI" <{gmail_user}>'
-                msg['To'] = to_email
-                msg['Subject'] = subject
-                msg['Date'] = email.utils.formatdate(localtime=True)
-                msg['Message-ID'] = email.utils.make_msgid()
-                msg['X-Mailer'] = "AdmitAI-Mailer/1.0"
-                msg['X-Priority'] = "3"
-                
-                if is_html:
-                    msg.attach(MIMEText(final_content, 'html'))
-                else:
-                    msg.attach(MIMEText(final_content, 'plain'))
-                
-                server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=5)
-                server.login(gmail_user, gmail_password)
-                text = msg.as_string()
-                server.sendmail(gmail_user, to_email, text)
-                server.quit()
-                print(f"DEBUG: SMTP Send Success to {to_email}")
-                subscription_service.log_usage(user_id, "email_sent", 1)
+            if await asyncio.to_thread(_send_smtp, to_email, subject, final_content, is_html, gmail_user, gmail_password):
                 return "sent_smtp"
-            except Exception as e:
-                print(f"DEBUG: SMTP Failed: {e}")
-                print(f"DEBUG: SMTP error details: {e}")
 
-        # If we get here, all methods failed
         print(f"❌ FAILED: All email methods failed for {to_email}")
         return "failed_all_methods"
-            
+
     except Exception as e:
         print(f"Email Exception: {e}")
         return f"error_{str(e)}"
@@ -73,7 +73,7 @@ def aggregate_channel_metrics(executions: List[Dict]) -> List[Dict]:
 # ----------------------------------------------
 
 @router.get("/engagement")
-@cache_response(ttl=60, key_prefix="analytics_engagement")
+@cache_response(ttl=60, key_prefix="analytics_engagement", stale_ttl=300, negative_ttl=10)
 async def get_candidate_engagement(current_user: User = Depends(get_current_user)):
     """
     Returns candidate engagement metrics (Interested vs Others)
@@ -100,7 +100,7 @@ async def get_candidate_engagement(current_user: User = Depends(get_current_user
         return {"error": str(e)}
 
 @router.get("/agent/dashboard")
-@cache_response(ttl=60, key_prefix="analytics_agent")
+@cache_response(ttl=60, key_prefix="analytics_agent", stale_ttl=300, negative_ttl=10)
 async def get_agent_analytics(time_range: str = "7d", current_user: User = Depends(get_current_user)):
     """
     New Endpoint for Agent Analytics Dashboard.
@@ -159,7 +159,7 @@ async def get_agent_analytics(time_range: str = "7d", current_user: User = Depen
         return {"error": str(e)}
 
 @router.get("")
-@cache_response(ttl=60, key_prefix="analytics_main")
+@cache_response(ttl=60, key_prefix="analytics_main", stale_ttl=300, negative_ttl=10)
 async def get_analytics(campaign_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
     try:
         # Optimized V3: Move heavy aggregation to Database RPC
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import traceback
+import json
 from app.data.supabase_client import supabase
 from app.ai.tools import tools 
 from app.workflows.campaign_agno import CampaignAgno
-from app.ai.models.llm_generation import generate_personalized_content
 from app.workflows.task_queue import task_queue
+from app.core.cache import cache
+from app.core.config import settings
+from app.workflows.campaign_checkpoint import CampaignCheckpoint
+from app.workflows.campaign_progress import CampaignProgress, get_progress, subscribe_progress, FINAL_STATUSES
+from app.workflows.campaign_providers import get_providers
+from app.workflows.campaign_pipeline import CampaignPipeline
+from app.services.quota_reservation import reserve_campaign_quota, settle_campaign_quota
+from app.services.subscription_service import SubscriptionService
+from app.data.contact_index import ContactIndex, contact_keys, suppress, unsuppress
 import time
 
 router = APIRouter()
@@ -17,6 +27,12 @@ class CampaignRequest(BaseModel):
     name: Optional[str] = None
     channels: Optional[List[str]] = ["email", "whatsapp"]
     target_audience: Optional[str] = "all" 
+    # "personalized" = one LLM call per recipient; "batched" = unique messages for several recipients per call;
+    # "cohort" = one call per (city, course, channel), rendered per recipient
+    generation_mode: Optional[str] = "personalized"
+    cohort_variants: Optional[int] = 1
+    # Skip contacts this account delivered to within the last N hours (None = settings default, 0 = off)
+    contact_window_hours: Optional[float] = None
 
 class ExecutionRequest(BaseModel):
     campaign_id: str
@@ -37,119 +53,111 @@ logging.basicConfig(
     ]
 )
 
+import asyncio
 import concurrent.futures
 
-async def process_recipient(recipient: dict, campaign_id: str, channels: list, campaign_data: dict, user_id: str = "default_user") -> dict:
+# Columns the pipeline stages actually read; avoids shipping full rows for large audiences
+RECIPIENT_COLUMNS = "id, name, email, phone, city, course"
+RECIPIENT_PAGE_SIZE = 500
+
+
+async def iter_campaign_recipients(campaign_id: str, campaign_data: dict, page_size: int = RECIPIENT_PAGE_SIZE, after_id: Optional[str] = None):
     """
-    Helper function to process a single recipient for a campaign.
-    Returns a dict with success/failure status.
+    Streams the campaign audience from `candidates` page by page.
+    Keyset pagination (id > last_id ORDER BY id) keeps every page an index
+    range scan and never hits PostgREST's row cap the way one big select did.
+    `after_id` resumes from a checkpoint cursor.
     """
-    try:
-        r_phone = recipient.get("phone")
-        r_email = recipient.get("email")
-        logging.info(f"Processing: {recipient.get('name')} | Email: {r_email} | Phone: {r_phone}")
-        
-        email_subject = "Admit AI Update"
-        email_msg = ""
-        whatsapp_msg = ""
-        
-        meta = campaign_data.get("metadata", {})
-        ai_prompt = meta.get("ai_prompt", "")
-        static_body = meta.get("template_body", "Hello! We have an update for you.")
-        
-        # Content Generation
-        if ai_prompt:
-            try:
-                primary_channel = "email" if "email" in channels else "whatsapp"
-                # Use Campaign Goal + Recipient Context for Link Search
-                search_query = f"{ai_prompt} {recipient.get('college', '')}".strip()
-                # If prompt is too long, maybe just use first 50 chars? Tavily handles long queries okay usually.
-                # Ensuring we ask for an "Official website" helps.
-                verified_link = tools.get_verified_link(f"Official website {search_query}")
-                logging.info(f"Verified Link Found: {verified_link}")
-                
-                # ASYNC Generation Call
-                generated_response = await generate_personalized_content(recipient, ai_prompt, primary_channel, verified_link, sender_name=campaign_data.get("sender_name", "Admit AI Team"))
-                    
-                email_msg = generated_response
-                whatsapp_msg = generated_response
-                
-                if primary_channel == "email":
-                    if "SUBJECT:" in generated_response and "BODY:" in generated_response:
-                        parts = generated_response.split("BODY:")
-                        email_subject = parts[0].replace("SUBJECT:", "").strip()
-                        email_msg = parts[1].strip()
-                    else:
-                        email_subject = "Information for You"
-                    whatsapp_msg = f"{email_subject}. Check your email for details."
-            except Exception as e:
-                logging.error(f"AI Generation Failed for {r_email}: {e}")
-                print(f"AI Gen Error: {e}")
-                # Fallback
-                email_msg = static_body or "Hello, please check our updates."
-                whatsapp_msg = email_msg
-        else:
-            email_msg = static_body.replace("{{name}}", recipient.get("name", "Student"))
-            whatsapp_msg = email_msg[:160]
+    meta = campaign_data.get("metadata", {}) or {}
+    target_audience = meta.get("target_audience", "all")
+    target_audience_clean = target_audience.strip().lower() if isinstance(target_audience, str) else "all"
+    owner_id = campaign_data.get("user_id")
 
-        success = False
-        
-        # WhatsApp
-        if ("whatsapp" in channels) and r_phone:
-            try:
-                # TODO: If tools.send_whatsapp_message is slow, wrap in run_in_threadpool
-                import asyncio
-                wa_status = await asyncio.to_thread(tools.send_whatsapp_message, r_phone, whatsapp_msg, user_id=user_id)
-                
-                db_status = "delivered" if "sent" in wa_status else "failed"
-                supabase.table("campaign_executions").insert({
-                    "campaign_id": campaign_id, "channel": "whatsapp", "status": db_status,
-                    "recipient": r_phone, "message_content": whatsapp_msg
-                }).execute()
-                
-                if "sent" in wa_status:
-                    logging.info(f"WhatsApp SENT to {r_phone}")
-                    success = True
-                else:
-                    logging.error(f"WhatsApp FAILED to {r_phone}: {wa_status}")
-            except Exception as e:
-                logging.error(f"WhatsApp Failed to {r_phone}: {e}")
-                
-        # Email
-        if ("email" in channels):
-            if r_email:
-                try:
-                    logging.info(f"Sending Email to {r_email}...")
-                    
-                    import asyncio
-                    status = await asyncio.to_thread(tools.send_email, r_email, email_subject, email_msg, html_content=email_msg, user_id=user_id)
-                    logging.info(f"Email Status: {status}")
-                    
-                    db_status = "delivered" if "sent" in status else "failed"
-                    supabase.table("campaign_executions").insert({
-                        "campaign_id": campaign_id, "channel": "email", "status": db_status,
-                        "recipient": r_email, "message_content": email_msg
-                    }).execute()
-                    
-                    if "sent" in status:
-                        success = True
-                except Exception as e:
-                    logging.error(f"Email Exception for {r_email}: {e}")
-            else:
-                logging.warning(f"Skipping Email: No email address for {recipient.get('name')}")
+    def base_query():
+        query = supabase.table("candidates").select(RECIPIENT_COLUMNS)
+        if target_audience_clean in ["all", "all candidates", "all_candidates", "everyone", "any"]:
+            # ALL candidates for this user
+            return query.eq("user_id", owner_id)
+        if isinstance(target_audience, str) and target_audience.startswith("tag:"):
+            # By Tag
+            return query.cs("tags", [target_audience.split("tag:")[1]])
+        # Fallback: Tag with campaign_id
+        return query.cs("tags", [f"campaign:{campaign_id}"])
+
+    if target_audience_clean in ["all", "all candidates", "all_candidates", "everyone", "any"] and not owner_id:
+        logging.warning(f"No owner_id found for campaign {campaign_id}")
+        return
+
+    last_id = after_id
+    while True:
+        query = base_query()
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        res = await asyncio.to_thread(query.order("id").limit(page_size).execute)
+        rows = res.data or []
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+async def dedupe_recipients(recipients):
+    """
+    Drops repeat contacts as the stream flows, keyed by the primary
+    identifier (email, else phone) normalized to case / E.164. Recipients
+    that only share a secondary identifier (two students, one parent phone)
+    are both kept; the pipeline skips the repeated channel per send.
+    Identifiers that do not normalize are kept and deduplicated as given.
+    Only identifiers are retained.
+    """
+    seen_contacts = set()
+    unnormalized = 0
+    async for r in recipients:
+        keys = contact_keys(r)
+        if keys:
+            key = keys[0]
+        else:
+            identifier = str(r.get("email") or r.get("phone") or "").strip()
+            if not identifier:
+                continue
+            key = f"raw:{identifier}"
+            unnormalized += 1
+        if key not in seen_contacts:
+            seen_contacts.add(key)
+            yield r
+    if unnormalized:
+        logging.warning(f"{unnormalized} recipients had no valid email/phone; deduplicated by their raw identifier")
 
-        return {"success": success}
 
-    except Exception as inner_e:
-        logging.error(f"Critical Worker Error for recipient {recipient}: {inner_e}")
-        return {"success": False}
+async def _iter_list(items: list):
+    for item in items:
+        yield item
 
 
-async def run_campaign_execution(campaign_id: str, campaign_data: dict = None, recipients: list = None):
+async def run_campaign_execution(campaign_id: str, campaign_data: dict = None, recipients: list = None, workers: Optional[Dict[str, int]] = None):
     """
-    Executes a campaign using Parallel Async & Batch Processing.
-    Optimization: O(N) Sequential -> O(N/10) Parallel, Batch DB Inserts.
+    Executes a campaign through the staged pipeline (CampaignPipeline).
+    Recipients are streamed and deduplicated page by page into bounded stage
+    queues (resolve, generate, send_whatsapp, send_email, log), each with its
+    own worker pool (`workers` overrides the settings per stage), so memory
+    stays bounded regardless of audience size.
+    Progress is checkpointed (cursor + sent ledger); a retried run after a
+    crash skips completed recipients and continues from the cursor.
+    Live counters (CampaignProgress) are streamed to subscribers as the run
+    goes and provide the final campaign stats.
+    Plan quota is reserved for the run up front and settled at the end, so
+    sends make no per-message subscription queries.
+    Returns the per-stage pipeline stats.
     """
+    providers = get_providers()
+    checkpoint = CampaignCheckpoint(campaign_id)
+    progress = CampaignProgress(campaign_id)
+    quotas = {}
+    if not providers.persist:
+        # Simulated runs keep their progress in process memory only
+        checkpoint.redis = None
+        progress.redis = None
     try:
         logging.info(f"START: Execution for {campaign_id}")
         
@@ -169,90 +177,77 @@ async def run_campaign_execution(campaign_id: str, campaign_data: dict = None, r
                 except: pass
             
             campaign_data["sender_name"] = sender_name
+            cursor = await checkpoint.load()
+            source = iter_campaign_recipients(campaign_id, campaign_data, after_id=cursor)
+        else:
+            await checkpoint.load()
+            source = _iter_list(recipients)
 
-            meta = campaign_data.get("metadata", {}) or {}
-            target_audience = meta.get("target_audience", "all")
-            
-            target_audience_clean = target_audience.strip().lower() if isinstance(target_audience, str) else "all"
-            
-            if target_audience_clean in ["all", "all candidates", "all_candidates", "everyone", "any"]:
-                # Fetch ALL candidates for this user
-                owner_id = campaign_data.get("user_id")
-                if owner_id:
-                     cand_res = supabase.table("candidates").select("*").eq("user_id", owner_id).execute()
-                     recipients = cand_res.data
-                else:
-                     logging.warning(f"No owner_id found for campaign {campaign_id}")
-                     recipients = []
-            elif target_audience.startswith("tag:"):
-                # Fetch by Tag
-                tag = target_audience.split("tag:")[1]
-                cand_res = supabase.table("candidates").select("*").cs("tags", [tag]).execute()
-                recipients = cand_res.data
-            else:
-                # Fallback: Tag with campaign_id
-                tag_filter = f"campaign:{campaign_id}"
-                cand_res = supabase.table("candidates").select("*").cs("tags", [tag_filter]).execute()
-                recipients = cand_res.data
-            
-            if not recipients:
-                 logging.warning(f"No candidates found for {campaign_id} (Target: {target_audience})")
-                 return
+        # Resolve each upcoming window's distinct link queries before dispatch
+        ai_prompt = (campaign_data.get("metadata", {}) or {}).get("ai_prompt", "")
+        stream = providers.link_resolver.prefetch_stream(dedupe_recipients(source), ai_prompt)
+        first = await anext(stream, None)
+        if first is None:
+            target_audience = (campaign_data.get("metadata", {}) or {}).get("target_audience", "all")
+            logging.warning(f"No candidates found for {campaign_id} (Target: {target_audience})")
+            return
 
-        logging.info(f"Recipients found: {len(recipients)}")
-        
-        # Deduplication
-        unique_recipients = []
-        seen_contacts = set()
-        
-        for r in recipients:
-            # Identifier: Email or Phone
-            identifier = r.get("email") or r.get("phone")
-            if identifier and identifier not in seen_contacts:
-                seen_contacts.add(identifier)
-                unique_recipients.append(r)
-        
-        logging.info(f"Unique Recipients: {len(unique_recipients)}")
-        supabase.table("campaigns").update({"status": "active"}).eq("id", campaign_id).execute()
+        # Counters carry over from the crashed attempt when resuming
+        await progress.start(resume=checkpoint.resuming)
+
+        if providers.persist:
+            supabase.table("campaigns").update({"status": "active"}).eq("id", campaign_id).execute()
         
         channels = campaign_data.get("channels", []) or ["email"]
         
-        # Parallel Execution with Semaphore to limit concurrency
-        import asyncio
-        semaphore = asyncio.Semaphore(10) # Process 10 candidates at a time
-        
-        async def protected_process(recipient):
-            async with semaphore:
-                try:
-                    result = await process_recipient(recipient, campaign_id, channels, campaign_data, user_id=campaign_data.get("user_id", "default_user"))
-                    return result
-                except Exception as e:
-                    logging.error(f"Error processing {recipient.get('email', 'unknown')}: {e}")
-                    return {"success": False}
-
-        # Wait for all async tasks
-        results = await asyncio.gather(*[protected_process(r) for r in unique_recipients])
-        
-        # --- Update Campaign Stats (Accurate Sync) ---
-        # Instead of trusting the volatile return values, we count what was actually logged to DB.
-        
-        # 1. Count Messages (Email + Whatsapp)
-        res_msgs = supabase.table("campaign_executions") \
-            .select("id", count="exact", head=True) \
-            .eq("campaign_id", campaign_id) \
-            .in_("channel", ["email", "whatsapp"]) \
-            .eq("status", "delivered") \
-            .execute()
-        count_msgs = res_msgs.count or 0
-
-        # 2. Count Calls (Voice)
-        res_calls = supabase.table("campaign_executions") \
-            .select("id", count="exact", head=True) \
-            .eq("campaign_id", campaign_id) \
-            .eq("channel", "voice") \
-            .eq("status", "completed") \
-            .execute()
-        count_calls = res_calls.count or 0
+        contacts = None
+        tenant_weight = 1
+        if providers.persist:
+            # Plan weight for the fair-share scheduler
+            tenant_weight = await asyncio.to_thread(SubscriptionService.get_scheduler_weight, campaign_data.get("user_id"))
+            # Reserve plan quota once instead of checking it per message
+            quotas = await reserve_campaign_quota(campaign_data.get("user_id", "default_user"), channels)
+            # Opt-outs and the recent-contact window; a resumed run leaves
+            # its own earlier deliveries to the checkpoint ledger
+            window_hours = (campaign_data.get("metadata", {}) or {}).get("contact_window_hours")
+            window_hours = settings.CONTACT_RECENT_WINDOW_HOURS if window_hours is None else float(window_hours)
+            contacts = ContactIndex(campaign_data.get("user_id"), recent_window=0 if checkpoint.resuming else window_hours * 3600)
+            await contacts.load()
+
+        # Send rates are enforced per channel/provider by the throttle buckets;
+        # stage workers bound concurrency, stage queues bound memory
+        pipeline = CampaignPipeline(campaign_id, campaign_data, channels, checkpoint=checkpoint, progress=progress, workers=workers, quotas=quotas, contacts=contacts, tenant_weight=tenant_weight)
+        pipeline.start()
+        try:
+            # A full resolve queue pauses the page fetcher too
+            await pipeline.submit(first)
+            async for recipient in stream:
+                await pipeline.submit(recipient)
+        finally:
+            # Wait for the tail of in-flight recipients
+            stage_stats = await pipeline.drain()
+        logging.info(f"Unique Recipients processed: {pipeline.submitted}")
+        if contacts and contacts.skipped:
+            logging.info(f"Skipped by contact index: {contacts.skipped}")
+        # Record what was used and refund the rest of the reservation
+        settled = await settle_campaign_quota(quotas)
+        if settled:
+            logging.info(f"Quota settled: {settled}")
+
+        # Persist every buffered execution row before reporting completion
+        await providers.execution_log.flush()
+        totals = await progress.finish("completed")
+
+        if not providers.persist:
+            logging.info(f"SIMULATION FINISHED: {campaign_id}")
+            await checkpoint.clear()
+            return stage_stats
+
+        # --- Update Campaign Stats ---
+        # Taken from the live counters (they include any resumed attempt),
+        # so completion no longer scans campaign_executions.
+        count_msgs = totals.get("email_sent", 0) + totals.get("whatsapp_sent", 0)
+        count_calls = totals.get("voice_sent", 0)
 
         supabase.table("campaigns").update({
             "status": "completed", 
@@ -262,11 +257,25 @@ async def run_campaign_execution(campaign_id: str, campaign_data: dict = None, r
         }).eq("id", campaign_id).execute()
         
         logging.info(f"CAMPAIGN FINISHED: Msgs={count_msgs}, Calls={count_calls}")
+        await checkpoint.clear()
+
+        # Drop cached dashboards/analytics that predate this run
+        await cache.invalidate_tags(f"user:{campaign_data.get('user_id')}", f"campaign:{campaign_id}")
+        return stage_stats
 
     except Exception as e:
         logging.critical(f"FATAL CAMPAIGN ERROR: {e}")
         try:
-             supabase.table("campaigns").update({"status": "completed"}).eq("id", campaign_id).execute()
+             await providers.execution_log.flush()
+             await checkpoint.save()
+             await progress.finish("paused")
+             await settle_campaign_quota(quotas)
+        except Exception: pass
+        if not providers.persist:
+            return
+        # Paused (not completed): a retry resumes from the checkpoint
+        try:
+             supabase.table("campaigns").update({"status": "paused"}).eq("id", campaign_id).execute()
         except: pass
 
 
@@ -294,7 +303,11 @@ async def create_campaign_endpoint(request: CampaignRequest, background_tasks: B
             "type": "personalized", 
             "channels": request.channels or ["email", "whatsapp"], 
             "messages_sent": 0,
-            "metadata": {"ai_plan": str(plan_result), "ai_prompt": request.goal, "target_audience": request.target_audience}
+            "metadata": {
+                "ai_plan": str(plan_result), "ai_prompt": request.goal, "target_audience": request.target_audience,
+                "generation_mode": request.generation_mode or "personalized", "cohort_variants": request.cohort_variants or 1,
+                "contact_window_hours": request.contact_window_hours,
+            }
         }
         res = supabase.table("campaigns").insert(data).execute()
         campaign_id = res.data[0]['id']
@@ -333,13 +346,103 @@ async def execute_campaign_endpoint(request: ExecutionRequest, background_tasks:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class SuppressionRequest(BaseModel):
+    contact: str
+    reason: Optional[str] = "opt_out"
+
+
+@router.post("/suppressions")
+async def add_suppression_endpoint(request: SuppressionRequest, current_user: User = Depends(get_current_user)):
+    """Stops every future campaign of this account from contacting the email / phone."""
+    key = await suppress(request.contact, user_id=current_user.id, reason=request.reason or "opt_out")
+    if not key:
+        raise HTTPException(status_code=400, detail="Not a valid email address or phone number")
+    return {"success": True, "contact_key": key}
+
+
+@router.delete("/suppressions/{contact}")
+async def remove_suppression_endpoint(contact: str, current_user: User = Depends(get_current_user)):
+    key = await unsuppress(contact, user_id=current_user.id)
+    if not key:
+        raise HTTPException(status_code=400, detail="Not a valid email address or phone number")
+    return {"success": True, "contact_key": key}
+
+
+# Idle seconds between SSE heartbeat comments (keeps proxies from closing the stream)
+PROGRESS_HEARTBEAT = 15
+
+
+async def _require_owned_campaign(campaign_id: str, user_id: str):
+    """404 unless the campaign exists and belongs to the user."""
+    res = await asyncio.to_thread(
+        lambda: supabase.table("campaigns").select("id").eq("id", campaign_id).eq("user_id", user_id).execute()
+    )
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+
+@router.get("/{campaign_id}/progress")
+async def campaign_progress_endpoint(campaign_id: str, current_user: User = Depends(get_current_user)):
+    await _require_owned_campaign(campaign_id, current_user.id)
+    return {"success": True, "campaign_id": campaign_id, "progress": await get_progress(campaign_id)}
+
+
+@router.get("/{campaign_id}/progress/stream")
+async def campaign_progress_stream_endpoint(campaign_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Server-Sent Events: a "snapshot" event with the current counters, then one
+    "progress" event per coalesced delta (each carries the new totals) until
+    the run completes or pauses.
+    """
+    await _require_owned_campaign(campaign_id, current_user.id)
+
+    async def event_stream():
+        events = subscribe_progress(campaign_id)
+        try:
+            # Subscribe before reading the snapshot so no delta falls in between
+            await anext(events, None)
+            snapshot = await get_progress(campaign_id)
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot.get("status") in FINAL_STATUSES:
+                return
+            idle = 0
+            async for event in events:
+                if await request.is_disconnected():
+                    return
+                if event is None:
+                    idle += 1
+                    if idle >= PROGRESS_HEARTBEAT:
+                        idle = 0
+                        yield ": heartbeat\n\n"
+                    continue
+                idle = 0
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                if event.get("status") in FINAL_STATUSES:
+                    return
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.delete("/{campaign_id}")
 async def delete_campaign_endpoint(campaign_id: str):
     try:
+        # Owner first: their candidate lists and analytics are cached under user:{id}
+        owner = supabase.table("campaigns").select("user_id").eq("id", campaign_id).execute()
+        owner_id = owner.data[0].get("user_id") if owner.data else None
         supabase.table("campaign_executions").delete().eq("campaign_id", campaign_id).execute()
         tag_filter = f"campaign:{campaign_id}"
         supabase.table("candidates").delete().cs("tags", [tag_filter]).execute()
         supabase.table("campaigns").delete().eq("id", campaign_id).execute()
+        tags = [f"campaign:{campaign_id}"]
+        if owner_id:
+            tags.append(f"user:{owner_id}")
+        await cache.invalidate_tags(*tags)
         return {"success": True, "message": "Campaign deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
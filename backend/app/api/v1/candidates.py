@@ -6,6 +6,7 @@ import io
 import asyncio
 from app.data.supabase_client import supabase
 from app.security.dependencies import get_current_user, User
+from app.core.cache import cache, cache_response
 
 router = APIRouter()
 
@@ -80,6 +81,8 @@ async def upload_candidates(user_id: str = Form(...), campaign_id: Optional[str]
         if candidates_to_add:
             supabase.table("candidates").insert(candidates_to_add).execute()
             total_count += len(candidates_to_add)
+
+        await cache.invalidate_tags(f"user:{user_id}")
         
         return {"success": True, "count": total_count, "message": "Candidates uploaded successfully"}
 
@@ -120,6 +123,8 @@ async def batch_upload_candidates(request: CandidateBatchRequest):
                      supabase.table("campaigns").update({"candidates_count": new_count}).eq("id", request.campaign_id).execute()
              except Exception:
                  pass
+
+        await cache.invalidate_tags(f"user:{request.user_id}")
         
         return {"success": True, "count": len(candidates_to_add), "message": "Candidates uploaded successfully"}
     except Exception as e:
@@ -128,6 +133,7 @@ async def batch_upload_candidates(request: CandidateBatchRequest):
 # --- New Optimized Endpoints for Thin Frontend ---
 
 @router.get("/distribution/stats")
+@cache_response(ttl=30, key_prefix="candidates_stats", stale_ttl=60)
 async def get_distribution_stats(current_user: User = Depends(get_current_user)):
     """
     Returns aggregated stats for the Data Distribution Layer.
@@ -173,6 +179,7 @@ async def get_distribution_stats(current_user: User = Depends(get_current_user))
         return {"totalCandidates": 0, "readyForDistribution": 0, "inProgress": 0, "completed": 0, "failed": 0}
 
 @router.get("/distribution/list")
+@cache_response(ttl=30, key_prefix="candidates_list", include=("page", "limit", "search", "status"), negative_ttl=5)
 async def get_candidates_list(
     page: int = 1,
     limit: int = 50,
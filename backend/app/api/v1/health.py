@@ -1,5 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from app.core.config import settings
+from app.core.cache import cache
+from app.security.dependencies import verify_internal_token
 
 router = APIRouter()
 
@@ -8,5 +10,21 @@ def health_check():
     return {
         "status": "ok", 
         "service": settings.PROJECT_NAME, 
-        "mode": settings.ENVIRONMENT
+        "mode": settings.ENVIRONMENT,
+        "cache": {"redis_breaker": cache.breaker.snapshot()}
     }
+
+@router.get("/internal/cache/stats", dependencies=[Depends(verify_internal_token)])
+def cache_stats():
+    """
+    Per-prefix cache hit ratios, latency histograms and L1 footprint for this worker.
+    """
+    return cache.stats()
+
+@router.get("/internal/scheduler/stats", dependencies=[Depends(verify_internal_token)])
+def scheduler_stats():
+    """
+    Fair-share scheduler slots per resource, with per-tenant weight, queue and wait latency for this worker.
+    """
+    from app.workflows.fair_scheduler import fair_scheduler
+    return fair_scheduler.stats()
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Request, HTTPException
 from app.workflows.auto_reply import process_inbound_message
+from app.data.contact_index import is_opt_out, suppress
 
 router = APIRouter()
 
@@ -24,7 +25,14 @@ async def whatsapp_webhook(request: Request):
             from_number = message.get("from")
             text = message.get("text", {}).get("body", "")
             
-            if text:
+            if text and is_opt_out(text):
+                # Opt-out reached the shared sending number: suppress for every tenant
+                try:
+                    await suppress(from_number, reason="opt_out_whatsapp")
+                    print(f"[Webhook] Opt-out from {from_number}")
+                except Exception as e:
+                    print(f"[Webhook] Failed to record opt-out from {from_number}: {e}")
+            elif text:
                 # Run Logic
                 print(f"[Webhook] Received msg from {from_number}: {text}")
                 process_inbound_message(from_number, text, source="whatsapp")
@@ -16,7 +16,7 @@ async def contact_endpoint(request: ContactRequest):
         subject = f"Contact Form: {request.name}"
         body = f"Name: {request.name}\nEmail: {request.email}\nMessage:\n{request.message}"
         # Send to configured FROM_EMAIL (admin)
-        status = tools.send_email(settings.FROM_EMAIL, subject, body)
+        status = await tools.send_email_async(settings.FROM_EMAIL, subject, body)
         return {"success": True, "status": status}
     except Exception as e:
         return {"error": str(e)}
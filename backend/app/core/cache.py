@@ -1,137 +1,958 @@
 from typing import Any, Optional
 import json
 import asyncio
+import threading
+import fnmatch
+from collections import OrderedDict
 from functools import wraps
+from typing import Callable, Dict, Iterable, List, Set
 from app.core.config import settings
+from app.core.cache_codec import CacheCodec
+from app.core.circuit_breaker import CircuitBreaker
+from app.observability.metrics import cache_metrics
 import redis.asyncio as redis
 import time
+import uuid
+import hashlib
+import inspect
+import datetime
+import enum
 
 # Re-use connection str
 REDIS_URL = settings.REDIS_URL or "redis://localhost:6379"
 
+# Redis secondary index: one SET of cache keys per tag (e.g. "user:123", "campaign:abc")
+TAG_KEY_PREFIX = "cache:tag:"
+
+# Adds a key to a tag set and only ever extends the set's TTL, so the index
+# outlives every key registered in it.
+_TAG_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+redis.call('SADD', KEYS[1], ARGV[1])
+if redis.call('TTL', KEYS[1]) < ttl then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# Releases a single-flight lock only if we still own it
+_UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+LOCK_KEY_PREFIX = "cache:lock:"
+
+# Max keys/tags remembered for replay after a Redis outage
+DIRTY_LIMIT = 10000
+
+# Pub/sub channel every process listens on to evict its own L1 copies
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Stale-while-revalidate entries are stored as {SWR_FIELD: fresh_until, "value": ...}
+# and kept physically for ttl + stale_ttl.
+SWR_FIELD = "__swr_fresh_until__"
+
+# Distinguishes "not cached" from a cached None/falsy value
+_MISS = object()
+
+
+def _unwrap(raw: Any) -> tuple:
+    """Returns (value, fresh_until); fresh_until is None for plain entries."""
+    if isinstance(raw, dict) and SWR_FIELD in raw:
+        return raw.get("value"), raw[SWR_FIELD]
+    return raw, None
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Approximate in-memory footprint of a cached value, in bytes.
+    Strings/bytes use their length; everything else its JSON length.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return 0
+
+
 class LRUCache:
     """
-    Simple in-memory LRU Cache for O(1) access when Redis is unavailable.
+    Single in-memory LRU shard backed by an OrderedDict.
+    get/set/delete are O(1); eviction pops from the cold end.
+    Bounded by entry count and (optionally) by approximate byte size.
+    `on_remove(key, tags)` fires whenever a tagged entry leaves the shard;
+    `on_evict(key)` fires when an entry is pushed out by a budget.
     """
-    def __init__(self, capacity: int = 100):
+    def __init__(
+        self,
+        capacity: int = 100,
+        max_bytes: int = 0,
+        on_remove: Optional[Callable[[str, tuple], None]] = None,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
         self.capacity = capacity
-        self.cache = {}
-        self.order = [] # Keep track of usage order (end is most recent)
-
-    def get(self, key: str) -> Optional[Any]:
-        if key in self.cache:
-            # Move to end (mark as recently used)
-            self.order.remove(key)
-            self.order.append(key)
-            val, expiry = self.cache[key]
+        self.max_bytes = max_bytes  # 0 = no byte budget
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expiry, size, tags)
+        self.bytes = 0
+        self.evictions = 0
+        self.on_remove = on_remove
+        self.on_evict = on_evict
+        self.lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return default
+            val, expiry, _, _ = entry
+            # Lazy expiry
             if expiry and time.time() > expiry:
-                self.delete(key)
-                return None
+                self._remove(key)
+                return default
+            # Mark as recently used
+            self.cache.move_to_end(key)
             return val
-        return None
-
-    def set(self, key: str, value: Any, ttl: int = 300):
-        if key in self.cache:
-            self.order.remove(key)
-        elif len(self.cache) >= self.capacity:
-            # Evict LRU (first item)
-            oldest = self.order.pop(0)
-            del self.cache[oldest]
-        
-        self.order.append(key)
-        self.cache[key] = (value, time.time() + ttl)
+
+    def set(self, key: str, value: Any, ttl: int = 300, tags: tuple = ()):
+        size = _estimate_size(value)
+        with self.lock:
+            if key in self.cache:
+                self._remove(key)
+            # An entry larger than the whole budget is never admitted
+            if self.max_bytes and size > self.max_bytes:
+                return False
+            self.cache[key] = (value, time.time() + ttl if ttl else 0, size, tags)
+            self.bytes += size
+            # Evict LRU (first items) until both budgets hold
+            while len(self.cache) > self.capacity or (self.max_bytes and self.bytes > self.max_bytes):
+                old_key = next(iter(self.cache))
+                self._remove(old_key)
+                self.evictions += 1
+                if self.on_evict:
+                    self.on_evict(old_key)
+            return True
+
+    def delete(self, key: str):
+        with self.lock:
+            if key in self.cache:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.bytes = 0
+
+    def purge_expired(self) -> int:
+        """Drops every expired entry in this shard. O(shard size)."""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            expired = [k for k, (_, expiry, _, _) in self.cache.items() if expiry and now > expiry]
+            for k in expired:
+                self._remove(k)
+                removed += 1
+        return removed
+
+    def keys(self) -> List[str]:
+        with self.lock:
+            return list(self.cache.keys())
+
+    def sizes(self) -> List[tuple]:
+        """(key, size) for every resident entry."""
+        with self.lock:
+            return [(k, entry[2]) for k, entry in self.cache.items()]
+
+    def _remove(self, key: str):
+        # Caller holds the lock
+        _, _, size, tags = self.cache.pop(key)
+        self.bytes -= size
+        if tags and self.on_remove:
+            self.on_remove(key, tags)
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+class ShardedLRUCache:
+    """
+    Lock-striped L1 cache: keys are hashed onto N independent LRUCache shards,
+    so concurrent callers rarely contend on the same lock.
+    Entry and byte budgets are split evenly across shards.
+    Expiry is lazy (on read) plus a periodic sweep of one shard per interval,
+    piggy-backed on writes so no background task is required.
+    A secondary tag -> keys index allows O(entries-in-tag) invalidation.
+    """
+    def __init__(
+        self,
+        capacity: int = 500,
+        max_bytes: int = 0,
+        shards: int = 16,
+        sweep_interval: int = 30,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.num_shards = max(1, shards)
+        per_shard_capacity = max(1, capacity // self.num_shards)
+        per_shard_bytes = max_bytes // self.num_shards if max_bytes else 0
+        self.shards = [
+            LRUCache(capacity=per_shard_capacity, max_bytes=per_shard_bytes, on_remove=self._untag, on_evict=on_evict)
+            for _ in range(self.num_shards)
+        ]
+        self.tag_index: Dict[str, Set[str]] = {}
+        self._tag_lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.time()
+        self._sweep_cursor = 0
+
+    def _shard(self, key: str) -> LRUCache:
+        return self.shards[hash(key) % self.num_shards]
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        return self._shard(key).get(key, default)
+
+    def set(self, key: str, value: Any, ttl: int = 300, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        if self._shard(key).set(key, value, ttl, tags) and tags:
+            with self._tag_lock:
+                for tag in tags:
+                    self.tag_index.setdefault(tag, set()).add(key)
+        self._maybe_sweep()
 
     def delete(self, key: str):
-        if key in self.cache:
-            del self.cache[key]
-            if key in self.order:
-                self.order.remove(key)
+        self._shard(key).delete(key)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+        with self._tag_lock:
+            self.tag_index.clear()
+
+    def keys_for_tag(self, tag: str) -> Set[str]:
+        with self._tag_lock:
+            return set(self.tag_index.get(tag, ()))
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drops every entry registered under `tag`. O(entries-in-tag)."""
+        with self._tag_lock:
+            keys = self.tag_index.pop(tag, set())
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def invalidate_pattern(self, pattern: str) -> int:
+        """Glob-style fallback. O(total entries) - prefer invalidate_tag."""
+        removed = 0
+        for shard in self.shards:
+            for key in shard.keys():
+                if fnmatch.fnmatchcase(key, pattern):
+                    shard.delete(key)
+                    removed += 1
+        return removed
+
+    def usage_by(self, group: Callable[[str], str]) -> Dict[str, Dict[str, int]]:
+        """Resident entries/bytes grouped by `group(key)`. O(entries); for stats only."""
+        usage: Dict[str, Dict[str, int]] = {}
+        for shard in self.shards:
+            for key, size in shard.sizes():
+                bucket = usage.setdefault(group(key), {"entries": 0, "bytes": 0})
+                bucket["entries"] += 1
+                bucket["bytes"] += size
+        return usage
+
+    def _untag(self, key: str, tags: tuple):
+        with self._tag_lock:
+            for tag in tags:
+                keys = self.tag_index.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.tag_index[tag]
+
+    def purge_expired(self) -> int:
+        """Sweeps every shard. Returns number of entries removed."""
+        return sum(shard.purge_expired() for shard in self.shards)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        # Round-robin one shard per interval to keep the write path cheap
+        shard = self.shards[self._sweep_cursor]
+        self._sweep_cursor = (self._sweep_cursor + 1) % self.num_shards
+        shard.purge_expired()
+
+    @property
+    def bytes(self) -> int:
+        return sum(shard.bytes for shard in self.shards)
+
+    @property
+    def evictions(self) -> int:
+        return sum(shard.evictions for shard in self.shards)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
 
 class CacheService:
     def __init__(self):
         self.use_redis = False
         try:
             if REDIS_URL and "redis" in REDIS_URL:
-                 self.redis = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+                 # Raw bytes: values go through CacheCodec (binary + compression).
+                 # Short socket timeouts so a slow Redis fails fast into the breaker.
+                 self.redis = redis.from_url(
+                     REDIS_URL,
+                     decode_responses=False,
+                     socket_timeout=settings.CACHE_REDIS_SOCKET_TIMEOUT,
+                     socket_connect_timeout=settings.CACHE_REDIS_SOCKET_TIMEOUT,
+                 )
                  self.use_redis = True
         except Exception:
             print("Redis unavailable, using in-memory cache")
+
+        self.codec = CacheCodec(
+            serializer=settings.CACHE_CODEC,
+            compression=settings.CACHE_COMPRESSION,
+            compress_threshold=settings.CACHE_COMPRESS_THRESHOLD,
+        )
         
-        self.memory_cache = LRUCache(capacity=500)
+        self.memory_cache = ShardedLRUCache(
+            capacity=settings.CACHE_L1_MAX_ENTRIES,
+            max_bytes=settings.CACHE_L1_MAX_BYTES,
+            shards=settings.CACHE_L1_SHARDS,
+            sweep_interval=settings.CACHE_L1_SWEEP_INTERVAL,
+            on_evict=lambda key: cache_metrics.incr(key, "evictions"),
+        )
+        self._tag_script = self.redis.register_script(_TAG_SCRIPT) if self.use_redis else None
+        self._unlock_script = self.redis.register_script(_UNLOCK_SCRIPT) if self.use_redis else None
+        # Single-flight: key -> Future of the one in-flight computation in this process
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Strong refs to stale-while-revalidate refresh tasks
+        self._background: Set[asyncio.Task] = set()
+        # Circuit breaker on the Redis tier: L1-only while open, background ping probes recovery
+        self.breaker = CircuitBreaker(
+            "redis_cache",
+            failure_threshold=settings.CACHE_REDIS_BREAKER_FAILURES,
+            latency_threshold=settings.CACHE_REDIS_BREAKER_LATENCY_MS / 1000,
+            reset_timeout=settings.CACHE_REDIS_BREAKER_RESET,
+            probe=self._probe_redis,
+            on_close=self._reconcile_after_outage,
+        )
+        self._dirty_keys: Set[str] = set()
+        self._dirty_tags: Set[str] = set()
+        self._dirty_patterns: Set[str] = set()
+        self._dirty_overflow = False
+        # Invalidation bus: messages we publish carry our id so we skip our own echoes
+        self.instance_id = uuid.uuid4().hex
+        self.broadcast = self.use_redis and settings.CACHE_INVALIDATION_BUS
+        self._listener: Optional[asyncio.Task] = None
+        self._pubsub_client = None
 
     async def get(self, key: str) -> Optional[Any]:
+        raw = await self._lookup(key)
+        if raw is _MISS:
+            return None
+        return _unwrap(raw)[0]
+
+    async def _lookup(self, key: str, record: bool = True) -> Any:
+        """Raw two-tier read. Returns _MISS when absent so falsy values survive."""
+        start = time.perf_counter()
+        result, outcome = _MISS, "misses"
+
         # 1. Check Memory (L1)
-        mem_res = self.memory_cache.get(key)
-        if mem_res: return mem_res
+        mem_res = self.memory_cache.get(key, _MISS)
+        if mem_res is not _MISS:
+            result, outcome = mem_res, "l1_hits"
         
         # 2. Check Redis (L2)
-        if self.use_redis:
+        elif self._redis_ready():
+            data = None
             try:
-                data = await self.redis.get(key)
-                if data:
-                    val = json.loads(data)
-                    # Populate L1 for next time
-                    self.memory_cache.set(key, val, ttl=60) 
-                    return val
+                async with self.breaker.guard():
+                    data = await self.redis.get(key)
             except Exception: pass
-        return None
+            # Decoded outside the guard: a corrupt or legacy payload is a miss, not a Redis failure
+            if data is not None:
+                try:
+                    val = self.codec.decode(data)
+                    # Populate L1 for next time
+                    self.memory_cache.set(key, val, ttl=settings.CACHE_L1_TTL)
+                    result, outcome = val, "l2_hits"
+                except Exception as e:
+                    print(f"Cache decode error for {key}: {e}")
+
+        if record:
+            cache_metrics.incr(key, outcome)
+            cache_metrics.observe(key, "get", (time.perf_counter() - start) * 1000)
+        return result
 
-    async def set(self, key: str, value: Any, ttl: int = 300):
-        # Write to both
-        self.memory_cache.set(key, value, ttl)
-        if self.use_redis:
+    async def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[Iterable[str]] = None):
+        """
+        Writes to both tiers. `tags` (e.g. ["user:123", "campaign:abc"]) register
+        the key in a secondary index so `invalidate_tags` can purge it later.
+        """
+        start = time.perf_counter()
+        tags = list(tags or [])
+        self.memory_cache.set(key, value, ttl, tags=tags)
+        cache_metrics.incr(key, "sets")
+        if self._redis_ready():
             try:
-                await self.redis.set(key, json.dumps(value), ex=ttl)
-            except Exception: pass
+                blob = self.codec.encode(value)
+                cache_metrics.incr(key, "bytes_written", len(blob))
+                async with self.breaker.guard():
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.set(key, blob, ex=ttl)
+                        for tag in tags:
+                            await self._tag_script(keys=[TAG_KEY_PREFIX + tag], args=[key, ttl], client=pipe)
+                        self._publish_invalidation({"keys": [key]}, pipe)
+                        await pipe.execute()
+            except Exception:
+                self._mark_dirty(keys=[key])
+        else:
+            self._mark_dirty(keys=[key])
+        cache_metrics.observe(key, "set", (time.perf_counter() - start) * 1000)
 
     async def delete(self, key: str):
         self.memory_cache.delete(key)
-        if self.use_redis:
+        cache_metrics.incr(key, "deletes")
+        if self._redis_ready():
             try:
-                await self.redis.delete(key)
+                async with self.breaker.guard():
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.delete(key)
+                        self._publish_invalidation({"keys": [key]}, pipe)
+                        await pipe.execute()
+            except Exception:
+                self._mark_dirty(keys=[key])
+        else:
+            self._mark_dirty(keys=[key])
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Batched read: L1 first, then one MGET for the remainder.
+        Returns only the keys that hit; Redis hits are copied into L1.
+        """
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            raw = self.memory_cache.get(key, _MISS)
+            if raw is _MISS:
+                missing.append(key)
+            else:
+                found[key] = _unwrap(raw)[0]
+                cache_metrics.incr(key, "l1_hits")
+
+        if missing and self._redis_ready():
+            blobs = []
+            try:
+                async with self.breaker.guard():
+                    blobs = await self.redis.mget(missing)
             except Exception: pass
+            for key, data in zip(missing, blobs):
+                if data is None:
+                    continue
+                try:
+                    raw = self.codec.decode(data)
+                except Exception as e:
+                    print(f"Cache decode error for {key}: {e}")
+                    continue
+                self.memory_cache.set(key, raw, ttl=settings.CACHE_L1_TTL)
+                found[key] = _unwrap(raw)[0]
+                cache_metrics.incr(key, "l2_hits")
+        for key in missing:
+            if key not in found:
+                cache_metrics.incr(key, "misses")
+        return found
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: int = 300, tags: Optional[Iterable[str]] = None):
+        """Batched write: every key, its tag registrations and one invalidation broadcast in a single pipeline."""
+        tags = list(tags or [])
+        for key, value in mapping.items():
+            self.memory_cache.set(key, value, ttl, tags=tags)
+            cache_metrics.incr(key, "sets")
+        if not mapping:
+            return
+        if self._redis_ready():
+            try:
+                blobs = {key: self.codec.encode(value) for key, value in mapping.items()}
+                async with self.breaker.guard(check_latency=False):
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for key, blob in blobs.items():
+                            cache_metrics.incr(key, "bytes_written", len(blob))
+                            pipe.set(key, blob, ex=ttl)
+                            for tag in tags:
+                                await self._tag_script(keys=[TAG_KEY_PREFIX + tag], args=[key, ttl], client=pipe)
+                        self._publish_invalidation({"keys": list(mapping)}, pipe)
+                        await pipe.execute()
+            except Exception:
+                self._mark_dirty(keys=mapping)
+        else:
+            self._mark_dirty(keys=mapping)
+
+    async def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        for key in keys:
+            self.memory_cache.delete(key)
+            cache_metrics.incr(key, "deletes")
+        if not keys:
+            return
+        if self._redis_ready():
+            try:
+                async with self.breaker.guard():
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.delete(*keys)
+                        self._publish_invalidation({"keys": keys}, pipe)
+                        await pipe.execute()
+            except Exception:
+                self._mark_dirty(keys=keys)
+        else:
+            self._mark_dirty(keys=keys)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: int = 300,
+        tags: Optional[Iterable[str]] = None,
+        distributed: bool = False,
+        stale_ttl: int = 0,
+        negative_ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Returns the cached value or computes it with `loader` (a zero-arg coroutine fn).
+        Concurrent misses for the same key share one in-flight computation per process.
+        With `distributed=True` a Redis lock extends the coalescing across workers:
+        losers poll the cache while the lock holder computes.
+
+        stale_ttl: after `ttl` the value is still served for this many seconds
+                   while a single background task refreshes it.
+        negative_ttl: falsy results (empty dict/list, 0, None) are cached for
+                      this shorter TTL instead of `ttl`; without it they are
+                      not cached at all.
+        """
+        raw = await self._lookup(key)
+        if raw is not _MISS:
+            value, fresh_until = _unwrap(raw)
+            if fresh_until is not None and time.time() >= fresh_until:
+                cache_metrics.incr(key, "stale_served")
+            if fresh_until is not None and time.time() >= fresh_until and key not in self._inflight:
+                # Stale: serve now, revalidate in the background. The in-flight
+                # entry is registered before the task starts, so concurrent
+                # stale reads do not spawn a refresh each
+                future = self._register_inflight(key)
+                task = asyncio.create_task(
+                    self._compute(key, loader, ttl, tags, distributed, stale_ttl, negative_ttl, future=future)
+                )
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+                task.add_done_callback(lambda t: self._abandon_inflight(key, future))
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            cache_metrics.incr(key, "coalesced")
+            result = await asyncio.shield(inflight)
+            if result is not _LEADER_CANCELLED:
+                return result
+            # Leader was cancelled mid-flight; compute for ourselves
+            return await loader()
+
+        return await self._compute(key, loader, ttl, tags, distributed, stale_ttl, negative_ttl)
+
+    def _register_inflight(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception was never retrieved" when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        return future
+
+    def _abandon_inflight(self, key: str, future: asyncio.Future):
+        """Releases waiters of a refresh task that was cancelled before it ran."""
+        if not future.done():
+            future.set_result(_LEADER_CANCELLED)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _compute(self, key, loader, ttl, tags, distributed, stale_ttl, negative_ttl, future=None) -> Any:
+        """Single-flight leader: runs the loader once and publishes the result to waiters."""
+        if future is None:
+            future = self._register_inflight(key)
+
+        async def load_and_store():
+            cache_metrics.incr(key, "loads")
+            value = await loader()
+            await self._store(key, value, ttl, tags, stale_ttl, negative_ttl)
+            return value
+
+        try:
+            if distributed and self._redis_ready():
+                value = await self._load_with_lock(key, load_and_store)
+            else:
+                value = await load_and_store()
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _store(self, key: str, value: Any, ttl: int, tags: Optional[Iterable[str]], stale_ttl: int = 0, negative_ttl: Optional[int] = None):
+        if not value:
+            if negative_ttl is None:
+                return  # Falsy results are not cached unless negative caching is asked for
+            ttl, stale_ttl = negative_ttl, 0
+        if stale_ttl:
+            await self.set(key, {SWR_FIELD: time.time() + ttl, "value": value}, ttl=ttl + stale_ttl, tags=tags)
+        else:
+            await self.set(key, value, ttl=ttl, tags=tags)
+
+    async def _load_with_lock(self, key: str, load_and_store: Callable[[], Any]) -> Any:
+        lock_key = LOCK_KEY_PREFIX + key
+        token = uuid.uuid4().hex
+        timeout = settings.CACHE_SINGLEFLIGHT_LOCK_TIMEOUT
+        acquired = False
+        try:
+            async with self.breaker.guard():
+                acquired = await self.redis.set(lock_key, token, nx=True, ex=timeout)
+            if not acquired:
+                # Another worker is computing: wait for its result, bounded by the lock timeout
+                deadline = time.monotonic() + timeout
+                delay = 0.05
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.5)
+                    raw = await self._lookup(key, record=False)
+                    if raw is not _MISS:
+                        return _unwrap(raw)[0]
+                    if not await self.redis.exists(lock_key):
+                        break
+        except Exception as e:
+            print(f"Cache lock error: {e}")
+
+        try:
+            return await load_and_store()
+        finally:
+            if acquired:
+                try:
+                    await self._unlock_script(keys=[lock_key], args=[token])
+                except Exception: pass
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Purges every entry registered under any of `tags` from L1 and Redis.
+        O(entries-in-tag): reads the tag sets instead of scanning the keyspace.
+        """
+        keys: Set[str] = set()
+        for tag in tags:
+            keys |= self.memory_cache.keys_for_tag(tag)
+            self.memory_cache.invalidate_tag(tag)
+
+        if not tags:
+            return len(keys)
+        if self._redis_ready():
+            try:
+                async with self.breaker.guard():
+                    tag_keys = [TAG_KEY_PREFIX + tag for tag in tags]
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for tag_key in tag_keys:
+                            pipe.smembers(tag_key)
+                        members = await pipe.execute()
+                    for group in members:
+                        keys |= {k.decode() if isinstance(k, bytes) else k for k in (group or ())}
+                    # Keys cached here from L2 reads were never tagged locally
+                    for key in keys:
+                        self.memory_cache.delete(key)
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.delete(*keys, *tag_keys)
+                        self._publish_invalidation({"keys": list(keys), "tags": list(tags)}, pipe)
+                        await pipe.execute()
+            except Exception as e:
+                print(f"Cache tag invalidation error: {e}")
+                self._mark_dirty(tags=tags)
+        else:
+            self._mark_dirty(tags=tags)
+        return len(keys)
 
     async def invalidate(self, pattern: str):
-        # Hard to do pattern match on dict efficiently without O(N) scan
-        # For memory cache, we'll just clear simplistic matches or everything dependent on implementation
-        # For now, just clear Redis
-        if self.use_redis:
-            keys = await self.redis.keys(pattern)
+        """
+        Glob-pattern fallback for keys that were never tagged.
+        Uses incremental SCAN so Redis is not blocked; prefer `invalidate_tags`.
+        """
+        self.memory_cache.invalidate_pattern(pattern)
+        if not self._redis_ready():
+            self._mark_dirty(patterns=[pattern])
+            return
+        async with self.breaker.guard(check_latency=False):
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    await self.redis.delete(*batch)
+                    batch = []
+            if batch:
+                await self.redis.delete(*batch)
+            if self.broadcast:
+                await self.redis.publish(INVALIDATION_CHANNEL, json.dumps({"origin": self.instance_id, "pattern": pattern}))
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for dashboards/TTL tuning: per-prefix counters, latency and L1 footprint."""
+        snapshot = cache_metrics.snapshot(resident=self.memory_cache.usage_by(cache_metrics.prefix_of))
+        snapshot["l1"] = {
+            "entries": len(self.memory_cache),
+            "bytes": self.memory_cache.bytes,
+            "evictions": self.memory_cache.evictions,
+            "max_entries": settings.CACHE_L1_MAX_ENTRIES,
+            "max_bytes": settings.CACHE_L1_MAX_BYTES,
+        }
+        snapshot["redis"] = {"enabled": self.use_redis, "breaker": self.breaker.snapshot()}
+        return snapshot
+
+    # --- Redis circuit breaker ---
+
+    def _redis_ready(self) -> bool:
+        """True when Redis is configured and the breaker is closed (fast-fail otherwise)."""
+        return self.use_redis and self.breaker.allow()
+
+    async def _probe_redis(self):
+        await self.redis.ping()
+
+    def _mark_dirty(self, keys: Iterable[str] = (), tags: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """
+        Remembers writes that could not reach Redis so they can be replayed as
+        deletes once it recovers; otherwise L2 would serve pre-outage values.
+        """
+        if not self.use_redis:
+            return
+        for bucket, items in ((self._dirty_keys, keys), (self._dirty_tags, tags), (self._dirty_patterns, patterns)):
+            for item in items:
+                if len(bucket) >= DIRTY_LIMIT:
+                    self._dirty_overflow = True
+                    break
+                bucket.add(item)
+
+    async def _reconcile_after_outage(self):
+        keys, tags, patterns = self._dirty_keys, self._dirty_tags, self._dirty_patterns
+        overflow = self._dirty_overflow
+        self._dirty_keys, self._dirty_tags, self._dirty_patterns = set(), set(), set()
+        self._dirty_overflow = False
+        try:
+            if tags:
+                await self.invalidate_tags(*tags)
             if keys:
-                await self.redis.delete(*keys)
+                await self.delete_many(keys)
+            for pattern in patterns:
+                await self.invalidate(pattern)
+            if overflow:
+                print("[Cache] Too many writes during Redis outage to replay; some L2 entries may be stale until TTL")
+        except Exception as e:
+            print(f"Cache reconcile error: {e}")
+
+    # --- Cross-worker L1 coherence ---
+
+    def _publish_invalidation(self, payload: Dict[str, Any], pipe):
+        """Queues an invalidation broadcast on `pipe` so it rides the same round trip."""
+        if self.broadcast:
+            payload["origin"] = self.instance_id
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps(payload))
+
+    def _apply_invalidation(self, payload: Dict[str, Any]):
+        if payload.get("origin") == self.instance_id:
+            return
+        for tag in payload.get("tags", ()):
+            self.memory_cache.invalidate_tag(tag)
+        for key in payload.get("keys", ()):
+            self.memory_cache.delete(key)
+        if payload.get("pattern"):
+            self.memory_cache.invalidate_pattern(payload["pattern"])
+
+    async def _listen_invalidations(self):
+        while True:
+            # Dedicated connection: the data client's socket timeout would break blocking reads
+            if self._pubsub_client is None:
+                self._pubsub_client = redis.from_url(REDIS_URL, decode_responses=False)
+            pubsub = self._pubsub_client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._apply_invalidation(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                # Broadcasts may have been missed while disconnected
+                self.memory_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception: pass
+
+    def start_invalidation_listener(self):
+        """Subscribes this process to L1 invalidations from other workers. Call from app startup."""
+        if self.broadcast and self._listener is None:
+            self._listener = asyncio.create_task(self._listen_invalidations())
+
+    async def stop_invalidation_listener(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception): pass
+            self._listener = None
+
+# Endpoint params that never belong in a cache key (identity is keyed separately)
+DEFAULT_KEY_EXCLUDE = frozenset({"current_user", "request", "response", "background_tasks", "usage_allowed"})
+
+_SKIP = object()
+
+
+def _normalize_arg(value: Any) -> Any:
+    """
+    Reduces an argument to a JSON-stable form. Other value types (UUID,
+    Decimal, ...) key by str(); only objects without a value-based str/repr
+    (injected clients and the like) are _SKIP.
+    """
+    if isinstance(value, enum.Enum):
+        return _normalize_arg(value.value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, "model_dump"):
+        return _normalize_arg(value.model_dump())
+    if isinstance(value, dict):
+        return {str(k): v for k, v in ((k, _normalize_arg(v)) for k, v in value.items()) if v is not _SKIP}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_normalize_arg(v) for v in value]
+        if isinstance(value, (set, frozenset)):
+            items = sorted(items, key=str)
+        return [v for v in items if v is not _SKIP]
+    if type(value).__str__ is object.__str__ and type(value).__repr__ is object.__repr__:
+        return _SKIP
+    return str(value)
+
+
+def build_cache_key(
+    func: Callable,
+    args: tuple,
+    kwargs: dict,
+    key_prefix: str = "",
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    version: int = 1,
+    signature: Optional[inspect.Signature] = None,
+) -> tuple:
+    """
+    Derives a cache key from the bound call arguments.
+    Returns (cache_key, bound_arguments_dict).
+
+    Defaults are applied first, so `f(page=1)` and `f()` share a key.
+    `include` whitelists parameter names; `exclude` drops them (on top of
+    DEFAULT_KEY_EXCLUDE). The caller's identity is always part of the key.
+    Bump `version` to orphan every key of an endpoint after a response change.
+    """
+    sig = signature or inspect.signature(func)
+    bound = sig.bind_partial(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+
+    user = arguments.get("current_user")
+    user_key = getattr(user, "id", None) or "anon"
+
+    skip = DEFAULT_KEY_EXCLUDE | set(exclude or ())
+    allowed = set(include) if include is not None else None
+    key_args = {}
+    for name, value in arguments.items():
+        if name in skip or (allowed is not None and name not in allowed):
+            continue
+        norm = _normalize_arg(value)
+        if norm is not _SKIP:
+            key_args[name] = norm
+
+    digest = hashlib.sha1(json.dumps(key_args, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{key_prefix}:{func.__name__}:v{version}:{user_key}:{digest}", arguments
+
+
+# Sentinel handed to single-flight waiters when the computing task was cancelled
+_LEADER_CANCELLED = object()
 
 cache = CacheService()
 
-def cache_response(ttl: int = 60, key_prefix: str = ""):
+def cache_response(
+    ttl: int = 60,
+    key_prefix: str = "",
+    coalesce: bool = True,
+    distributed_lock: Optional[bool] = None,
+    stale_ttl: int = 0,
+    negative_ttl: Optional[int] = None,
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    version: int = 1,
+):
     """
     Decorator to cache FastAPI endpoint responses.
+    Keys are a stable hash of the bound endpoint arguments (see build_cache_key);
+    `include`/`exclude` narrow which params count and `version` namespaces the key.
+    Concurrent misses for the same key are coalesced into a single call
+    (`coalesce`); `distributed_lock` extends that across workers via Redis
+    (defaults to settings.CACHE_SINGLEFLIGHT_REDIS_LOCK).
+    `stale_ttl` serves expired responses for a grace window while refreshing
+    in the background; empty/falsy responses are only cached (briefly) when
+    `negative_ttl` is given.
     """
+    use_lock = settings.CACHE_SINGLEFLIGHT_REDIS_LOCK if distributed_lock is None else distributed_lock
+    include = tuple(include) if include is not None else None
+    exclude = tuple(exclude or ())
+
     def decorator(func):
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             try:
-                # Generate cache key based on kwargs
-                user = kwargs.get('current_user')
-                user_key = user.id if user else "anon"
-                
-                # Combine distinct kwargs to form unique key
-                # This is heuristic; for perfect keys pick specific args
-                param_key = ""
-                if 'campaign_id' in kwargs: param_key += str(kwargs['campaign_id'])
-                if 'time_range' in kwargs: param_key += str(kwargs['time_range'])
-                
-                cache_key = f"{key_prefix}:{func.__name__}:{user_key}:{param_key}"
-                
-                cached = await cache.get(cache_key)
-                if cached:
-                    return cached
+                cache_key, arguments = build_cache_key(
+                    func, args, kwargs, key_prefix=key_prefix, include=include,
+                    exclude=exclude, version=version, signature=signature,
+                )
+
+                # Register under owner/campaign so writes elsewhere can purge it
+                user = arguments.get('current_user')
+                tags = [f"user:{getattr(user, 'id', None) or 'anon'}"]
+                campaign_id = arguments.get('campaign_id')
+                if campaign_id and campaign_id != "all":
+                    tags.append(f"campaign:{campaign_id}")
+            except Exception as e: 
+                print(f"Cache key error: {e}")
+                return await func(*args, **kwargs)
+
+            if coalesce or stale_ttl:
+                return await cache.get_or_set(
+                    cache_key, lambda: func(*args, **kwargs), ttl=ttl, tags=tags, distributed=use_lock,
+                    stale_ttl=stale_ttl, negative_ttl=negative_ttl,
+                )
+
+            try:
+                raw = await cache._lookup(cache_key)
+                if raw is not _MISS:
+                    return _unwrap(raw)[0]
             except Exception as e: 
                 print(f"Cache read error: {e}")
             
             result = await func(*args, **kwargs)
             
             try:
-                await cache.set(cache_key, result, ttl=ttl)
+                await cache._store(cache_key, result, ttl, tags, negative_ttl=negative_ttl)
             except Exception as e:
                 print(f"Cache write error: {e}")
             
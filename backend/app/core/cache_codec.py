@@ -0,0 +1,131 @@
+"""
+Binary codec layer for the Redis cache tier.
+
+Wire format (version 1):
+    byte 0   FORMAT_VERSION
+    byte 1   serializer id  (b"j" json, b"o" orjson, b"m" msgpack)
+    byte 2   compression id (b"n" none, b"z" zstd, b"l" lz4, b"g" zlib)
+    byte 3.. payload
+
+Values written before this layer existed are plain JSON text; they never
+start with FORMAT_VERSION (a control byte), so `decode` reads them as legacy.
+orjson / msgpack / zstandard / lz4 are optional - missing ones fall back to
+json and zlib.
+"""
+from typing import Any, Callable, Dict, Tuple
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional
+    lz4_frame = None
+
+FORMAT_VERSION = 1
+HEADER_SIZE = 3
+
+
+# --- Serializers: id -> (dumps, loads) ---
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+
+
+SERIALIZERS: Dict[bytes, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    b"j": (_json_dumps, json.loads),
+}
+if orjson is not None:
+    SERIALIZERS[b"o"] = (
+        lambda v: orjson.dumps(v, default=str, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads,
+    )
+if msgpack is not None:
+    SERIALIZERS[b"m"] = (
+        lambda v: msgpack.packb(v, use_bin_type=True, default=str),
+        lambda b: msgpack.unpackb(b, raw=False, strict_map_key=False),
+    )
+
+
+# --- Compressors: id -> (compress, decompress) ---
+
+COMPRESSORS: Dict[bytes, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    b"n": (lambda b: b, lambda b: b),
+    b"g": (lambda b: zlib.compress(b, 6), zlib.decompress),
+}
+if zstandard is not None:
+    _zstd_c = zstandard.ZstdCompressor(level=3)
+    _zstd_d = zstandard.ZstdDecompressor()
+    COMPRESSORS[b"z"] = (_zstd_c.compress, _zstd_d.decompress)
+if lz4_frame is not None:
+    COMPRESSORS[b"l"] = (lz4_frame.compress, lz4_frame.decompress)
+
+SERIALIZER_NAMES = {"json": b"j", "orjson": b"o", "msgpack": b"m"}
+COMPRESSOR_NAMES = {"none": b"n", "zlib": b"g", "zstd": b"z", "lz4": b"l"}
+
+
+class CacheCodec:
+    """
+    Encodes cache values to versioned bytes and back.
+    Payloads at or above `compress_threshold` bytes are compressed.
+    """
+
+    def __init__(self, serializer: str = "auto", compression: str = "auto", compress_threshold: int = 1024):
+        self.serializer_id = self._pick(serializer, SERIALIZER_NAMES, SERIALIZERS, ("orjson", "json"))
+        self.compressor_id = self._pick(compression, COMPRESSOR_NAMES, COMPRESSORS, ("zstd", "lz4", "zlib"))
+        self.compress_threshold = compress_threshold
+
+    @staticmethod
+    def _pick(name: str, names: Dict[str, bytes], available: Dict[bytes, Any], preference: Tuple[str, ...]) -> bytes:
+        name = (name or "auto").lower()
+        if name != "auto":
+            codec_id = names.get(name)
+            if codec_id in available:
+                return codec_id
+            print(f"[Cache] Codec '{name}' unavailable, falling back to auto")
+        for candidate in preference:
+            if names[candidate] in available:
+                return names[candidate]
+        return next(iter(available))
+
+    def encode(self, value: Any) -> bytes:
+        serializer_id = self.serializer_id
+        try:
+            payload = SERIALIZERS[serializer_id][0](value)
+        except Exception:
+            # Types the fast serializer rejects still round-trip through json(default=str)
+            serializer_id = b"j"
+            payload = _json_dumps(value)
+
+        compressor_id = b"n"
+        if self.compressor_id != b"n" and len(payload) >= self.compress_threshold:
+            compressed = COMPRESSORS[self.compressor_id][0](payload)
+            if len(compressed) < len(payload):
+                payload, compressor_id = compressed, self.compressor_id
+
+        return bytes((FORMAT_VERSION,)) + serializer_id + compressor_id + payload
+
+    def decode(self, data: Any) -> Any:
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data or data[0] != FORMAT_VERSION:
+            # Legacy: plain json text written before the codec layer
+            return json.loads(data)
+        serializer_id = data[1:2]
+        compressor_id = data[2:3]
+        payload = COMPRESSORS[compressor_id][1](bytes(data[HEADER_SIZE:]))
+        return SERIALIZERS[serializer_id][1](payload)
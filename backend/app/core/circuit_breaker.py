@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("metrics")
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for a remote dependency (e.g. Redis).
+
+    - CLOSED: calls pass through. Errors, and calls slower than
+      `latency_threshold` seconds, count as failures.
+    - OPEN: after `failure_threshold` consecutive failures. `allow()` returns
+      False immediately so callers skip the dependency (fast-fail).
+    - HALF_OPEN: a background probe runs every `reset_timeout` seconds;
+      one success closes the breaker again.
+
+    Without a `probe`, the first call after `reset_timeout` acts as the trial.
+    `on_close` (sync or async) runs whenever the breaker recovers.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Gauge encoding for metrics
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        latency_threshold: float = 0.25,
+        reset_timeout: float = 10.0,
+        probe: Optional[Callable[[], Awaitable[Any]]] = None,
+        on_close: Optional[Callable[[], Any]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.on_close = on_close
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.probe is not None:
+            self._ensure_probe()
+            return False
+        # No probe: let a single trial call through once the cool-down passed
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+            return True
+        return False
+
+    def record_success(self, latency: float = 0.0):
+        if self.latency_threshold and latency > self.latency_threshold:
+            self.record_failure()
+            return
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.trip()
+
+    def trip(self):
+        self.trips += 1
+        self.opened_at = time.monotonic()
+        self._transition(self.OPEN)
+        if self.probe is not None:
+            self._ensure_probe()
+
+    @asynccontextmanager
+    async def guard(self, check_latency: bool = True):
+        """
+        Times the wrapped call and records its outcome. Exceptions propagate.
+        Pass check_latency=False for bulk operations that are slow by design.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.perf_counter() - start if check_latency else 0.0)
+
+    def _ensure_probe(self):
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+        except RuntimeError:
+            # No running loop (sync caller); the next async caller starts it
+            self._probe_task = None
+
+    async def _probe_loop(self):
+        while self.state != self.CLOSED:
+            await asyncio.sleep(self.reset_timeout)
+            self._transition(self.HALF_OPEN)
+            try:
+                await asyncio.wait_for(self.probe(), timeout=max(self.latency_threshold * 4, 1.0))
+                self.consecutive_failures = 0
+                self._transition(self.CLOSED)
+            except Exception:
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        recovered = state == self.CLOSED
+        self.state = state
+        logger.info(
+            "Metric Recorded",
+            extra={
+                "metric_type": "gauge",
+                "metric_name": f"circuit_breaker_{self.name}_state",
+                "value": self.STATE_VALUES[state],
+                "state": state,
+            }
+        )
+        if recovered and self.on_close is not None:
+            result = self.on_close()
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "state_value": self.STATE_VALUES[self.state],
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.state != self.CLOSED else 0,
+        }
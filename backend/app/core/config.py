@@ -16,6 +16,8 @@ class Settings(BaseSettings):
     
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
+    # Shared secret for /internal/* operational endpoints (X-Internal-Token); unset disables them
+    INTERNAL_API_TOKEN: Optional[str] = os.getenv("INTERNAL_API_TOKEN")
     
     # Database (Supabase)
     SUPABASE_URL: str = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL") or ""
@@ -25,9 +27,70 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
 
+    # In-Memory Cache (L1)
+    CACHE_L1_MAX_ENTRIES: int = int(os.getenv("CACHE_L1_MAX_ENTRIES", "500"))
+    CACHE_L1_MAX_BYTES: int = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_L1_SHARDS: int = int(os.getenv("CACHE_L1_SHARDS", "16"))
+    CACHE_L1_SWEEP_INTERVAL: int = int(os.getenv("CACHE_L1_SWEEP_INTERVAL", "30"))
+    # TTL for L1 copies filled from Redis; safe to raise while the invalidation bus is on
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "300"))
+    CACHE_INVALIDATION_BUS: bool = os.getenv("CACHE_INVALIDATION_BUS", "true").lower() == "true"
+    # Redis value encoding: serializer auto|orjson|msgpack|json, compression auto|zstd|lz4|zlib|none
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "auto")
+    CACHE_COMPRESSION: str = os.getenv("CACHE_COMPRESSION", "auto")
+    CACHE_COMPRESS_THRESHOLD: int = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+    # Redis circuit breaker: trip after N consecutive failures/slow calls, probe every RESET seconds
+    CACHE_REDIS_SOCKET_TIMEOUT: float = float(os.getenv("CACHE_REDIS_SOCKET_TIMEOUT", "0.5"))
+    CACHE_REDIS_BREAKER_FAILURES: int = int(os.getenv("CACHE_REDIS_BREAKER_FAILURES", "5"))
+    CACHE_REDIS_BREAKER_LATENCY_MS: int = int(os.getenv("CACHE_REDIS_BREAKER_LATENCY_MS", "250"))
+    CACHE_REDIS_BREAKER_RESET: int = int(os.getenv("CACHE_REDIS_BREAKER_RESET", "10"))
+    # Single-flight: extend miss coalescing across workers with a Redis lock
+    CACHE_SINGLEFLIGHT_REDIS_LOCK: bool = os.getenv("CACHE_SINGLEFLIGHT_REDIS_LOCK", "false").lower() == "true"
+    CACHE_SINGLEFLIGHT_LOCK_TIMEOUT: int = int(os.getenv("CACHE_SINGLEFLIGHT_LOCK_TIMEOUT", "30"))
+
+    # Campaign execution log (buffered bulk inserts into campaign_executions)
+    EXECUTION_LOG_BATCH_SIZE: int = int(os.getenv("EXECUTION_LOG_BATCH_SIZE", "500"))
+    EXECUTION_LOG_FLUSH_INTERVAL: float = float(os.getenv("EXECUTION_LOG_FLUSH_INTERVAL", "1.0"))
+    EXECUTION_LOG_MAX_QUEUE: int = int(os.getenv("EXECUTION_LOG_MAX_QUEUE", "10000"))
+
+    # Outbound send throttling (token buckets shared through Redis)
+    SEND_RATE_LIMIT_ENABLED: bool = os.getenv("SEND_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # Overrides, e.g. "channel:email=50/100,provider:meta=20/40" (rate per second / burst)
+    SEND_RATE_LIMITS: str = os.getenv("SEND_RATE_LIMITS", "")
+    # Campaign pipeline: workers per stage and the bound on each stage's queue.
+    # Workers cap concurrency (and memory); the buckets above cap the send rate.
+    CAMPAIGN_RESOLVE_WORKERS: int = int(os.getenv("CAMPAIGN_RESOLVE_WORKERS", "8"))
+    CAMPAIGN_GENERATE_WORKERS: int = int(os.getenv("CAMPAIGN_GENERATE_WORKERS", "32"))
+    CAMPAIGN_SEND_EMAIL_WORKERS: int = int(os.getenv("CAMPAIGN_SEND_EMAIL_WORKERS", "16"))
+    CAMPAIGN_SEND_WHATSAPP_WORKERS: int = int(os.getenv("CAMPAIGN_SEND_WHATSAPP_WORKERS", "16"))
+    CAMPAIGN_LOG_WORKERS: int = int(os.getenv("CAMPAIGN_LOG_WORKERS", "4"))
+    CAMPAIGN_STAGE_QUEUE_SIZE: int = int(os.getenv("CAMPAIGN_STAGE_QUEUE_SIZE", "100"))
+    # Campaign quota reservation: units reserved per top-up, deliveries per usage_logs insert,
+    # and how long an abandoned reservation (crashed worker) keeps holding quota
+    QUOTA_RESERVE_CHUNK: int = int(os.getenv("QUOTA_RESERVE_CHUNK", "200"))
+    QUOTA_FLUSH_EVERY: int = int(os.getenv("QUOTA_FLUSH_EVERY", "100"))
+    QUOTA_RESERVATION_TTL: int = int(os.getenv("QUOTA_RESERVATION_TTL", "21600"))
+    # Skip contacts delivered to by any campaign of the same tenant within this many hours
+    # (campaign metadata "contact_window_hours" overrides; 0 disables)
+    CONTACT_RECENT_WINDOW_HOURS: int = int(os.getenv("CONTACT_RECENT_WINDOW_HOURS", "24"))
+    # Fair-share scheduling of concurrent campaigns: process-wide slots for LLM generation and
+    # channel sends, shared between tenants by plan weight (deficit round robin)
+    FAIR_SCHEDULER_ENABLED: bool = os.getenv("FAIR_SCHEDULER_ENABLED", "true").lower() == "true"
+    FAIR_SCHEDULER_GENERATE_SLOTS: int = int(os.getenv("FAIR_SCHEDULER_GENERATE_SLOTS", "32"))
+    FAIR_SCHEDULER_SEND_SLOTS: int = int(os.getenv("FAIR_SCHEDULER_SEND_SLOTS", "32"))  # per channel
+
+    # Shared async HTTP pool for channel senders (keep-alive, HTTP/2 when h2 is installed)
+    HTTP_POOL_MAX_CONNECTIONS: int = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+    HTTP_POOL_MAX_KEEPALIVE: int = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+    HTTP_POOL_HTTP2: bool = os.getenv("HTTP_POOL_HTTP2", "true").lower() == "true"
+
     # LLM (Groq & Gemini)
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY") or os.getenv("VITE_GROQ_API_KEY") or ""
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY") or ""
+    # Batched generation: recipients packed per LLM request, and how long to wait to fill a batch
+    LLM_BATCH_SIZE: int = int(os.getenv("LLM_BATCH_SIZE", "8"))
+    LLM_BATCH_MAX_WAIT: float = float(os.getenv("LLM_BATCH_MAX_WAIT", "0.25"))
     
     # Marketing Integrations
     SENDGRID_API_KEY: Optional[str] = os.getenv("SENDGRID_API_KEY")
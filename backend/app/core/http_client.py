@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger("core.http_client")
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional
+    HTTP2_AVAILABLE = False
+
+
+class AsyncHttpPool:
+    """
+    One shared httpx.AsyncClient per event loop for outbound provider calls.
+
+    Connections are kept alive between sends (no TLS handshake per message)
+    and negotiate HTTP/2 via ALPN where the provider supports it, falling back
+    to HTTP/1.1 otherwise. Call `aclose()` on shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeout: float = 10.0,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # Pooled connections belong to a loop; a new loop (worker restart, asyncio.run) gets its own client
+            self._loop = loop
+            self._client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTP pool close failed: {e}")
+
+
+http_pool = AsyncHttpPool(
+    max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+    max_keepalive=settings.HTTP_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+    http2=settings.HTTP_POOL_HTTP2,
+)
@@ -0,0 +1,97 @@
+from typing import Optional
+
+import redis as redis_sync
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+
+# One breaker for the campaign state clients: while open, commands fail fast
+# and callers take their existing error path (memory fallback / skip). No
+# probe: the first command after the cool-down is the trial (sync callers too)
+state_breaker = CircuitBreaker(
+    "redis_state",
+    failure_threshold=settings.CACHE_REDIS_BREAKER_FAILURES,
+    latency_threshold=0,
+    reset_timeout=settings.CACHE_REDIS_BREAKER_RESET,
+)
+
+
+def _circuit_open() -> RedisConnectionError:
+    return RedisConnectionError("Redis circuit breaker is open")
+
+
+class _GuardedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        if not state_breaker.allow():
+            await self.reset()
+            raise _circuit_open()
+        async with state_breaker.guard(check_latency=False):
+            return await super().execute(raise_on_error)
+
+
+class _GuardedRedis(redis.Redis):
+    """redis.asyncio client whose commands and pipelines go through `state_breaker`."""
+
+    async def execute_command(self, *args, **options):
+        if not state_breaker.allow():
+            raise _circuit_open()
+        async with state_breaker.guard(check_latency=False):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class _GuardedRedisSync(redis_sync.Redis):
+    """Blocking counterpart (call off the event loop); same breaker."""
+
+    def execute_command(self, *args, **options):
+        if not state_breaker.allow():
+            raise _circuit_open()
+        try:
+            result = super().execute_command(*args, **options)
+        except Exception:
+            state_breaker.record_failure()
+            raise
+        state_breaker.record_success()
+        return result
+
+
+_redis_client: Optional[redis.Redis] = None
+_redis_sync_client: Optional[redis_sync.Redis] = None
+
+
+def _configured() -> bool:
+    return bool(settings.REDIS_URL and "redis" in settings.REDIS_URL)
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Shared async client (str responses) for campaign state: checkpoints,
+    progress counters, quota reservations, the contact index. Short socket
+    timeouts plus `state_breaker`, so a hung Redis fails fast instead of
+    blocking every run. None when Redis is not configured.
+    """
+    global _redis_client
+    if _redis_client is None and _configured():
+        timeout = settings.CACHE_REDIS_SOCKET_TIMEOUT
+        _redis_client = _GuardedRedis.from_url(
+            settings.REDIS_URL, encoding="utf-8", decode_responses=True,
+            socket_timeout=timeout, socket_connect_timeout=timeout,
+        )
+    return _redis_client
+
+
+def get_redis_sync() -> Optional[redis_sync.Redis]:
+    """Blocking variant of `get_redis` for code running in threads."""
+    global _redis_sync_client
+    if _redis_sync_client is None and _configured():
+        timeout = settings.CACHE_REDIS_SOCKET_TIMEOUT
+        _redis_sync_client = _GuardedRedisSync.from_url(
+            settings.REDIS_URL, decode_responses=True,
+            socket_timeout=timeout, socket_connect_timeout=timeout,
+        )
+    return _redis_sync_client
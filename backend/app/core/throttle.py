@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import redis as redis_sync
+import redis.asyncio as redis
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+
+logger = logging.getLogger("core.throttle")
+
+BUCKET_KEY_PREFIX = "throttle:"
+
+# name -> (tokens per second, burst). Channel buckets cap a whole channel,
+# provider buckets cap one upstream API (its published/tier limit).
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    "channel:email": (50.0, 100),
+    "channel:whatsapp": (20.0, 20),
+    "channel:llm": (10.0, 20),
+    "provider:gmail_api": (2.0, 10),
+    "provider:apps_script": (1.0, 5),
+    "provider:resend": (2.0, 2),
+    "provider:brevo": (10.0, 20),
+    "provider:sendgrid": (50.0, 100),
+    "provider:smtp": (1.0, 5),
+    "provider:meta": (50.0, 80),
+    "provider:twilio": (10.0, 10),
+    "provider:tavily": (5.0, 10),
+}
+
+# Reserving token bucket. Tokens may go negative: the caller gets the time it
+# must sleep before its reserved slot, so one round trip per send and callers
+# are served in arrival order. Uses Redis server time (no worker clock skew).
+_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000) - requested
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) * 1000 / rate) + 1000)
+if tokens >= 0 then
+    return 0
+end
+return math.ceil(-tokens * 1000 / rate)
+"""
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    """Parses "name=rate/burst,..." overrides; malformed entries are ignored."""
+    limits: Dict[str, Tuple[float, int]] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            rate, _, burst = value.partition("/")
+            rate = float(rate)
+            limits[name.strip()] = (rate, int(burst) if burst else max(1, int(rate)))
+        except ValueError:
+            print(f"[Throttle] Ignoring bad rate limit '{item}'")
+    return limits
+
+
+class _LocalBucket:
+    """Same reservation semantics as the Lua script, for one process."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, requested: float = 1) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate) - requested
+            self.ts = now
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class SendThrottle:
+    """
+    Token-bucket rate limiting for outbound sends, per channel and per provider.
+
+    Buckets live in Redis so every API worker and background worker shares
+    them; if Redis is unavailable (or the breaker is open) each process falls
+    back to a local bucket with the same rate.
+
+    - `await acquire(name)` from async code (campaign pipeline stages)
+    - `acquire_sync(name)` from blocking senders already running in a thread
+    Unknown bucket names are not limited.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None, enabled: bool = True):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.enabled = enabled
+        self._local: Dict[str, _LocalBucket] = {}
+        self._local_lock = threading.Lock()
+        self.waits: Dict[str, float] = {}
+        self.redis = None
+        self.redis_sync = None
+        self.breaker = CircuitBreaker(
+            "send_throttle",
+            failure_threshold=settings.CACHE_REDIS_BREAKER_FAILURES,
+            latency_threshold=0,
+            reset_timeout=settings.CACHE_REDIS_BREAKER_RESET,
+        )
+        try:
+            if settings.REDIS_URL and "redis" in settings.REDIS_URL:
+                timeout = settings.CACHE_REDIS_SOCKET_TIMEOUT
+                self.redis = redis.from_url(settings.REDIS_URL, socket_timeout=timeout, socket_connect_timeout=timeout)
+                self.redis_sync = redis_sync.from_url(settings.REDIS_URL, socket_timeout=timeout, socket_connect_timeout=timeout)
+                self._script = self.redis.register_script(_BUCKET_SCRIPT)
+                self._script_sync = self.redis_sync.register_script(_BUCKET_SCRIPT)
+        except Exception as e:
+            print(f"[Throttle] Redis unavailable, using per-process buckets: {e}")
+            self.redis = self.redis_sync = None
+
+    def _local_bucket(self, name: str, rate: float, burst: int) -> _LocalBucket:
+        bucket = self._local.get(name)
+        if bucket is None:
+            with self._local_lock:
+                bucket = self._local.setdefault(name, _LocalBucket(rate, burst))
+        return bucket
+
+    def _record(self, name: str, delay: float) -> float:
+        if delay > 0:
+            self.waits[name] = self.waits.get(name, 0.0) + delay
+        return delay
+
+    async def reserve(self, name: str, tokens: int = 1) -> float:
+        """Reserves `tokens` and returns how long to wait (seconds) before using them."""
+        limit = self.limits.get(name)
+        if not self.enabled or limit is None:
+            return 0.0
+        rate, burst = limit
+        if self.redis is not None and self.breaker.allow():
+            try:
+                async with self.breaker.guard(check_latency=False):
+                    wait_ms = await self._script(keys=[BUCKET_KEY_PREFIX + name], args=[rate, burst, tokens])
+                return self._record(name, int(wait_ms) / 1000)
+            except Exception as e:
+                logger.warning(f"Throttle Redis error for {name}, using local bucket: {e}")
+        return self._record(name, self._local_bucket(name, rate, burst).reserve(tokens))
+
+    async def acquire(self, name: str, tokens: int = 1):
+        delay = await self.reserve(name, tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, name: str, tokens: int = 1):
+        """Blocking variant for sync senders (call only off the event loop)."""
+        limit = self.limits.get(name)
+        if not self.enabled or limit is None:
+            return
+        rate, burst = limit
+        delay = None
+        if self.redis_sync is not None and self.breaker.state == CircuitBreaker.CLOSED:
+            try:
+                wait_ms = self._script_sync(keys=[BUCKET_KEY_PREFIX + name], args=[rate, burst, tokens])
+                delay = int(wait_ms) / 1000
+                self.breaker.record_success()
+            except Exception as e:
+                self.breaker.record_failure()
+                logger.warning(f"Throttle Redis error for {name}, using local bucket: {e}")
+        if delay is None:
+            delay = self._local_bucket(name, rate, burst).reserve(tokens)
+        if self._record(name, delay) > 0:
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"rate": rate, "burst": burst, "waited_s": round(self.waits.get(name, 0.0), 3)}
+            for name, (rate, burst) in self.limits.items()
+        }
+
+
+throttle = SendThrottle(
+    limits=parse_limits(settings.SEND_RATE_LIMITS),
+    enabled=settings.SEND_RATE_LIMIT_ENABLED,
+)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import redis as redis_sync
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+logger = logging.getLogger("core.token_cache")
+
+TOKEN_KEY_PREFIX = "oauth_token:"
+# Remote refresh lock; a refresh is one HTTP call, so this only guards a crashed holder
+REFRESH_LOCK_MS = 15000
+# Stop background refreshing after this long without a caller
+IDLE_AFTER = 600
+
+
+class OAuthTokenManager:
+    """
+    Caches an OAuth2 access token obtained with a refresh_token grant.
+
+    - The token is reused until `refresh_margin` seconds before `expires_in`.
+    - Refresh happens once: a thread lock (sync senders), an asyncio lock
+      (async senders) and a Redis SET NX lock (other workers) serialise it;
+      losers wait for the winner's token instead of calling the endpoint.
+    - Tokens are shared through Redis so every worker reuses the same one.
+    - Once used from async code, a background task refreshes the token ahead
+      of expiry so sends never wait on the token endpoint.
+    """
+
+    def __init__(self, name: str, token_url: str, payload_fn: Callable[[], Optional[dict]], refresh_margin: int = 300):
+        self.name = name
+        self.token_url = token_url
+        self.payload_fn = payload_fn
+        self.refresh_margin = refresh_margin
+        self.key = f"{TOKEN_KEY_PREFIX}{name}"
+        self.lock_key = f"{self.key}:lock"
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # wall clock, comparable across workers
+        self._last_used = 0.0
+        self._thread_lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+        self.redis = None
+        self.redis_sync = None
+        try:
+            if settings.REDIS_URL and "redis" in settings.REDIS_URL:
+                timeout = settings.CACHE_REDIS_SOCKET_TIMEOUT
+                self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True, socket_timeout=timeout, socket_connect_timeout=timeout)
+                self.redis_sync = redis_sync.from_url(settings.REDIS_URL, decode_responses=True, socket_timeout=timeout, socket_connect_timeout=timeout)
+        except Exception as e:
+            print(f"[Token] Redis unavailable, caching {name} token per process: {e}")
+
+    # --- State ---
+
+    def _fresh(self) -> bool:
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    def _adopt(self, raw: Optional[str], newer: bool = False) -> bool:
+        """
+        Takes a token published by another worker if it is still fresh
+        (and, with `newer`, outlives the one held here).
+        """
+        if not raw:
+            return False
+        try:
+            data = json.loads(raw)
+            if newer and data["expires_at"] <= self._expires_at:
+                return False
+            if time.time() < data["expires_at"] - self.refresh_margin:
+                self._token, self._expires_at = data["access_token"], data["expires_at"]
+                return True
+        except Exception:
+            pass
+        return False
+
+    def _accept(self, body: dict) -> str:
+        self._token = body["access_token"]
+        self._expires_at = time.time() + int(body.get("expires_in", 3600))
+        self.refreshes += 1
+        return json.dumps({"access_token": self._token, "expires_at": self._expires_at})
+
+    def _shared_ttl(self) -> int:
+        return max(1, int(self._expires_at - time.time() - self.refresh_margin))
+
+    def invalidate(self):
+        """Drops the cached token (e.g. after a 401); the next call refreshes."""
+        self._token, self._expires_at = None, 0.0
+        try:
+            if self.redis_sync is not None:
+                self.redis_sync.delete(self.key)
+        except Exception:
+            pass
+
+    async def invalidate_async(self):
+        self._token, self._expires_at = None, 0.0
+        try:
+            if self.redis is not None:
+                await self.redis.delete(self.key)
+        except Exception:
+            pass
+
+    # --- Sync path (blocking senders in threads) ---
+
+    def get_token_sync(self) -> Optional[str]:
+        self._last_used = time.time()
+        if self._fresh():
+            return self._token
+        with self._thread_lock:
+            if self._fresh():
+                return self._token
+            return self._refresh_sync()
+
+    def _refresh_sync(self) -> Optional[str]:
+        import requests
+        payload = self.payload_fn()
+        if not payload:
+            return None
+        locked = True
+        try:
+            if self.redis_sync is not None:
+                if self._adopt(self.redis_sync.get(self.key)):
+                    return self._token
+                locked = bool(self.redis_sync.set(self.lock_key, "1", nx=True, px=REFRESH_LOCK_MS))
+                if not locked:
+                    # Another worker is refreshing; wait for its token
+                    for _ in range(50):
+                        time.sleep(0.1)
+                        if self._adopt(self.redis_sync.get(self.key)):
+                            return self._token
+        except Exception as e:
+            logger.warning(f"Token cache Redis error ({self.name}): {e}")
+        try:
+            res = requests.post(self.token_url, data=payload, timeout=10)
+            if res.status_code != 200:
+                print(f"DEBUG: {self.name} OAuth Refresh Failed: {res.status_code} - {res.text}")
+                return None
+            shared = self._accept(res.json())
+            if self.redis_sync is not None:
+                self.redis_sync.set(self.key, shared, ex=self._shared_ttl())
+            return self._token
+        except Exception as e:
+            print(f"DEBUG: {self.name} OAuth Refresh Exception: {e}")
+            return self._token if self._fresh() else None
+        finally:
+            if locked and self.redis_sync is not None:
+                try:
+                    self.redis_sync.delete(self.lock_key)
+                except Exception:
+                    pass
+
+    # --- Async path ---
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._async_lock = asyncio.Lock()
+            self._refresher = None
+        return self._async_lock
+
+    async def get_token(self) -> Optional[str]:
+        self._last_used = time.time()
+        lock = self._lock()
+        self._ensure_refresher()
+        if self._fresh():
+            return self._token
+        async with lock:
+            if self._fresh():
+                return self._token
+            return await self._refresh()
+
+    async def _refresh(self, force: bool = False) -> Optional[str]:
+        from app.core.http_client import http_pool
+        payload = self.payload_fn()
+        if not payload:
+            return None
+        locked = True
+        try:
+            if self.redis is not None:
+                if self._adopt(await self.redis.get(self.key), newer=force):
+                    return self._token
+                locked = bool(await self.redis.set(self.lock_key, "1", nx=True, px=REFRESH_LOCK_MS))
+                if not locked:
+                    for _ in range(50):
+                        await asyncio.sleep(0.1)
+                        if self._adopt(await self.redis.get(self.key), newer=force):
+                            return self._token
+        except Exception as e:
+            logger.warning(f"Token cache Redis error ({self.name}): {e}")
+        try:
+            res = await http_pool.get().post(self.token_url, data=payload, timeout=10)
+            if res.status_code != 200:
+                print(f"DEBUG: {self.name} OAuth Refresh Failed: {res.status_code} - {res.text}")
+                return None
+            shared = self._accept(res.json())
+            if self.redis is not None:
+                await self.redis.set(self.key, shared, ex=self._shared_ttl())
+            return self._token
+        except Exception as e:
+            print(f"DEBUG: {self.name} OAuth Refresh Exception: {e}")
+            return self._token if self._fresh() else None
+        finally:
+            if locked and self.redis is not None:
+                try:
+                    await self.redis.delete(self.lock_key)
+                except Exception:
+                    pass
+
+    def _ensure_refresher(self):
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        """Refreshes shortly before the margin is reached while the token is in use."""
+        while time.time() - self._last_used < IDLE_AFTER:
+            # Wake half a margin before the token stops being "fresh"
+            delay = self._expires_at - self.refresh_margin * 1.5 - time.time() if self._token else 0
+            await asyncio.sleep(max(delay, 5))
+            if self._token and time.time() < self._expires_at - self.refresh_margin * 1.5:
+                continue
+            async with self._lock():
+                token = await self._refresh(force=self._fresh())
+            if token is None:
+                await asyncio.sleep(30)
+
+    async def close(self):
+        if self._refresher is not None and not self._refresher.done():
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+        self._refresher = None
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("data.contact_index")
+
+SUPPRESSION_TABLE = "contact_suppressions"
+GLOBAL_SCOPE = "global"
+# Redis copies of the suppression table are re-read from it after this long
+SUPPRESSION_RELOAD = 3600
+# A suppression reload in progress keeps its staging set this long at most
+STAGING_TTL = 300
+LOAD_PAGE_SIZE = 1000
+DEFAULT_COUNTRY_CODE = "91"
+
+# Only unambiguous opt-outs: one-word replies such as "cancel" or "end" are
+# ordinary answers (e.g. to a counselling slot), not a request to be suppressed
+OPT_OUT_KEYWORDS = {"stop", "stop all", "stopall", "unsubscribe", "opt out", "optout"}
+
+_NON_DIGITS = re.compile(r"\D")
+
+# Replaces the live suppression set with the freshly loaded one (an empty
+# load leaves no staging key: the live set is dropped) and marks it loaded
+_SWAP_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('PERSIST', KEYS[2])
+else
+    redis.call('DEL', KEYS[2])
+end
+redis.call('SET', KEYS[3], '1', 'EX', ARGV[1])
+return 1
+"""
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return email if "@" in email else None
+
+
+def normalize_phone(phone: Optional[str], default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    E.164 form ("+919876543210"). Bare 10-digit numbers (and 0-prefixed
+    trunk dialling) get the default country code, like the WhatsApp sender.
+    """
+    raw = (phone or "").replace("whatsapp:", "").strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if raw.startswith("00"):
+        digits = digits[2:]
+    elif not raw.startswith("+"):
+        if len(digits) == 11 and digits.startswith("0"):
+            digits = digits[1:]
+        if len(digits) == 10:
+            digits = default_country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def contact_keys(recipient: dict) -> List[str]:
+    """Normalized identities of a recipient: "e:<email>" and/or "p:<E.164 phone>"."""
+    keys = []
+    email = normalize_email(recipient.get("email"))
+    if email:
+        keys.append(f"e:{email}")
+    phone = normalize_phone(recipient.get("phone"))
+    if phone:
+        keys.append(f"p:{phone}")
+    return keys
+
+
+def channel_contact_key(recipient: dict, channel: str) -> Optional[str]:
+    """Key of the identity a channel sends to: the email for "email", the phone otherwise."""
+    if channel == "email":
+        email = normalize_email(recipient.get("email"))
+        return f"e:{email}" if email else None
+    phone = normalize_phone(recipient.get("phone"))
+    return f"p:{phone}" if phone else None
+
+
+def contact_key(contact: str) -> Optional[str]:
+    """Key for a single email address or phone number."""
+    if "@" in (contact or ""):
+        email = normalize_email(contact)
+        return f"e:{email}" if email else None
+    phone = normalize_phone(contact)
+    return f"p:{phone}" if phone else None
+
+
+def is_opt_out(text: Optional[str]) -> bool:
+    return (text or "").strip().strip(".!").lower() in OPT_OUT_KEYWORDS
+
+
+class _MemoryStore:
+    """Process-local fallback when Redis is not configured."""
+    def __init__(self):
+        self.suppressed: Dict[str, Set[str]] = {}
+        self.loaded: Dict[str, float] = {}
+        self.recent: Dict[str, Dict[str, float]] = {}
+
+
+_memory_store = _MemoryStore()
+
+
+def _suppressed_key(scope: str) -> str:
+    return f"contact_suppressed:{scope}"
+
+
+def _staging_key(scope: str) -> str:
+    return f"contact_suppressed:{scope}:loading"
+
+
+def _recent_key(user_id: str) -> str:
+    return f"contact_recent:{user_id}"
+
+
+def _fetch_suppressions(scope: str) -> Set[str]:
+    """All suppressed keys of a scope from the durable table (blocking; run in a thread)."""
+    from app.data.supabase_client import supabase
+    keys: Set[str] = set()
+    last_id = 0
+    while True:
+        res = supabase.table(SUPPRESSION_TABLE).select("id, contact_key").eq("scope", scope) \
+            .gt("id", last_id).order("id").limit(LOAD_PAGE_SIZE).execute()
+        rows = res.data or []
+        keys.update(row["contact_key"] for row in rows)
+        if len(rows) < LOAD_PAGE_SIZE:
+            return keys
+        last_id = rows[-1]["id"]
+
+
+class ContactIndex:
+    """
+    Per-tenant contact index used while a campaign runs, keyed by normalized
+    email and E.164 phone so "+91 98765 43210" / "9876543210" and
+    "A@X.com" / "a@x.com" are one contact.
+
+    - Suppressions (opt-outs, bounces, manual blocks) live durably in the
+      contact_suppressions table, for the tenant or globally; a Redis set per
+      scope mirrors it for O(1) membership checks (reloaded hourly).
+    - Recent contacts are a Redis sorted set per tenant (contact -> last
+      delivery time); a recipient contacted within `recent_window` seconds is
+      skipped. A window of 0 disables the check.
+
+    Without Redis both live in process memory.
+    """
+
+    def __init__(self, user_id: str, recent_window: float = 0):
+        self.user_id = user_id
+        self.recent_window = recent_window
+        self.scopes = [user_id, GLOBAL_SCOPE] if user_id else [GLOBAL_SCOPE]
+        self.redis = get_redis()
+        self.skipped: Dict[str, int] = {}
+
+    async def load(self):
+        """Mirrors the durable suppressions of each scope (if stale) and trims expired recent contacts."""
+        for scope in self.scopes:
+            try:
+                await self._load_scope(scope)
+            except Exception as e:
+                logger.warning(f"Suppression load failed for {scope}: {e}")
+        if self.recent_window:
+            cutoff = time.time() - self.recent_window
+            try:
+                if self.redis:
+                    await self.redis.zremrangebyscore(_recent_key(self.user_id), 0, cutoff)
+                else:
+                    recent = _memory_store.recent.get(_recent_key(self.user_id), {})
+                    for key in [k for k, ts in recent.items() if ts < cutoff]:
+                        del recent[key]
+            except Exception as e:
+                logger.warning(f"Recent-contact trim failed for {self.user_id}: {e}")
+
+    async def _load_scope(self, scope: str):
+        key = _suppressed_key(scope)
+        if self.redis:
+            if await self.redis.exists(f"{key}:loaded"):
+                return
+            # Built in a staging set and renamed over the live one, so checks
+            # never see it empty; suppress() also adds to the staging set, so
+            # an opt-out racing the DB read is kept (an unsuppress racing it
+            # can stay suppressed until the next reload - the safe direction)
+            staging = _staging_key(scope)
+            await self.redis.delete(staging)
+            keys = list(await asyncio.to_thread(_fetch_suppressions, scope))
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for i in range(0, len(keys), LOAD_PAGE_SIZE):
+                    pipe.sadd(staging, *keys[i:i + LOAD_PAGE_SIZE])
+                pipe.expire(staging, STAGING_TTL)
+                pipe.eval(_SWAP_SCRIPT, 3, staging, key, f"{key}:loaded", SUPPRESSION_RELOAD)
+                await pipe.execute()
+        elif time.time() - _memory_store.loaded.get(key, 0) > SUPPRESSION_RELOAD:
+            _memory_store.suppressed[key] = await asyncio.to_thread(_fetch_suppressions, scope)
+            _memory_store.loaded[key] = time.time()
+
+    async def check(self, recipient: dict) -> Optional[str]:
+        """
+        Why the recipient must be skipped ("suppressed" / "recently_contacted"),
+        or None. One Redis round trip; lookup errors never block a send.
+        """
+        keys = contact_keys(recipient)
+        if not keys:
+            return None
+        reason = None
+        try:
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for scope in self.scopes:
+                        pipe.smismember(_suppressed_key(scope), keys)
+                    if self.recent_window:
+                        for key in keys:
+                            pipe.zscore(_recent_key(self.user_id), key)
+                    results = await pipe.execute()
+                flags = [flag for result in results[:len(self.scopes)] for flag in result]
+                last_contacted = results[len(self.scopes):]
+            else:
+                flags = [k in _memory_store.suppressed.get(_suppressed_key(scope), ()) for scope in self.scopes for k in keys]
+                recent = _memory_store.recent.get(_recent_key(self.user_id), {})
+                last_contacted = [recent.get(k) for k in keys] if self.recent_window else []
+            if any(flags):
+                reason = "suppressed"
+            elif any(ts is not None and float(ts) >= time.time() - self.recent_window for ts in last_contacted):
+                reason = "recently_contacted"
+        except Exception as e:
+            logger.warning(f"Contact index check failed: {e}")
+        if reason:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        return reason
+
+    async def mark_contacted(self, recipient: dict):
+        keys = contact_keys(recipient)
+        if not keys:
+            return
+        now = time.time()
+        try:
+            if self.redis:
+                key = _recent_key(self.user_id)
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.zadd(key, {k: now for k in keys})
+                    pipe.expire(key, max(int(self.recent_window), settings.CONTACT_RECENT_WINDOW_HOURS * 3600, 3600))
+                    await pipe.execute()
+            else:
+                _memory_store.recent.setdefault(_recent_key(self.user_id), {}).update({k: now for k in keys})
+        except Exception as e:
+            logger.warning(f"Recent-contact update failed: {e}")
+
+
+async def suppress(contact: str, user_id: Optional[str] = None, reason: str = "opt_out") -> Optional[str]:
+    """
+    Suppresses a contact for one tenant (or globally without `user_id`):
+    durable row first, then the Redis/in-memory mirror. Returns the key.
+    """
+    key = contact_key(contact)
+    if not key:
+        return None
+    scope = user_id or GLOBAL_SCOPE
+
+    def upsert():
+        from app.data.supabase_client import supabase
+        supabase.table(SUPPRESSION_TABLE).upsert(
+            {"scope": scope, "contact_key": key, "reason": reason}, on_conflict="scope,contact_key"
+        ).execute()
+
+    await asyncio.to_thread(upsert)
+    r = get_redis()
+    if r:
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.sadd(_suppressed_key(scope), key)
+            # Picked up by a reload in progress (dropped with it otherwise)
+            pipe.sadd(_staging_key(scope), key)
+            pipe.expire(_staging_key(scope), STAGING_TTL)
+            await pipe.execute()
+    else:
+        _memory_store.suppressed.setdefault(_suppressed_key(scope), set()).add(key)
+    return key
+
+
+async def unsuppress(contact: str, user_id: Optional[str] = None) -> Optional[str]:
+    key = contact_key(contact)
+    if not key:
+        return None
+    scope = user_id or GLOBAL_SCOPE
+
+    def delete():
+        from app.data.supabase_client import supabase
+        supabase.table(SUPPRESSION_TABLE).delete().eq("scope", scope).eq("contact_key", key).execute()
+
+    await asyncio.to_thread(delete)
+    r = get_redis()
+    if r:
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.srem(_suppressed_key(scope), key)
+            pipe.srem(_staging_key(scope), key)
+            await pipe.execute()
+    else:
+        _memory_store.suppressed.get(_suppressed_key(scope), set()).discard(key)
+    return key
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("data.execution_log")
+
+
+def supabase_sink(table: str) -> Callable[[List[Dict[str, Any]]], None]:
+    """Default sink: one bulk PostgREST insert per batch (blocking, run in a thread)."""
+    def insert(rows: List[Dict[str, Any]]):
+        from app.data.supabase_client import supabase
+        supabase.table(table).insert(rows).execute()
+    return insert
+
+
+class ExecutionLogWriter:
+    """
+    Buffered async writer for campaign_executions rows.
+
+    - `write(row)` enqueues onto a bounded queue; when the queue is full the
+      caller waits (backpressure) instead of growing memory without limit.
+    - A background task drains the queue and inserts rows in bulk, flushing
+      when `batch_size` rows are buffered or `flush_interval` seconds pass.
+    - `flush()` waits until everything written so far is persisted; `close()`
+      flushes and stops the task (call at campaign end / shutdown).
+
+    `sink(rows)` does the actual insert and is swappable (e.g. for dry runs).
+    """
+
+    def __init__(
+        self,
+        table: str = "campaign_executions",
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        sink: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        max_retries: int = 3,
+    ):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.sink = sink or supabase_sink(table)
+        self.max_retries = max_retries
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues are bound to a loop; a new loop (worker restart, asyncio.run) gets a fresh one
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def write(self, row: Dict[str, Any]):
+        self._ensure_started()
+        await self._queue.put(row)
+
+    async def write_many(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            await self.write(row)
+
+    async def flush(self):
+        """Blocks until every row written so far has been handed to the sink."""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._insert(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if asyncio.iscoroutinefunction(self.sink):
+                    await self.sink(batch)
+                else:
+                    # Sync sink (supabase-py): keep the blocking call off the event loop
+                    await asyncio.to_thread(self.sink, batch)
+                self.rows_written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                logger.error(f"Execution log insert failed (attempt {attempt}/{self.max_retries}, {len(batch)} rows): {e}")
+                await asyncio.sleep(0.5 * attempt)
+        self.rows_failed += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+        }
+
+
+execution_log = ExecutionLogWriter(
+    batch_size=settings.EXECUTION_LOG_BATCH_SIZE,
+    flush_interval=settings.EXECUTION_LOG_FLUSH_INTERVAL,
+    max_queue=settings.EXECUTION_LOG_MAX_QUEUE,
+)
@@ -15,7 +15,10 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.api.v1.router import api_router
-from app.ai.tools.tools import scheduler
+from app.ai.tools.tools import scheduler, gmail_tokens
+from app.core.cache import cache
+from app.data.execution_log import execution_log
+from app.core.http_client import http_pool
 from fastapi import WebSocket
 from app.services.voice_agent.ws_audio import audio_ws_handler
 
@@ -29,9 +32,14 @@ async def lifespan(app: FastAPI):
         if hasattr(route, "methods"):
             print(f"Route: {route.path} [{','.join(route.methods)}]")
     scheduler.start()
+    cache.start_invalidation_listener()
     yield
     # Shutdown
     print("--- SHUTTING DOWN ---")
+    await execution_log.close()
+    await cache.stop_invalidation_listener()
+    await gmail_tokens.close()
+    await http_pool.aclose()
     scheduler.shutdown()
 
 app = FastAPI(
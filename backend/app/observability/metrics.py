@@ -1,7 +1,9 @@
 import time
 import functools
 import logging
-from typing import Callable, Any
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Any, Dict, Optional
 from contextvars import ContextVar
 
 # Context var to track request start time for TTFT if needed
@@ -67,3 +69,97 @@ class LatencyMonitor:
         )
 
 metrics = LatencyMonitor()
+
+
+# Latency histogram bucket upper bounds, in milliseconds (last bucket is +inf)
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. O(log B) observe, O(B) snapshot.
+    Percentiles are estimated as the upper bound of the bucket they fall in.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for i, n in enumerate(self.counts):
+            running += n
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count, 4) if self.count else 0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class CacheMetrics:
+    """
+    Per-prefix cache counters and latency histograms.
+    The prefix is the key up to the first ':' (e.g. "analytics_main",
+    "llm_response", "campaign_chat"), so per-user keys roll up together.
+    """
+    COUNTERS = (
+        "l1_hits", "l2_hits", "misses", "sets", "deletes", "evictions",
+        "bytes_written", "loads", "coalesced", "stale_served",
+    )
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+        self._latency: Dict[str, Dict[str, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+
+    @staticmethod
+    def prefix_of(key: str) -> str:
+        return key.split(":", 1)[0] or "default"
+
+    def incr(self, key: str, counter: str, amount: int = 1):
+        self._counters[self.prefix_of(key)][counter] += amount
+
+    def observe(self, key: str, op: str, duration_ms: float):
+        self._latency[self.prefix_of(key)][op].observe(duration_ms)
+
+    def snapshot(self, resident: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Any]:
+        """
+        resident: optional {prefix: {"entries": n, "bytes": b}} from the L1 cache.
+        """
+        resident = resident or {}
+        prefixes = {}
+        for prefix in sorted(set(self._counters) | set(resident)):
+            c = dict(self._counters.get(prefix) or dict.fromkeys(self.COUNTERS, 0))
+            lookups = c["l1_hits"] + c["l2_hits"] + c["misses"]
+            prefixes[prefix] = {
+                **c,
+                "hit_ratio": round((c["l1_hits"] + c["l2_hits"]) / lookups, 4) if lookups else None,
+                "l1_entries": resident.get(prefix, {}).get("entries", 0),
+                "l1_bytes": resident.get(prefix, {}).get("bytes", 0),
+                "latency": {op: h.snapshot() for op, h in self._latency.get(prefix, {}).items()},
+            }
+        return {"uptime_s": round(time.time() - self.started_at, 1), "prefixes": prefixes}
+
+    def reset(self):
+        self.__init__()
+
+
+cache_metrics = CacheMetrics()
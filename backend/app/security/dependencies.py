@@ -1,7 +1,10 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from typing import Optional
+from app.core.config import settings
 from app.security.service import auth_service
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
@@ -31,3 +34,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         )
         
     return User(**user_data)
+
+async def verify_internal_token(x_internal_token: Optional[str] = Header(None)) -> None:
+    """
+    Guards operational /internal/* endpoints with the INTERNAL_API_TOKEN shared secret.
+    They answer 404 when no token is configured.
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_redis_sync
+from app.services.subscription_service import SubscriptionService
+
+logger = logging.getLogger("services.quota")
+
+RESERVED_KEY_PREFIX = "quota_reserved"
+UNLIMITED = 9999
+# Plan feature metered by each campaign channel
+CHANNEL_FEATURES = {"email": "email_sent", "whatsapp": "whatsapp_msgs"}
+
+# Grants min(requested, available - already reserved) in one step, so
+# concurrent campaigns of a user can never reserve past the plan limit
+_RESERVE_SCRIPT = """
+local reserved = tonumber(redis.call('GET', KEYS[1]) or '0')
+local grant = math.min(tonumber(ARGV[1]), tonumber(ARGV[2]) - reserved)
+if grant <= 0 then return 0 end
+redis.call('INCRBY', KEYS[1], grant)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return grant
+"""
+
+
+class _MemoryStore:
+    """Process-local reservations when Redis is not configured."""
+    def __init__(self):
+        self.reserved: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+
+_memory_store = _MemoryStore()
+def _reserved_key(user_id: str, feature: str) -> str:
+    return f"{RESERVED_KEY_PREFIX}:{user_id}:{feature}:{SubscriptionService.get_current_period_key()}"
+
+
+def reserved_units(user_id: str, feature: str) -> int:
+    """Units currently reserved by running campaigns (not yet in usage_logs)."""
+    key = _reserved_key(user_id, feature)
+    try:
+        r = get_redis_sync()
+        if r is not None:
+            return max(0, int(r.get(key) or 0))
+    except Exception as e:
+        logger.warning(f"Quota reservation read failed: {e}")
+        return 0
+    return _memory_store.reserved.get(key, 0)
+
+
+class QuotaReservation:
+    """
+    Campaign-level quota for one (user, feature), so sends skip the
+    per-message check_usage / log_usage round trips.
+
+    - `reserve` reads the plan limit and usage once and atomically reserves
+      up to `chunk` units (Redis counter `quota_reserved:{user}:{feature}:{period}`,
+      which check_usage counts as used). When the local balance runs low the
+      next chunk is reserved in the background.
+    - `acquire` / `release` draw the balance down in memory; a send that
+      fails gives its unit back.
+    - Used units are written to usage_logs in bulk every `flush_every`
+      deliveries and moved out of the reservation; `settle` writes the rest
+      and refunds whatever was reserved but not used.
+    """
+
+    def __init__(self, user_id: str, feature: str, chunk: Optional[int] = None, flush_every: Optional[int] = None):
+        self.user_id = user_id
+        self.feature = feature
+        self.chunk = chunk or settings.QUOTA_RESERVE_CHUNK
+        self.flush_every = flush_every or settings.QUOTA_FLUSH_EVERY
+        self.key = _reserved_key(user_id, feature)
+        self.redis = get_redis()
+
+        self.granted = 0  # reserved and not yet moved to usage_logs
+        self.used = 0  # delivered, not yet written to usage_logs
+        self.in_flight = 0
+        self.used_total = 0
+        self.exhausted = False
+        self.unlimited = False
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._tasks = set()
+
+    @property
+    def available(self) -> int:
+        return self.granted - self.used - self.in_flight
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def reserve(self, requested: Optional[int] = None) -> int:
+        """Reserves up to `requested` more units (default: one chunk). Returns the units granted."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.exhausted:
+                return 0
+            if requested is None:
+                if self.granted and self.available > self.chunk // 4:
+                    # Another caller topped up while this one waited
+                    return 0
+                requested = self.chunk
+            limit, usage = await asyncio.to_thread(SubscriptionService.get_usage, self.user_id, self.feature)
+            if limit == UNLIMITED or usage is None:
+                # Same fail-open as check_usage on a DB error
+                self.unlimited = True
+                return requested
+            try:
+                grant = await self._reserve(requested, limit - usage)
+            except Exception as e:
+                # Redis down: reserve process-locally for the rest of the run
+                # instead of failing every send (check_usage fails open too).
+                # Units already reserved in Redis expire with the key TTL.
+                logger.warning(f"Quota reservation failed for {self.user_id}/{self.feature}, reserving locally: {e}")
+                self.redis = None
+                grant = await self._reserve(requested, limit - usage)
+            self.granted += grant
+            if grant < requested:
+                self.exhausted = True
+                print(f"[Limit Reached] User {self.user_id} quota for {self.feature} fully reserved ({limit - usage} left this period)")
+            return grant
+
+    async def _reserve(self, requested: int, available: int) -> int:
+        if self.redis:
+            return int(await self.redis.eval(_RESERVE_SCRIPT, 1, self.key, requested, available, settings.QUOTA_RESERVATION_TTL))
+        with _memory_store.lock:
+            grant = max(0, min(requested, available - _memory_store.reserved.get(self.key, 0)))
+            _memory_store.reserved[self.key] = _memory_store.reserved.get(self.key, 0) + grant
+            return grant
+
+    async def _unreserve(self, units: int):
+        if units <= 0:
+            return
+        if self.redis:
+            await self.redis.decrby(self.key, units)
+        else:
+            with _memory_store.lock:
+                _memory_store.reserved[self.key] = max(0, _memory_store.reserved.get(self.key, 0) - units)
+
+    async def acquire(self) -> bool:
+        """Takes one unit for a send. False when the plan limit is reached."""
+        if self.unlimited:
+            self.in_flight += 1
+            return True
+        if self.available <= 0:
+            if self.exhausted:
+                return False
+            await self.reserve()
+            if self.available <= 0:
+                return False
+        elif self.available <= self.chunk // 4 and not self.exhausted and not (self._lock and self._lock.locked()):
+            # Top up ahead of need so sends do not wait on the DB
+            self._spawn(self.reserve())
+        self.in_flight += 1
+        return True
+
+    def release(self, delivered: bool):
+        """Returns the unit of a finished send; only delivered sends count as usage."""
+        self.in_flight -= 1
+        if delivered:
+            self.used += 1
+            self.used_total += 1
+            if self.used >= self.flush_every:
+                self._spawn(self.flush())
+
+    async def flush(self):
+        """Writes delivered units to usage_logs (one insert) and moves them out of the reservation."""
+        units, self.used = self.used, 0
+        if units <= 0:
+            return
+        # Balance first (it must not grow while the insert runs); the shared
+        # counter only after the insert, so the units are never uncounted
+        moved = min(units, self.granted)
+        self.granted -= moved
+        await asyncio.to_thread(SubscriptionService.log_usage, self.user_id, self.feature, units)
+        try:
+            await self._unreserve(moved)
+        except Exception as e:
+            logger.warning(f"Quota reservation update failed for {self.user_id}/{self.feature}: {e}")
+
+    async def settle(self) -> Dict[str, int]:
+        """Records remaining usage and refunds unused units. Call once the run ends (or pauses)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self.flush()
+        refunded = max(0, self.granted - self.in_flight)
+        try:
+            await self._unreserve(refunded)
+        except Exception as e:
+            logger.warning(f"Quota refund failed for {self.user_id}/{self.feature}: {e}")
+        self.granted -= refunded
+        return {"used": self.used_total, "refunded": refunded}
+
+
+async def reserve_campaign_quota(user_id: str, channels) -> Dict[str, QuotaReservation]:
+    """Reserves the first chunk for every metered channel of a campaign, keyed by channel."""
+    quotas = {ch: QuotaReservation(user_id, CHANNEL_FEATURES[ch]) for ch in channels if ch in CHANNEL_FEATURES}
+    await asyncio.gather(*(q.reserve() for q in quotas.values()))
+    return quotas
+
+
+async def settle_campaign_quota(quotas: Dict[str, QuotaReservation]) -> Dict[str, Dict[str, int]]:
+    settled = {}
+    for channel, quota in quotas.items():
+        try:
+            settled[channel] = await quota.settle()
+        except Exception as e:
+            logger.warning(f"Quota settle failed for {quota.user_id}/{quota.feature}: {e}")
+    return settled
@@ -1,5 +1,5 @@
 import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from app.core.config import settings
 
 class SubscriptionService:
@@ -14,21 +14,24 @@ class SubscriptionService:
             "whatsapp_msgs": 100,
             "email_sent": 100,
             "campaigns": 5, # Active templates? Or total? Let's say Total Active campaigns.
-            "analytics_advanced": False
+            "analytics_advanced": False,
+            "scheduler_weight": 1 # Share of campaign capacity when tenants run at once
         },
         "professional": {
             "voice_calls": 500,
             "whatsapp_msgs": 1000,
             "email_sent": 1000,
             "campaigns": 50, # Unlimited
-            "analytics_advanced": True
+            "analytics_advanced": True,
+            "scheduler_weight": 3
         },
         "enterprise": {
             "voice_calls": 10000,
             "whatsapp_msgs": 20000,
             "email_sent": 20000, # Unlimited
             "campaigns": 500,
-            "analytics_advanced": True
+            "analytics_advanced": True,
+            "scheduler_weight": 8
         }
     }
 
@@ -56,18 +59,16 @@ class SubscriptionService:
             return "starter"
 
     @staticmethod
-    def check_usage(user_id: str, feature: str) -> bool:
+    def get_usage(user_id: str, feature: str) -> Tuple[int, Optional[int]]:
         """
-        Checks if user has quota for a specific feature.
-        Features: 'voice_calls', 'whatsapp_msgs', 'campaigns'
+        Returns (limit, current usage this period) for a feature.
+        Usage is None when it could not be read, or is not read at all for
+        unlimited features.
         """
         plan_id = SubscriptionService.get_user_plan(user_id)
         limits = SubscriptionService.PLANS.get(plan_id, SubscriptionService.PLANS["starter"])
-        
         limit = limits.get(feature, 0)
-        if limit == 9999: return True # Unlimited
-        
-        # Check current usage
+        if limit == 9999: return limit, None # Unlimited: no usage query
         try:
             from app.data.supabase_client import supabase
             period = SubscriptionService.get_current_period_key()
@@ -79,20 +80,40 @@ class SubscriptionService:
             
             res = supabase.table("usage_logs").select("count").eq("user_id", user_id).eq("feature_name", feature).eq("period_key", period).execute()
             
-            current_usage = sum([row['count'] for row in res.data]) if res.data else 0
-            
-            if current_usage >= limit:
-                print(f"[Limit Reached] User {user_id} hit limit for {feature} ({current_usage}/{limit})")
-                return False
-                
-            return True
-            
+            return limit, sum([row['count'] for row in res.data]) if res.data else 0
         except Exception as e:
             print(f"[Subscription] Error checking usage: {e}")
+            return limit, None
+
+    @staticmethod
+    def get_scheduler_weight(user_id: str) -> int:
+        """Fair-share weight of the user's plan for concurrent campaign execution."""
+        plan_id = SubscriptionService.get_user_plan(user_id)
+        return SubscriptionService.PLANS.get(plan_id, SubscriptionService.PLANS["starter"]).get("scheduler_weight", 1)
+
+    @staticmethod
+    def check_usage(user_id: str, feature: str) -> bool:
+        """
+        Checks if user has quota for a specific feature.
+        Features: 'voice_calls', 'whatsapp_msgs', 'campaigns'
+        Units reserved by running campaigns (quota_reservation) count as used.
+        """
+        limit, current_usage = SubscriptionService.get_usage(user_id, feature)
+        if limit == 9999: return True # Unlimited
+        
+        if current_usage is None:
             # Fail safe: Allow if DB error? Or block? 
             # Let's allow to avoid downtime disruption, but log error.
             return True
 
+        from app.services.quota_reservation import reserved_units
+        current_usage += reserved_units(user_id, feature)
+        if current_usage >= limit:
+            print(f"[Limit Reached] User {user_id} hit limit for {feature} ({current_usage}/{limit})")
+            return False
+            
+        return True
+
     @staticmethod
     def log_usage(user_id: str, feature: str, amount: int = 1):
         """
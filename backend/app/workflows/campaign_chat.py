@@ -393,7 +393,7 @@ class CampaignChatWorkflow:
         }
 
     async def save_state(self, state: CampaignAgentState):
-        await cache.set(self.cache_key, json.dumps(state), ttl=600)
+        await cache.set(self.cache_key, json.dumps(state), ttl=600, tags=[f"user:{self.user_id}"])
 
     async def clear_state(self):
         await cache.delete(self.cache_key)
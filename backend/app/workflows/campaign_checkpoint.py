@@ -0,0 +1,161 @@
+import time
+import logging
+from collections import deque
+from typing import Dict, Iterable, Optional, Set
+
+from app.core.redis_client import get_redis
+from app.data.contact_index import channel_contact_key
+
+logger = logging.getLogger("workflows.checkpoint")
+
+# Checkpoints outlive any realistic campaign run; they are cleared on success
+CHECKPOINT_TTL = 7 * 24 * 3600
+# Persist the cursor after this many newly completed recipients (or SAVE_INTERVAL seconds)
+SAVE_EVERY = 50
+SAVE_INTERVAL = 5.0
+
+
+class _MemoryStore:
+    """Process-local fallback when Redis is not configured."""
+    def __init__(self):
+        self.cursors: Dict[str, str] = {}
+        self.ledgers: Dict[str, Set[str]] = {}
+
+
+_memory_store = _MemoryStore()
+
+
+class CampaignCheckpoint:
+    """
+    Per-campaign progress so a crashed or retried run continues where it stopped.
+
+    - cursor: the highest candidate id such that every recipient up to it has
+      finished (a low watermark - completions arrive out of order). A resumed
+      run restarts keyset pagination after it.
+    - sent ledger: "{contact}:{channel}" for every delivered send (written
+      as soon as the send returns), covering the recipients past the cursor
+      that finished before the crash. Failed sends are not recorded, so a
+      resumed run retries the ones past the cursor. Members are keyed by
+      the normalized email / phone the channel sends to ("e:a@x.com:email"),
+      so a duplicate contact on another candidate row past the cursor is
+      not messaged again after a resume.
+
+    Stored in Redis (hash + set, 7 day TTL), or in process memory without Redis.
+    Fresh runs skip ledger reads entirely.
+    """
+
+    def __init__(self, campaign_id: str):
+        self.campaign_id = campaign_id
+        self.key = f"campaign_ckpt:{campaign_id}"
+        self.ledger_key = f"{self.key}:sent"
+        self.redis = get_redis()
+
+        self.cursor: Optional[str] = None
+        self.resuming = False
+
+        # Watermark tracking (only for id-ordered streams)
+        self._dispatched: deque = deque()
+        self._done: Set[str] = set()
+        self._since_save = 0
+        self._last_save = time.monotonic()
+
+    @staticmethod
+    def recipient_key(recipient: dict) -> str:
+        return str(recipient.get("id") or recipient.get("email") or recipient.get("phone"))
+
+    @classmethod
+    def ledger_member(cls, recipient: dict, channel: str) -> str:
+        return f"{channel_contact_key(recipient, channel) or cls.recipient_key(recipient)}:{channel}"
+
+    async def load(self) -> Optional[str]:
+        """Reads any previous progress. Returns the cursor to resume after (or None)."""
+        try:
+            if self.redis:
+                state = await self.redis.hgetall(self.key)
+                self.cursor = state.get("cursor") or None
+                self.resuming = bool(state) or bool(await self.redis.exists(self.ledger_key))
+            else:
+                self.cursor = _memory_store.cursors.get(self.key)
+                self.resuming = self.cursor is not None or bool(_memory_store.ledgers.get(self.ledger_key))
+        except Exception as e:
+            logger.warning(f"Checkpoint load failed for {self.campaign_id}: {e}")
+        if self.resuming:
+            logger.info(f"Resuming campaign {self.campaign_id} after cursor={self.cursor}")
+        return self.cursor
+
+    async def sent_channels(self, recipient: dict, channels: Iterable[str]) -> Set[str]:
+        """Channels already delivered to this recipient by an earlier attempt."""
+        if not self.resuming:
+            return set()
+        channels = list(channels)
+        members = [self.ledger_member(recipient, ch) for ch in channels]
+        try:
+            if self.redis:
+                flags = await self.redis.smismember(self.ledger_key, members)
+            else:
+                ledger = _memory_store.ledgers.get(self.ledger_key, set())
+                flags = [m in ledger for m in members]
+            return {ch for ch, flag in zip(channels, flags) if flag}
+        except Exception as e:
+            logger.warning(f"Checkpoint ledger read failed: {e}")
+            return set()
+
+    async def mark_sent(self, recipient: dict, channel: str):
+        member = self.ledger_member(recipient, channel)
+        try:
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.sadd(self.ledger_key, member)
+                    pipe.expire(self.ledger_key, CHECKPOINT_TTL)
+                    await pipe.execute()
+            else:
+                _memory_store.ledgers.setdefault(self.ledger_key, set()).add(member)
+        except Exception as e:
+            logger.warning(f"Checkpoint ledger write failed: {e}")
+
+    # --- Cursor (low watermark) ---
+
+    def started(self, recipient: dict):
+        if recipient.get("id") is not None:
+            self._dispatched.append(str(recipient["id"]))
+
+    async def finished(self, recipient: dict):
+        if recipient.get("id") is None:
+            return
+        self._done.add(str(recipient["id"]))
+        advanced = False
+        while self._dispatched and self._dispatched[0] in self._done:
+            self.cursor = self._dispatched.popleft()
+            self._done.discard(self.cursor)
+            advanced = True
+        if advanced:
+            self._since_save += 1
+            if self._since_save >= SAVE_EVERY or time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                await self.save()
+
+    async def save(self):
+        self._since_save = 0
+        self._last_save = time.monotonic()
+        if self.cursor is None:
+            return
+        try:
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(self.key, mapping={"cursor": self.cursor, "updated_at": int(time.time())})
+                    pipe.expire(self.key, CHECKPOINT_TTL)
+                    await pipe.execute()
+            else:
+                _memory_store.cursors[self.key] = self.cursor
+        except Exception as e:
+            logger.warning(f"Checkpoint save failed for {self.campaign_id}: {e}")
+
+    async def clear(self):
+        """Drops all progress; called once the campaign completed successfully."""
+        try:
+            if self.redis:
+                await self.redis.delete(self.key, self.ledger_key)
+            else:
+                _memory_store.cursors.pop(self.key, None)
+                _memory_store.ledgers.pop(self.ledger_key, None)
+        except Exception as e:
+            logger.warning(f"Checkpoint clear failed for {self.campaign_id}: {e}")
@@ -0,0 +1,461 @@
+"""
+Staged producer/consumer execution of campaign recipients.
+
+Every recipient flows through bounded queues, each drained by its own
+worker pool:
+
+    resolve -> generate -> send_whatsapp / send_email -> log
+
+A slow stage (usually the LLM) fills its queue and backs up the stages
+before it down to the page fetcher, while the other stages keep draining
+their own work. Throughput is set by the bottleneck stage, and the number
+of recipients held in memory is bounded by the queue sizes plus workers.
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.ai.models.llm_generation import generate_personalized_content, generate_cohort_content, batched_generator
+from app.ai.tools.link_resolver import build_link_query
+from app.core.config import settings
+from app.data.contact_index import channel_contact_key
+from app.observability.metrics import Histogram
+from app.workflows.campaign_providers import get_providers
+
+logger = logging.getLogger("workflows.pipeline")
+
+# Stage latencies run from milliseconds (cache hits) to tens of seconds (LLM)
+STAGE_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+STAGES = ("resolve", "generate", "send_whatsapp", "send_email", "log")
+
+# [stage, seconds blocked on the current item] of the running worker; time spent
+# blocked on a full downstream queue is backpressure, not work
+_current_worker: ContextVar[Optional[list]] = ContextVar("pipeline_worker", default=None)
+
+
+def stage_workers(overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Worker count per stage: settings, then any per-run overrides."""
+    workers = {
+        "resolve": settings.CAMPAIGN_RESOLVE_WORKERS,
+        "generate": settings.CAMPAIGN_GENERATE_WORKERS,
+        "send_whatsapp": settings.CAMPAIGN_SEND_WHATSAPP_WORKERS,
+        "send_email": settings.CAMPAIGN_SEND_EMAIL_WORKERS,
+        "log": settings.CAMPAIGN_LOG_WORKERS,
+    }
+    for name, count in (overrides or {}).items():
+        if name not in workers:
+            raise ValueError(f"Unknown pipeline stage: {name}")
+        workers[name] = max(1, int(count))
+    return workers
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """Parses "generate=64,send_email=16" into stage overrides."""
+    workers = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, count = item.split("=", 1)
+            workers[name.strip()] = int(count)
+    return workers
+
+
+class PipelineStage:
+    """One bounded queue + worker pool, with service-time and queue-wait histograms."""
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[None]], workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.service = Histogram(STAGE_BUCKETS_MS)
+        self.wait = Histogram(STAGE_BUCKETS_MS)
+        self.processed = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0
+        self.max_depth = 0
+
+    def snapshot(self, wall_s: float) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "errors": self.errors,
+            "max_queue_depth": self.max_depth,
+            # Share of worker time spent working (not blocked downstream); the bottleneck stage sits near 1.0
+            "utilization": round(self.busy_s / (self.workers * wall_s), 3) if wall_s else None,
+            "blocked_s": round(self.blocked_s, 3),
+            "service": self.service.snapshot(),
+            "queue_wait": self.wait.snapshot(),
+        }
+
+
+class StagedPipeline:
+    """
+    Runs items through named stages. A handler forwards work by awaiting
+    `put(next_stage, item)`, which blocks while that stage's queue is full.
+    Stages must form a DAG listed in order, so `join` can drain them in turn.
+    """
+
+    def __init__(self, stages: List[PipelineStage], on_error: Optional[Callable[[str, Any, Exception], Awaitable[None]]] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.on_error = on_error
+        self._tasks: List[asyncio.Task] = []
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        for stage in self.stages.values():
+            for _ in range(stage.workers):
+                self._tasks.append(asyncio.create_task(self._work(stage)))
+
+    async def put(self, stage_name: str, item: Any):
+        stage = self.stages[stage_name]
+        start = time.perf_counter()
+        await stage.queue.put((start, item))
+        worker = _current_worker.get()
+        if worker is not None:
+            blocked = time.perf_counter() - start
+            worker[0].blocked_s += blocked
+            worker[1] += blocked
+        stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+
+    async def _work(self, stage: PipelineStage):
+        worker = [stage, 0.0]
+        _current_worker.set(worker)
+        while True:
+            enqueued, item = await stage.queue.get()
+            start = time.perf_counter()
+            worker[1] = 0.0
+            stage.wait.observe((start - enqueued) * 1000)
+            try:
+                await stage.handler(item)
+            except Exception as e:
+                stage.errors += 1
+                logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                if self.on_error is not None:
+                    try:
+                        await self.on_error(stage.name, item, e)
+                    except Exception:
+                        pass
+            finally:
+                elapsed = time.perf_counter() - start - worker[1]
+                stage.busy_s += elapsed
+                stage.service.observe(elapsed * 1000)
+                stage.processed += 1
+                stage.queue.task_done()
+
+    async def join(self):
+        """Waits until every stage is drained (items only move downstream)."""
+        for stage in self.stages.values():
+            await stage.queue.join()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._started if self._started else 0.0
+        return {name: stage.snapshot(wall) for name, stage in self.stages.items()}
+
+
+class RecipientJob:
+    """A recipient's state as it moves through the stages."""
+
+    __slots__ = (
+        "recipient", "channels", "verified_link", "email_subject", "email_msg",
+        "whatsapp_msg", "outstanding", "success", "started", "done",
+    )
+
+    def __init__(self, recipient: dict, channels: List[str]):
+        self.recipient = recipient
+        self.channels = channels  # still to deliver
+        self.verified_link = None
+        self.email_subject = "Admit AI Update"
+        self.email_msg = ""
+        self.whatsapp_msg = ""
+        self.outstanding = 0  # sends not yet logged
+        self.success = False
+        self.started = time.perf_counter()
+        self.done = False
+
+
+class CampaignPipeline:
+    """
+    Campaign recipients through the staged pipeline:
+
+    - resolve: skips suppressed / recently contacted recipients, channels the
+      checkpoint ledger already has and channels whose email / phone an
+      earlier recipient of this run already takes, resolves the verified
+      link (cached; usually prefetched)
+    - generate: LLM content per the campaign's generation mode, or the static
+      template
+    - send_whatsapp / send_email: throttled channel sends; a delivered send
+      goes into the checkpoint ledger at once
+    - log: execution row, recent contacts and live progress counters
+
+    A recipient is finished (checkpoint watermark, "recipient" timing) once
+    its last send is logged, or earlier when nothing is left to send.
+    Generation and sends hold a fair-share scheduler slot while they run,
+    so concurrent campaigns of different tenants share capacity by plan.
+    """
+
+    def __init__(self, campaign_id: str, campaign_data: dict, channels: List[str], checkpoint=None, progress=None,
+                 workers: Optional[Dict[str, int]] = None, queue_size: Optional[int] = None, quotas: Optional[Dict[str, Any]] = None,
+                 contacts=None, tenant_weight: int = 1):
+        self.campaign_id = campaign_id
+        self.campaign_data = campaign_data
+        self.channels = channels
+        self.checkpoint = checkpoint
+        self.progress = progress
+        # Campaign QuotaReservations by channel; without one a send checks the plan per message
+        self.quotas = quotas or {}
+        # ContactIndex: suppressed / recently contacted recipients are skipped before generation
+        self.contacts = contacts
+        self.providers = get_providers()
+        self.user_id = campaign_data.get("user_id", "default_user")
+        # Generation and sends take slots from the process-wide fair-share scheduler
+        self.scheduler = self.providers.scheduler
+        self.tenant_weight = tenant_weight
+
+        meta = campaign_data.get("metadata", {}) or {}
+        self.ai_prompt = meta.get("ai_prompt", "")
+        self.static_body = meta.get("template_body", "Hello! We have an update for you.")
+        self.generation_mode = meta.get("generation_mode")
+        self.cohort_variants = max(1, min(int(meta.get("cohort_variants") or 1), 5))
+        self.sender_name = campaign_data.get("sender_name", "Admit AI Team")
+        self.primary_channel = "email" if "email" in channels else "whatsapp"
+
+        counts = stage_workers(workers)
+        size = queue_size or settings.CAMPAIGN_STAGE_QUEUE_SIZE
+        handlers = {
+            "resolve": self._resolve,
+            "generate": self._generate,
+            "send_whatsapp": self._send_whatsapp,
+            "send_email": self._send_email,
+            "log": self._log,
+        }
+        self.pipeline = StagedPipeline(
+            [PipelineStage(name, handlers[name], counts[name], size) for name in STAGES],
+            on_error=self._on_error,
+        )
+        self.submitted = 0
+        # "{contact key}:{channel}" of every send this run has taken on
+        self._claimed: Set[str] = set()
+
+    def start(self):
+        self.pipeline.start()
+
+    async def submit(self, recipient: dict):
+        """Queues a recipient; waits while the resolve queue is full (backpressure to the fetcher)."""
+        if self.checkpoint:
+            self.checkpoint.started(recipient)
+        if self.progress:
+            self.progress.incr("queued")
+        self.submitted += 1
+        await self.pipeline.put("resolve", RecipientJob(recipient, list(self.channels)))
+
+    async def drain(self) -> Dict[str, Any]:
+        """Waits for every submitted recipient, stops the workers and returns per-stage stats."""
+        try:
+            await self.pipeline.join()
+        finally:
+            await self.pipeline.close()
+        stats = self.pipeline.stats()
+        for name, stage in stats.items():
+            logger.info(
+                f"Stage {name}: workers={stage['workers']} processed={stage['processed']} "
+                f"util={stage['utilization']} p95={stage['service']['p95_ms']}ms "
+                f"wait_p95={stage['queue_wait']['p95_ms']}ms max_depth={stage['max_queue_depth']}"
+            )
+        return stats
+
+    async def _finish(self, job: RecipientJob):
+        if job.done:
+            return
+        job.done = True
+        if self.checkpoint:
+            await self.checkpoint.finished(job.recipient)
+        if self.providers.on_stage is not None:
+            self.providers.on_stage("recipient", time.perf_counter() - job.started)
+
+    async def _on_error(self, stage: str, item: Any, error: Exception):
+        if isinstance(item, tuple):
+            # A send result that could not be logged
+            job, channel = item[0], item[1]
+            if self.progress:
+                self.progress.record_send(channel, False)
+            job.outstanding -= 1
+            if job.outstanding > 0:
+                return
+        else:
+            job = item
+            logger.error(f"Critical Worker Error for recipient {job.recipient}: {error}")
+        await self._finish(job)
+
+    # --- Stages ---
+
+    async def _resolve(self, job: RecipientJob):
+        if self.contacts:
+            reason = await self.contacts.check(job.recipient)
+            if reason:
+                if self.progress:
+                    self.progress.incr(reason)
+                await self._finish(job)
+                return
+
+        if self.checkpoint:
+            already_sent = await self.checkpoint.sent_channels(job.recipient, job.channels)
+            if already_sent:
+                job.channels = [ch for ch in job.channels if ch not in already_sent]
+
+        # Recipients sharing a phone (or email) get that channel once
+        channels = []
+        for ch in job.channels:
+            key = channel_contact_key(job.recipient, ch)
+            if key is None:
+                channels.append(ch)
+            elif f"{key}:{ch}" not in self._claimed:
+                self._claimed.add(f"{key}:{ch}")
+                channels.append(ch)
+        job.channels = channels
+        if not job.channels:
+            if self.progress:
+                self.progress.incr("skipped")
+            await self._finish(job)
+            return
+
+        if self.ai_prompt:
+            try:
+                # Use Campaign Goal + Recipient Context for Link Search
+                async with self.providers.stage("link"):
+                    job.verified_link = await self.providers.link_resolver.resolve(build_link_query(self.ai_prompt, job.recipient))
+                logger.info(f"Verified Link Found: {job.verified_link}")
+            except Exception as e:
+                logger.error(f"Link resolution failed for {job.recipient.get('email')}: {e}")
+        await self.pipeline.put("generate", job)
+
+    async def _generate(self, job: RecipientJob):
+        recipient = job.recipient
+        logger.info(f"Processing: {recipient.get('name')} | Email: {recipient.get('email')} | Phone: {recipient.get('phone')}")
+
+        if self.ai_prompt:
+            try:
+                if self.generation_mode not in ("cohort", "batched"):
+                    # Rate wait before taking a scheduler slot, so slots are only held while generating
+                    await self.providers.throttle.acquire("channel:llm")
+                async with self.scheduler.slot("generate", self.user_id, self.tenant_weight), self.providers.stage("llm"):
+                    if self.generation_mode == "cohort":
+                        generated_response = await generate_cohort_content(
+                            recipient, self.ai_prompt, self.primary_channel, job.verified_link, sender_name=self.sender_name,
+                            campaign_id=self.campaign_id, variants=self.cohort_variants,
+                        )
+                    elif self.generation_mode == "batched":
+                        generated_response = await batched_generator.generate(recipient, self.ai_prompt, self.primary_channel, job.verified_link, sender_name=self.sender_name)
+                    else:
+                        generated_response = await generate_personalized_content(recipient, self.ai_prompt, self.primary_channel, job.verified_link, sender_name=self.sender_name)
+
+                job.email_msg = generated_response
+                job.whatsapp_msg = generated_response
+
+                if self.primary_channel == "email":
+                    if "SUBJECT:" in generated_response and "BODY:" in generated_response:
+                        parts = generated_response.split("BODY:")
+                        job.email_subject = parts[0].replace("SUBJECT:", "").strip()
+                        job.email_msg = parts[1].strip()
+                    else:
+                        job.email_subject = "Information for You"
+                    job.whatsapp_msg = f"{job.email_subject}. Check your email for details."
+            except Exception as e:
+                logger.error(f"AI Generation Failed for {recipient.get('email')}: {e}")
+                # Fallback
+                job.email_msg = self.static_body or "Hello, please check our updates."
+                job.whatsapp_msg = job.email_msg
+        else:
+            job.email_msg = self.static_body.replace("{{name}}", recipient.get("name", "Student"))
+            job.whatsapp_msg = job.email_msg[:160]
+
+        if self.progress:
+            self.progress.incr("generated")
+
+        sends = []
+        if "whatsapp" in job.channels and recipient.get("phone"):
+            sends.append("send_whatsapp")
+        if "email" in job.channels:
+            if recipient.get("email"):
+                sends.append("send_email")
+            else:
+                logger.warning(f"Skipping Email: No email address for {recipient.get('name')}")
+        if not sends:
+            await self._finish(job)
+            return
+        job.outstanding = len(sends)
+        for stage in sends:
+            await self.pipeline.put(stage, job)
+
+    async def _send_whatsapp(self, job: RecipientJob):
+        phone = job.recipient.get("phone")
+        row = None
+        try:
+            # Channel rate wait outside the slot; slots are per channel, so a
+            # rate-limited provider cannot hold the other channel's capacity
+            await self.providers.throttle.acquire("channel:whatsapp")
+            async with self.scheduler.slot("send:whatsapp", self.user_id, self.tenant_weight), self.providers.stage("send_whatsapp"):
+                wa_status = await self.providers.send_whatsapp(phone, job.whatsapp_msg, user_id=self.user_id, quota=self.quotas.get("whatsapp"))
+            if "sent" in wa_status:
+                logger.info(f"WhatsApp SENT to {phone}")
+                await self._mark_sent(job, "whatsapp")
+            else:
+                logger.error(f"WhatsApp FAILED to {phone}: {wa_status}")
+            row = {
+                "campaign_id": self.campaign_id, "channel": "whatsapp",
+                "status": "delivered" if "sent" in wa_status else "failed",
+                "recipient": phone, "message_content": job.whatsapp_msg,
+            }
+        except Exception as e:
+            logger.error(f"WhatsApp Failed to {phone}: {e}")
+        await self.pipeline.put("log", (job, "whatsapp", row))
+
+    async def _send_email(self, job: RecipientJob):
+        email = job.recipient.get("email")
+        row = None
+        try:
+            logger.info(f"Sending Email to {email}...")
+            await self.providers.throttle.acquire("channel:email")
+            async with self.scheduler.slot("send:email", self.user_id, self.tenant_weight), self.providers.stage("send_email"):
+                status = await self.providers.send_email(email, job.email_subject, job.email_msg, html_content=job.email_msg, user_id=self.user_id, quota=self.quotas.get("email"))
+            logger.info(f"Email Status: {status}")
+            if "sent" in status:
+                await self._mark_sent(job, "email")
+            row = {
+                "campaign_id": self.campaign_id, "channel": "email",
+                "status": "delivered" if "sent" in status else "failed",
+                "recipient": email, "message_content": job.email_msg,
+            }
+        except Exception as e:
+            logger.error(f"Email Exception for {email}: {e}")
+        await self.pipeline.put("log", (job, "email", row))
+
+    async def _mark_sent(self, job: RecipientJob, channel: str):
+        # Right after the send, so a crash before the log stage cannot re-send on resume;
+        # failed sends stay out of the ledger and are retried
+        if self.checkpoint:
+            await self.checkpoint.mark_sent(job.recipient, channel)
+
+    async def _log(self, item):
+        job, channel, row = item
+        delivered = row is not None and row["status"] == "delivered"
+        if row is not None:
+            await self.providers.execution_log.write(row)
+        if delivered and self.contacts and not job.success:
+            await self.contacts.mark_contacted(job.recipient)
+        if self.progress:
+            self.progress.record_send(channel, delivered)
+        job.success = job.success or delivered
+        job.outstanding -= 1
+        if job.outstanding == 0:
+            await self._finish(job)
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional, Set
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("workflows.progress")
+
+# Counters stay readable for a while after the run (dashboards, late subscribers)
+PROGRESS_TTL = 7 * 24 * 3600
+# Increments are coalesced locally and flushed (one pipeline + one delta event) this often
+FLUSH_INTERVAL = 0.5
+FINAL_STATUSES = ("completed", "paused", "failed")
+
+
+class _MemoryStore:
+    """Process-local fallback when Redis is not configured (and for simulated runs)."""
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self.status: Dict[str, str] = {}
+        self.listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+
+_memory_store = _MemoryStore()
+
+
+def _progress_key(campaign_id: str) -> str:
+    return f"campaign_progress:{campaign_id}"
+
+
+def _decode(state: Dict[str, str]) -> dict:
+    snapshot = {"status": state.get("status") or "unknown"}
+    for field, value in state.items():
+        if field not in ("status", "updated_at"):
+            try:
+                snapshot[field] = int(value)
+            except (TypeError, ValueError):
+                pass
+    if state.get("updated_at"):
+        snapshot["updated_at"] = float(state["updated_at"])
+    return snapshot
+
+
+class CampaignProgress:
+    """
+    Live per-campaign counters: queued, generated, sent, failed, skipped and
+    "{channel}_sent" / "{channel}_failed".
+
+    `incr` only touches a local dict; a background task flushes the pending
+    increments every FLUSH_INTERVAL as one Redis pipeline (HINCRBY on
+    `campaign_progress:{id}`) and publishes the coalesced delta, with the new
+    totals, on the channel of the same name. Counters survive a resumed run,
+    so the totals cover every attempt; increments not yet flushed when a
+    worker dies are lost (at most FLUSH_INTERVAL worth).
+    Without Redis the counters and listeners live in process memory; if
+    Redis fails mid-run, `finish` falls back to this attempt's local totals.
+    """
+
+    def __init__(self, campaign_id: str, flush_interval: float = FLUSH_INTERVAL):
+        self.campaign_id = campaign_id
+        self.key = _progress_key(campaign_id)
+        self.flush_interval = flush_interval
+        self.redis = get_redis()
+        self.status = "active"
+
+        self._pending: Dict[str, int] = {}
+        self._local: Dict[str, int] = {}  # everything counted by this attempt
+        self._flusher: Optional[asyncio.Task] = None
+
+    def incr(self, field: str, amount: int = 1):
+        self._pending[field] = self._pending.get(field, 0) + amount
+        self._local[field] = self._local.get(field, 0) + amount
+
+    def record_send(self, channel: str, delivered: bool):
+        outcome = "sent" if delivered else "failed"
+        self.incr(outcome)
+        self.incr(f"{channel}_{outcome}")
+
+    async def start(self, resume: bool = False):
+        """Resets the counters for a fresh run (kept when resuming) and starts flushing."""
+        self.status = "active"
+        try:
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    if not resume:
+                        pipe.delete(self.key)
+                    pipe.hset(self.key, mapping={"status": self.status, "updated_at": time.time()})
+                    pipe.expire(self.key, PROGRESS_TTL)
+                    await pipe.execute()
+            else:
+                if not resume:
+                    _memory_store.totals[self.key] = {}
+                _memory_store.totals.setdefault(self.key, {})
+                _memory_store.status[self.key] = self.status
+        except Exception as e:
+            logger.warning(f"Progress start failed for {self.campaign_id}: {e}")
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                await self.flush()
+
+    async def flush(self) -> Optional[dict]:
+        """Writes pending increments and publishes them as one delta. Returns the totals."""
+        delta, self._pending = self._pending, {}
+        if not delta and self.status == "active":
+            return None
+        now = time.time()
+        try:
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for field, amount in delta.items():
+                        pipe.hincrby(self.key, field, amount)
+                    pipe.hset(self.key, mapping={"status": self.status, "updated_at": now})
+                    pipe.expire(self.key, PROGRESS_TTL)
+                    pipe.hgetall(self.key)
+                    results = await pipe.execute()
+                totals = _decode(results[-1])
+            else:
+                stored = _memory_store.totals.setdefault(self.key, {})
+                for field, amount in delta.items():
+                    stored[field] = stored.get(field, 0) + amount
+                _memory_store.status[self.key] = self.status
+                totals = {"status": self.status, **stored, "updated_at": now}
+        except Exception as e:
+            logger.warning(f"Progress flush failed for {self.campaign_id}: {e}")
+            # Keep the increments for the next attempt
+            for field, amount in delta.items():
+                self._pending[field] = self._pending.get(field, 0) + amount
+            return None
+
+        await self._publish({"campaign_id": self.campaign_id, "status": self.status, "delta": delta, "totals": totals})
+        return totals
+
+    async def _publish(self, event: dict):
+        try:
+            if self.redis:
+                await self.redis.publish(self.key, json.dumps(event))
+            else:
+                for queue in list(_memory_store.listeners.get(self.key, ())):
+                    queue.put_nowait(event)
+        except Exception as e:
+            logger.warning(f"Progress publish failed for {self.campaign_id}: {e}")
+
+    async def finish(self, status: str = "completed") -> dict:
+        """Stops the flusher and writes the final counters and status. Returns the totals."""
+        self.status = status
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        totals = await self.flush()
+        if totals is not None:
+            return totals
+        stored = await self._read()
+        if stored is None or stored.get("status") == "unknown":
+            # Counters unavailable: report what this attempt counted itself
+            logger.warning(f"Progress counters unavailable for {self.campaign_id}, using local totals")
+            return {"status": status, **self._local}
+        # Stored totals plus whatever the failed flush could not write
+        for field, amount in self._pending.items():
+            stored[field] = stored.get(field, 0) + amount
+        return {**stored, "status": status}
+
+    async def _read(self) -> Optional[dict]:
+        """Stored counters, or None when they cannot be read."""
+        try:
+            if self.redis:
+                return _decode(await self.redis.hgetall(self.key))
+        except Exception as e:
+            logger.warning(f"Progress read failed for {self.campaign_id}: {e}")
+            return None
+        return {"status": _memory_store.status.get(self.key, "unknown"), **_memory_store.totals.get(self.key, {})}
+
+    async def snapshot(self) -> dict:
+        """Stored counters (empty with status "unknown" if the campaign never ran)."""
+        stored = await self._read()
+        return stored if stored is not None else {"status": "unknown"}
+
+
+async def get_progress(campaign_id: str) -> dict:
+    return await CampaignProgress(campaign_id).snapshot()
+
+
+async def subscribe_progress(campaign_id: str) -> AsyncIterator[dict]:
+    """
+    Yields each progress event published for a campaign, and None after every
+    idle second so callers can send heartbeats or notice a disconnect.
+    The first item is a None once the subscription is live.
+    """
+    key = _progress_key(campaign_id)
+    r = get_redis()
+    if r:
+        pubsub = r.pubsub()
+        await pubsub.subscribe(key)
+        try:
+            yield None
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    yield None
+                elif message["type"] == "message":
+                    yield json.loads(message["data"])
+        finally:
+            try:
+                await pubsub.unsubscribe(key)
+                await pubsub.aclose() if hasattr(pubsub, "aclose") else await pubsub.close()
+            except Exception:
+                pass
+    else:
+        queue: asyncio.Queue = asyncio.Queue()
+        _memory_store.listeners.setdefault(key, set()).add(queue)
+        try:
+            yield None
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            _memory_store.listeners.get(key, set()).discard(queue)
@@ -0,0 +1,119 @@
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+
+class CampaignProviders:
+    """
+    The external dependencies campaign execution talks to: channel senders,
+    link resolution, the LLM factory, send throttling, the execution log, the
+    fair-share scheduler and whether run state is persisted (campaign status,
+    checkpoint, cache).
+
+    The default instance uses the real services. A simulation installs its own
+    instance with `use_providers`; the choice lives in a ContextVar, so only the
+    tasks spawned by that run see it and real campaigns in the same process
+    are unaffected.
+    """
+
+    def __init__(
+        self,
+        send_email: Optional[Callable] = None,
+        send_whatsapp: Optional[Callable] = None,
+        link_resolver: Any = None,
+        get_llm: Optional[Callable] = None,
+        throttle: Any = None,
+        execution_log: Any = None,
+        scheduler: Any = None,
+        persist: bool = True,
+        on_stage: Optional[Callable[[str, float], None]] = None,
+    ):
+        self._send_email = send_email
+        self._send_whatsapp = send_whatsapp
+        self._link_resolver = link_resolver
+        self._get_llm = get_llm
+        self._throttle = throttle
+        self._execution_log = execution_log
+        self._scheduler = scheduler
+        self.persist = persist
+        self.on_stage = on_stage
+
+    # Real services are imported lazily so importing this module stays cheap
+
+    @property
+    def send_email(self) -> Callable:
+        if self._send_email is None:
+            from app.ai.tools import tools
+            return tools.send_email_async
+        return self._send_email
+
+    @property
+    def send_whatsapp(self) -> Callable:
+        if self._send_whatsapp is None:
+            from app.ai.tools import tools
+            return tools.send_whatsapp_message_async
+        return self._send_whatsapp
+
+    @property
+    def link_resolver(self):
+        if self._link_resolver is None:
+            from app.ai.tools.link_resolver import link_resolver
+            return link_resolver
+        return self._link_resolver
+
+    def get_llm(self, **kwargs):
+        if self._get_llm is None:
+            from app.ai.models.llm_factory import get_llm_with_fallback
+            return get_llm_with_fallback(**kwargs)
+        return self._get_llm(**kwargs)
+
+    @property
+    def throttle(self):
+        if self._throttle is None:
+            from app.core.throttle import throttle
+            return throttle
+        return self._throttle
+
+    @property
+    def execution_log(self):
+        if self._execution_log is None:
+            from app.data.execution_log import execution_log
+            return execution_log
+        return self._execution_log
+
+    @property
+    def scheduler(self):
+        if self._scheduler is None:
+            from app.workflows.fair_scheduler import fair_scheduler
+            return fair_scheduler
+        return self._scheduler
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Times a pipeline stage when someone is listening (simulation reports)."""
+        if self.on_stage is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.on_stage(name, time.perf_counter() - start)
+
+
+default_providers = CampaignProviders()
+_active_providers: ContextVar[Optional[CampaignProviders]] = ContextVar("campaign_providers", default=None)
+
+
+def get_providers() -> CampaignProviders:
+    return _active_providers.get() or default_providers
+
+
+@contextmanager
+def use_providers(providers: CampaignProviders):
+    token = _active_providers.set(providers)
+    try:
+        yield providers
+    finally:
+        _active_providers.reset(token)
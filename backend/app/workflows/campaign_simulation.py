@@ -0,0 +1,276 @@
+"""
+Dry-run / load-test mode for campaign execution.
+
+`simulate_campaign` runs the real `run_campaign_execution` pipeline (dedupe,
+link prefetch, staged pipeline, generation modes, throttling, checkpointing,
+buffered logging)
+against in-process simulators: channel senders, Tavily link search, the LLM
+and the execution-log sink are replaced by fakes with configurable latency
+distributions and failure rates. Nothing is sent, billed or written to
+Supabase. The report gives throughput, per-stage latency, pipeline stage
+utilization and estimated cost, so worker / batch / rate settings can be
+tuned offline.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.ai.tools.link_resolver import LinkResolver, normalize_query
+from app.core.throttle import SendThrottle
+from app.data.execution_log import ExecutionLogWriter
+from app.observability.metrics import Histogram
+from app.workflows.campaign_pipeline import STAGE_BUCKETS_MS
+from app.workflows.campaign_providers import CampaignProviders, use_providers
+from app.workflows.fair_scheduler import FairScheduler
+
+
+class LatencyModel:
+    """
+    Latency distribution for one simulated dependency, sampled in seconds.
+    kind: "lognormal" (median/p95, the usual shape of remote calls),
+          "uniform" (median..p95 range) or "fixed" (always median).
+    """
+
+    def __init__(self, median_ms: float, p95_ms: Optional[float] = None, kind: str = "lognormal"):
+        self.median_ms = median_ms
+        self.p95_ms = p95_ms if p95_ms is not None else median_ms * 2
+        self.kind = kind
+        # 1.645 = z-score of the 95th percentile
+        self._sigma = math.log(max(self.p95_ms, median_ms) / median_ms) / 1.645 if median_ms > 0 else 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed" or self.median_ms <= 0:
+            return self.median_ms / 1000
+        if self.kind == "uniform":
+            return rng.uniform(self.median_ms, self.p95_ms) / 1000
+        return rng.lognormvariate(math.log(self.median_ms), self._sigma) / 1000
+
+
+class SimulationProfile:
+    """Latencies, failure rates and unit costs for a simulated run (all overridable)."""
+
+    DEFAULTS: Dict[str, Any] = {
+        "llm_latency": (2500, 6000),
+        "link_latency": (700, 1500),
+        "email_latency": (250, 800),
+        "whatsapp_latency": (300, 900),
+        "log_insert_latency": (40, 120),
+        "llm_failure_rate": 0.01,
+        "email_failure_rate": 0.02,
+        "whatsapp_failure_rate": 0.03,
+        "rate_limits": True,
+        # Estimated unit costs in USD
+        "llm_input_per_1k_tokens": 0.00059,
+        "llm_output_per_1k_tokens": 0.00079,
+        "email_per_message": 0.0004,
+        "whatsapp_per_message": 0.0107,
+        "link_search": 0.008,
+    }
+
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown simulation settings: {sorted(unknown)}")
+        values = {**self.DEFAULTS, **overrides}
+        for name, value in values.items():
+            if name.endswith("_latency"):
+                value = value if isinstance(value, LatencyModel) else LatencyModel(*value)
+            setattr(self, name, value)
+
+
+class SimulationStats:
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = Histogram(STAGE_BUCKETS_MS)
+        hist.observe(seconds * 1000)
+
+    def incr(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+
+class _Response:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLM:
+    """Answers generation prompts in the formats llm_generation expects."""
+
+    def __init__(self, profile: SimulationProfile, stats: SimulationStats, rng: random.Random):
+        self.profile = profile
+        self.stats = stats
+        self.rng = rng
+
+    async def ainvoke(self, prompt: str) -> _Response:
+        await asyncio.sleep(self.profile.llm_latency.sample(self.rng))
+        self.stats.incr("llm_calls")
+        self.stats.incr("llm_input_tokens", len(prompt) // 4)
+        if self.rng.random() < self.profile.llm_failure_rate:
+            self.stats.incr("llm_failures")
+            raise RuntimeError("simulated LLM failure")
+
+        email = "marketing email" in prompt
+        if "Batch Mode" in prompt:
+            ids = re.findall(r'id "(r\d+)"', prompt)
+            content = json.dumps({"messages": [
+                {"id": i, "subject": "Simulated subject" if email else "", "body": self._body(email)} for i in ids
+            ]})
+        elif email:
+            content = f"SUBJECT: Simulated subject\nBODY:\n{self._body(True)}"
+        else:
+            content = self._body(False)
+        self.stats.incr("llm_output_tokens", len(content) // 4)
+        return _Response(content)
+
+    def _body(self, email: bool) -> str:
+        text = "Hi {{name}}, " + "simulated campaign copy " * 40
+        return f"<p>{text}</p>" if email else text
+
+
+class FakeLinkResolver(LinkResolver):
+    """Per-query memo with simulated search latency; never touches the shared cache."""
+
+    def __init__(self, profile: SimulationProfile, stats: SimulationStats, rng: random.Random):
+        super().__init__()
+        self.profile = profile
+        self.stats = stats
+        self.rng = rng
+        self._links: Dict[str, asyncio.Future] = {}
+
+    async def resolve(self, query: str) -> str:
+        key = normalize_query(query)
+        future = self._links.get(key)
+        if future is None:
+            future = self._links[key] = asyncio.get_running_loop().create_future()
+            await asyncio.sleep(self.profile.link_latency.sample(self.rng))
+            self.stats.incr("link_searches")
+            future.set_result(f"https://example.edu/{abs(hash(key)) % 10000}")
+        return await asyncio.shield(future)
+
+
+def _fake_sender(channel: str, profile: SimulationProfile, stats: SimulationStats, rng: random.Random):
+    latency: LatencyModel = getattr(profile, f"{channel}_latency")
+    failure_rate: float = getattr(profile, f"{channel}_failure_rate")
+
+    async def send(to: str, *args, **kwargs) -> str:
+        await asyncio.sleep(latency.sample(rng))
+        if rng.random() < failure_rate:
+            stats.incr(f"{channel}_failed")
+            return f"failed_simulated_{channel}"
+        stats.incr(f"{channel}_sent")
+        return f"sent_simulated_{channel}"
+
+    return send
+
+
+def synthetic_recipients(count: int, rng: random.Random, cities: int = 12, courses: int = 8) -> List[dict]:
+    return [
+        {
+            "id": f"{i:08d}",
+            "name": f"Student {i}",
+            "email": f"student{i}@example.com",
+            "phone": f"+9198{rng.randint(10000000, 99999999)}",
+            "city": f"City {rng.randrange(cities)}",
+            "course": f"Course {rng.randrange(courses)}",
+        }
+        for i in range(count)
+    ]
+
+
+async def simulate_campaign(
+    recipients: Any = 1000,
+    channels: Sequence[str] = ("email", "whatsapp"),
+    generation_mode: str = "personalized",
+    workers: Optional[Dict[str, int]] = None,
+    profile: Optional[SimulationProfile] = None,
+    ai_prompt: str = "Invite students to the Fall 2026 open day",
+    cohort_variants: int = 1,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Runs one simulated campaign. `recipients` is a count (synthetic audience)
+    or a list of recipient dicts; `workers` overrides pipeline stage workers.
+    Returns the run report.
+    """
+    from app.api.v1.campaigns import run_campaign_execution
+    from app.core.cache import cache
+
+    profile = profile or SimulationProfile()
+    rng = random.Random(seed)
+    stats = SimulationStats()
+    audience = synthetic_recipients(recipients, rng) if isinstance(recipients, int) else list(recipients)
+
+    async def sink(rows: List[dict]):
+        await asyncio.sleep(profile.log_insert_latency.sample(rng))
+        stats.incr("log_rows", len(rows))
+        stats.incr("log_batches")
+
+    throttle = SendThrottle(enabled=profile.rate_limits)
+    throttle.redis = throttle.redis_sync = None  # local buckets: never drain the production ones
+    log_writer = ExecutionLogWriter(table="simulated_executions", sink=sink)
+    # A private scheduler: simulated load never takes slots from real campaigns
+    scheduler = FairScheduler()
+
+    providers = CampaignProviders(
+        send_email=_fake_sender("email", profile, stats, rng),
+        send_whatsapp=_fake_sender("whatsapp", profile, stats, rng),
+        link_resolver=FakeLinkResolver(profile, stats, rng),
+        get_llm=lambda **kwargs: FakeLLM(profile, stats, rng),
+        throttle=throttle,
+        execution_log=log_writer,
+        scheduler=scheduler,
+        persist=False,
+        on_stage=stats.observe,
+    )
+
+    campaign_id = f"sim-{uuid.uuid4().hex[:12]}"
+    campaign_data = {
+        "id": campaign_id,
+        "user_id": "simulation",
+        "channels": list(channels),
+        "sender_name": "Admit AI Team",
+        "metadata": {"ai_prompt": ai_prompt, "generation_mode": generation_mode, "cohort_variants": cohort_variants},
+    }
+
+    start = time.perf_counter()
+    with use_providers(providers):
+        pipeline_stats = await run_campaign_execution(campaign_id, campaign_data=campaign_data, recipients=audience, workers=workers) or {}
+    wall = time.perf_counter() - start
+    await log_writer.close()
+    # Cohort templates are cached under the simulated campaign id
+    await cache.invalidate_tags(f"campaign:{campaign_id}")
+
+    c = stats.counters
+    cost = {
+        "llm": round(c.get("llm_input_tokens", 0) / 1000 * profile.llm_input_per_1k_tokens
+                     + c.get("llm_output_tokens", 0) / 1000 * profile.llm_output_per_1k_tokens, 4),
+        "email": round(c.get("email_sent", 0) * profile.email_per_message, 4),
+        "whatsapp": round(c.get("whatsapp_sent", 0) * profile.whatsapp_per_message, 4),
+        "link_search": round(c.get("link_searches", 0) * profile.link_search, 4),
+    }
+    cost["total"] = round(sum(cost.values()), 4)
+
+    return {
+        "campaign_id": campaign_id,
+        "recipients": len(audience),
+        "generation_mode": generation_mode,
+        "workers": {name: stage["workers"] for name, stage in pipeline_stats.items()},
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(audience) / wall, 2) if wall else None,
+        "counters": dict(sorted(c.items())),
+        "stages": {name: hist.snapshot() for name, hist in sorted(stats.stages.items())},
+        "pipeline": pipeline_stats,
+        "throttle_waits_s": {name: v["waited_s"] for name, v in throttle.stats().items() if v["waited_s"]},
+        "estimated_cost_usd": cost,
+        "cost_per_recipient_usd": round(cost["total"] / len(audience), 6) if audience else 0,
+    }
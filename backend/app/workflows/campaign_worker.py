@@ -8,9 +8,16 @@ from app.api.v1.campaigns import run_campaign_execution
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("CampaignWorker")
 
+# Running campaign executions by campaign_id; they share capacity through the fair-share scheduler
+_running = {}
+
+
 async def process_campaign_event(data: dict):
     """
     Handles campaign execution events from the queue.
+    Executions run as background tasks so campaigns of different tenants
+    proceed concurrently instead of queueing behind each other; a campaign
+    that is already running here ignores duplicate (redelivered) events.
     """
     event_type = data.get("type")
     campaign_id = data.get("campaign_id")
@@ -18,21 +25,38 @@ async def process_campaign_event(data: dict):
     logger.info(f"Received Event: {event_type} for Campaign {campaign_id}")
     
     if event_type == "execute_campaign" and campaign_id:
-        try:
-            logger.info("Starting Campaign Execution via Worker...")
-            await run_campaign_execution(campaign_id)
-            logger.info("Campaign Execution Completed.")
-        except Exception as e:
-            logger.error(f"Worker Execution Failed: {e}")
+        if campaign_id in _running:
+            logger.warning(f"Campaign {campaign_id} is already running, ignoring duplicate event")
+            return
+        _running[campaign_id] = asyncio.create_task(_execute(campaign_id))
     else:
         logger.warning(f"Unknown or Invalid Event: {data}")
 
+async def _execute(campaign_id: str):
+    try:
+        logger.info("Starting Campaign Execution via Worker...")
+        await run_campaign_execution(campaign_id)
+        logger.info("Campaign Execution Completed.")
+    except Exception as e:
+        logger.error(f"Worker Execution Failed: {e}")
+    finally:
+        _running.pop(campaign_id, None)
+
 async def start_worker():
     """
     Starts the worker subscription.
     """
     logger.info("--- Starting Campaign AI Worker ---")
-    await event_queue.subscribe("campaign_events", process_campaign_event)
+    from app.data.execution_log import execution_log
+    from app.core.http_client import http_pool
+    try:
+        await event_queue.subscribe("campaign_events", process_campaign_event)
+    finally:
+        if _running:
+            await asyncio.gather(*list(_running.values()), return_exceptions=True)
+        # Persist any buffered campaign_executions rows on shutdown
+        await execution_log.close()
+        await http_pool.aclose()
 
 if __name__ == "__main__":
     asyncio.run(start_worker())
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+from app.observability.metrics import Histogram
+
+# Slot waits run from nothing (idle) to minutes (a tenant behind heavier-weighted ones)
+WAIT_BUCKETS_MS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+
+class _Tenant:
+    __slots__ = ("weight", "deficit", "waiters", "granted", "wait")
+
+    def __init__(self, weight: int):
+        self.weight = weight
+        self.deficit = 0.0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.granted = 0
+        self.wait = Histogram(WAIT_BUCKETS_MS)
+
+
+class _Resource:
+    """Slots of one shared resource, handed out by deficit round robin."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0
+        self.tenants: Dict[str, _Tenant] = {}
+        self.ring: Deque[str] = deque()  # tenants with waiters, in service order
+
+    def tenant(self, tenant_id: str, weight: int) -> _Tenant:
+        tenant = self.tenants.get(tenant_id)
+        if tenant is None:
+            tenant = self.tenants[tenant_id] = _Tenant(weight)
+        tenant.weight = weight
+        return tenant
+
+    def dispatch(self):
+        while self.in_use < self.capacity and self.ring:
+            tenant_id = self.ring[0]
+            tenant = self.tenants[tenant_id]
+            if tenant.deficit < 1:
+                # New turn: a tenant may start `weight` units per round
+                tenant.deficit += tenant.weight
+            while tenant.deficit >= 1 and tenant.waiters and self.in_use < self.capacity:
+                waiter = tenant.waiters.popleft()
+                if waiter.done():
+                    continue  # cancelled while queued
+                tenant.deficit -= 1
+                self.in_use += 1
+                waiter.set_result(None)
+            if not tenant.waiters:
+                self.ring.popleft()
+                tenant.deficit = 0.0  # idle tenants do not bank credit
+            elif tenant.deficit < 1:
+                self.ring.rotate(-1)
+            # else: out of slots mid-turn; the tenant keeps its place and deficit
+
+    def release(self):
+        self.in_use -= 1
+        self.dispatch()
+
+
+class FairScheduler:
+    """
+    Shares campaign capacity (LLM generation, channel sends) between tenants.
+
+    Each resource has a fixed number of slots for the whole process; sends
+    are scheduled per channel ("send:email", "send:whatsapp"), each with the
+    "send" slot count, so one channel's backlog never holds another's. A slot
+    is free to take while nobody waits; under contention waiting work units
+    queue per tenant and are granted by deficit round robin, a tenant getting
+    up to `weight` units per round (plan weights, see SubscriptionService.PLANS).
+    A 100k-recipient campaign then cannot starve a small one: each tenant's
+    share, and so its latency, depends on the weights, not on arrival order
+    or queue length.
+
+    Work still runs in the campaign's own pipeline workers (so per-run
+    context such as simulation providers is kept); the scheduler only
+    decides whose unit goes next.
+    """
+
+    def __init__(self, capacities: Optional[Dict[str, int]] = None, enabled: bool = True):
+        self.capacities = capacities or {
+            "generate": settings.FAIR_SCHEDULER_GENERATE_SLOTS,
+            "send": settings.FAIR_SCHEDULER_SEND_SLOTS,
+        }
+        self.enabled = enabled
+        self._resources: Dict[str, _Resource] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _resource(self, name: str) -> Optional[_Resource]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures are bound to a loop; a new loop starts with fresh state
+            self._loop = loop
+            self._resources = {}
+        resource = self._resources.get(name)
+        if resource is None:
+            # "send:email" takes its slot count from "send" (one pool per channel)
+            capacity = self.capacities.get(name, self.capacities.get(name.split(":")[0]))
+            if capacity is not None:
+                resource = self._resources[name] = _Resource(name, capacity)
+        return resource
+
+    async def acquire(self, resource_name: str, tenant_id: str, weight: int = 1) -> bool:
+        """Waits for a slot. False when the resource is not scheduled (nothing to release)."""
+        resource = self._resource(resource_name) if self.enabled else None
+        if resource is None:
+            return False
+        tenant = resource.tenant(tenant_id, max(1, int(weight)))
+        start = time.perf_counter()
+        if resource.in_use < resource.capacity and not resource.ring:
+            resource.in_use += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            tenant.waiters.append(waiter)
+            if tenant_id not in resource.ring:
+                resource.ring.append(tenant_id)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    resource.release()  # granted as we were cancelled
+                else:
+                    try:
+                        tenant.waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                    resource.dispatch()
+                raise
+        tenant.granted += 1
+        tenant.wait.observe((time.perf_counter() - start) * 1000)
+        return True
+
+    def release(self, resource_name: str):
+        resource = self._resources.get(resource_name)
+        if resource is not None:
+            resource.release()
+
+    @asynccontextmanager
+    async def slot(self, resource_name: str, tenant_id: str, weight: int = 1):
+        acquired = await self.acquire(resource_name, tenant_id, weight)
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release(resource_name)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "capacity": resource.capacity,
+                "in_use": resource.in_use,
+                "tenants": {
+                    tenant_id: {
+                        "weight": tenant.weight,
+                        "waiting": len(tenant.waiters),
+                        "granted": tenant.granted,
+                        "wait": tenant.wait.snapshot(),
+                    }
+                    for tenant_id, tenant in resource.tenants.items()
+                },
+            }
+            for name, resource in self._resources.items()
+        }
+
+
+fair_scheduler = FairScheduler(enabled=settings.FAIR_SCHEDULER_ENABLED)
@@ -13,6 +13,11 @@ async def startup(ctx):
 
 async def shutdown(ctx):
     logger.info("--- WORKER SHUTDOWN ---")
+    # Persist any buffered campaign_executions rows
+    from app.data.execution_log import execution_log
+    from app.core.http_client import http_pool
+    await execution_log.close()
+    await http_pool.aclose()
 
 class WorkerSettings:
     functions = [execute_campaign_task]
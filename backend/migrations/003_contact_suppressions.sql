@@ -0,0 +1,11 @@
+-- Contact suppression list (opt-outs, bounces, manual blocks)
+-- scope: the tenant's user_id, or 'global' for every tenant (e.g. STOP sent to the shared WhatsApp number)
+-- contact_key: normalized contact, "e:<lowercased email>" or "p:<E.164 phone>"
+CREATE TABLE IF NOT EXISTS contact_suppressions (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    scope TEXT NOT NULL,
+    contact_key TEXT NOT NULL,
+    reason TEXT DEFAULT 'opt_out',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc', now()),
+    UNIQUE (scope, contact_key)
+);
@@ -0,0 +1,97 @@
+"""
+Benchmarks CacheService value encodings: encode/decode throughput and stored bytes.
+
+Usage (from backend/):
+    python scripts/bench_cache_codec.py
+
+Compares the legacy `json.dumps` text format against every CacheCodec
+serializer/compression pair available in this environment.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.cache_codec import CacheCodec, COMPRESSORS, SERIALIZERS, SERIALIZER_NAMES, COMPRESSOR_NAMES
+
+random.seed(7)
+
+
+def analytics_payload(days: int = 30) -> dict:
+    return {
+        "time_series": [
+            {"date": f"2026-01-{d + 1:02d}", "email": random.randint(0, 900), "voice": random.randint(0, 80), "whatsapp": random.randint(0, 600)}
+            for d in range(days)
+        ],
+        "channel_metrics": [
+            {"channel": ch, "sent": 12000, "delivered": 11500, "failed": 500, "opened": 4000, "engagement_rate": 95.83}
+            for ch in ("email", "whatsapp", "voice")
+        ],
+        "summary": {"total_sent": 36000, "total_engaged": 34500, "engagement_rate": 95.83, "active_channels": 3},
+    }
+
+
+def candidates_page(rows: int = 50) -> dict:
+    return {
+        "data": [
+            {
+                "id": f"{random.getrandbits(128):032x}",
+                "name": f"Student {i}",
+                "email": f"student{i}@example.com",
+                "phone": f"+9198{random.randint(10000000, 99999999)}",
+                "city": random.choice(["Pune", "Delhi", "Mumbai", "Bengaluru"]),
+                "status": random.choice(["pending", "email_sent", "interested"]),
+                "tags": ["uploaded", "campaign:abc"],
+                "created_at": "2026-01-05T10:22:31.123456+00:00",
+                "campaigns": {"name": "Fall Intake", "type": "personalized", "status": "active"},
+            }
+            for i in range(rows)
+        ],
+        "page": 1,
+        "hasMore": True,
+    }
+
+
+def chat_response() -> str:
+    para = "Our admissions team can help you compare programs, deadlines and scholarships. "
+    return "\n\n".join(para * random.randint(3, 6) for _ in range(12))
+
+
+PAYLOADS = {
+    "analytics_agent": analytics_payload(),
+    "candidates_list": candidates_page(),
+    "llm_response": chat_response(),
+}
+
+
+def bench(name, encode, decode, value, rounds: int = 2000):
+    blob = encode(value)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        encode(value)
+    t1 = time.perf_counter()
+    for _ in range(rounds):
+        decode(blob)
+    t2 = time.perf_counter()
+    enc_ops = rounds / (t1 - t0)
+    dec_ops = rounds / (t2 - t1)
+    print(f"  {name:<16} {len(blob):>8} B  enc {enc_ops:>9.0f}/s  dec {dec_ops:>9.0f}/s")
+
+
+def main():
+    inv_ser = {v: k for k, v in SERIALIZER_NAMES.items()}
+    inv_comp = {v: k for k, v in COMPRESSOR_NAMES.items()}
+    for payload_name, value in PAYLOADS.items():
+        print(f"\n{payload_name}:")
+        bench("legacy-json", lambda v: json.dumps(v).encode(), json.loads, value)
+        for ser_id in SERIALIZERS:
+            for comp_id in COMPRESSORS:
+                codec = CacheCodec(serializer=inv_ser[ser_id], compression=inv_comp[comp_id], compress_threshold=1024)
+                bench(f"{inv_ser[ser_id]}+{inv_comp[comp_id]}", codec.encode, codec.decode, value)
+
+
+if __name__ == "__main__":
+    main()
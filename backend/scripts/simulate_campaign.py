@@ -0,0 +1,82 @@
+"""
+Dry-runs campaign execution against simulated providers and prints the report.
+
+Usage (from backend/):
+    python scripts/simulate_campaign.py --recipients 2000 --mode batched --workers generate=64,send_email=32
+    python scripts/simulate_campaign.py --compare-workers "generate=8;generate=32;generate=128"
+
+No messages are sent, no LLM tokens are spent and nothing is written to
+Supabase; see app/workflows/campaign_simulation.py for the knobs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.workflows.campaign_pipeline import parse_workers
+from app.workflows.campaign_simulation import SimulationProfile, simulate_campaign
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--channels", default="email,whatsapp")
+    parser.add_argument("--mode", default="personalized", choices=["personalized", "batched", "cohort"])
+    parser.add_argument("--variants", type=int, default=1, help="cohort variants")
+    parser.add_argument("--workers", default=None, help="stage worker overrides, e.g. generate=64,send_email=16")
+    parser.add_argument("--compare-workers", default=None, help="semicolon-separated worker overrides to compare")
+    parser.add_argument("--llm-ms", type=float, nargs=2, metavar=("MEDIAN", "P95"))
+    parser.add_argument("--email-ms", type=float, nargs=2, metavar=("MEDIAN", "P95"))
+    parser.add_argument("--whatsapp-ms", type=float, nargs=2, metavar=("MEDIAN", "P95"))
+    parser.add_argument("--email-failure-rate", type=float)
+    parser.add_argument("--whatsapp-failure-rate", type=float)
+    parser.add_argument("--llm-failure-rate", type=float)
+    parser.add_argument("--no-rate-limits", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def build_profile(args) -> SimulationProfile:
+    overrides = {}
+    for flag, name in (("llm_ms", "llm_latency"), ("email_ms", "email_latency"), ("whatsapp_ms", "whatsapp_latency")):
+        if getattr(args, flag):
+            overrides[name] = tuple(getattr(args, flag))
+    for name in ("email_failure_rate", "whatsapp_failure_rate", "llm_failure_rate"):
+        if getattr(args, name) is not None:
+            overrides[name] = getattr(args, name)
+    if args.no_rate_limits:
+        overrides["rate_limits"] = False
+    return SimulationProfile(**overrides)
+
+
+async def main():
+    args = parse_args()
+    profile = build_profile(args)
+    channels = [c.strip() for c in args.channels.split(",") if c.strip()]
+    runs = args.compare_workers.split(";") if args.compare_workers else [args.workers]
+
+    for spec in runs:
+        report = await simulate_campaign(
+            recipients=args.recipients,
+            channels=channels,
+            generation_mode=args.mode,
+            workers=parse_workers(spec),
+            profile=profile,
+            cohort_variants=args.variants,
+            seed=args.seed,
+        )
+        if len(runs) > 1:
+            stage = report["stages"].get("recipient", {})
+            bottleneck = max(report["pipeline"].items(), key=lambda kv: kv[1]["utilization"] or 0, default=("-", {}))[0]
+            print(f"workers={spec or 'default':>24}  wall={report['wall_s']:>8}s  "
+                  f"rps={report['throughput_rps']:>8}  recipient p95={stage.get('p95_ms')}ms  "
+                  f"bottleneck={bottleneck}  cost=${report['estimated_cost_usd']['total']}")
+        else:
+            print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())